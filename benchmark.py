@@ -0,0 +1,390 @@
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import subprocess
+import numpy as np
+import SimpleITK as sitk
+
+from nrrd_header import nrrd_geometry
+from csv_orginizer import find_patient_csvs
+
+# --- Sentetik Fantom ile Performans Ölçümü (Benchmark) ---
+# Hasta verisi paylaşılamadığı için, pipeline'ın performansını tekrarlanabilir şekilde ölçmek
+# amacıyla sentetik tarama/maske fantomları üretiyoruz. Her fantom durumu (case), referans
+# durumdan ('orta') tek bir özelliğiyle ayrılır: hacim boyutu, ROI boyutu, voksel aralığı,
+# kanal sayısı veya sıkıştırma. Böylece her ayarın maliyeti ayrı ayrı görülebilir.
+#
+# Her durum için data_organizer -> radiomics_extractor -> csv_orginizer adımları ayrı
+# süreçlerde çalıştırılır ve her adımın süresi, en yüksek bellek kullanımı (peak RSS) ve
+# işlem hızı ölçülür. Sonuçlar, sürümler arasında karşılaştırılabilmesi için JSON olarak
+# kaydedilir (bkz. compare_baselines).
+
+# Fantom durumları. 'size' (x, y, z) voksel, 'spacing' (x, y, z) mm, 'roi_radius_mm' tümörü
+# temsil eden elipsoidin yarıçapıdır. Varsayılan takım, tüm görüntü tipleri açıkken de birkaç
+# dakikada biter; büyük hacimli durumlar (LARGE_CASES) sadece '--large' ile çalıştırılır.
+DEFAULT_CASES = [
+    {'name': 'kucuk', 'size': (96, 96, 24), 'spacing': (1.0, 1.0, 3.0), 'roi_radius_mm': 15,
+     'channels': 1, 'compress': True},
+    {'name': 'orta', 'size': (256, 256, 40), 'spacing': (0.8, 0.8, 3.0), 'roi_radius_mm': 20,
+     'channels': 1, 'compress': True},
+    {'name': 'buyuk_roi', 'size': (256, 256, 40), 'spacing': (0.8, 0.8, 3.0), 'roi_radius_mm': 50,
+     'channels': 1, 'compress': True},
+    {'name': 'ince_kesit', 'size': (256, 256, 120), 'spacing': (0.8, 0.8, 1.0), 'roi_radius_mm': 20,
+     'channels': 1, 'compress': True},
+    {'name': 'cok_kanal', 'size': (256, 256, 40), 'spacing': (0.8, 0.8, 3.0), 'roi_radius_mm': 20,
+     'channels': 3, 'compress': True},
+    {'name': 'sikistirmasiz', 'size': (256, 256, 40), 'spacing': (0.8, 0.8, 3.0), 'roi_radius_mm': 20,
+     'channels': 1, 'compress': False},
+]
+
+# Klinik boyutta (512x512x64) tarama; tüm görüntü tipleriyle hasta başına dakikalar sürer.
+LARGE_CASES = [
+    {'name': 'buyuk', 'size': (512, 512, 64), 'spacing': (0.8, 0.8, 3.0), 'roi_radius_mm': 20,
+     'channels': 1, 'compress': True},
+]
+
+STAGES = ('organize', 'extract', 'collect')
+
+# Alt süreçte çalışan adımın sonucunu yazdığı dosyayı belirten komut satırı bayrağı.
+_STAGE_FLAG = '--run-stage'
+
+
+def make_phantom(size, spacing, roi_radius_mm, channels=1, seed=0):
+    """
+    Elipsoid şeklinde bir 'tümör' içeren sentetik tarama ve maske üretir.
+
+    Arka plan ve tümör farklı ortalama ve dokuya sahip gürültüden oluşur; böylece doku
+    özellikleri (GLCM, GLRLM...) gerçekçi miktarda iş yapar. Tümör, voksel aralığından
+    bağımsız olarak milimetre cinsinden tanımlanır.
+
+    Args:
+        size (tuple): (x, y, z) voksel sayısı.
+        spacing (tuple): (x, y, z) voksel aralığı (mm).
+        roi_radius_mm (float): Tümörün yarıçapı (mm).
+        channels (int): Tarama kanal sayısı. 1'den büyükse vektör (çok kanallı) görüntü üretilir.
+        seed (int): Rastgele sayı üreteci tohumu (aynı tohum aynı fantomu verir).
+
+    Returns:
+        tuple: (scan, mask) SimpleITK görüntüleri (aynı geometride).
+    """
+    rng = np.random.default_rng(seed)
+    nx, ny, nz = size
+    z, y, x = np.ogrid[:nz, :ny, :nx]
+    distance = (((x - nx / 2) * spacing[0]) ** 2 + ((y - ny / 2) * spacing[1]) ** 2
+                + ((z - nz / 2) * spacing[2]) ** 2)
+    roi = distance <= roi_radius_mm ** 2
+
+    base = rng.normal(100, 20, (nz, ny, nx))
+    base[roi] += 200 + rng.normal(0, 60, int(roi.sum()))
+
+    channel_images = []
+    for channel in range(channels):
+        image = sitk.GetImageFromArray((base + 15 * channel).astype(np.int16))
+        image.SetSpacing(spacing)
+        channel_images.append(image)
+    scan = channel_images[0] if channels == 1 else sitk.Compose(channel_images)
+
+    mask = sitk.GetImageFromArray(roi.astype(np.uint8))
+    mask.CopyInformation(channel_images[0])
+    return scan, mask
+
+
+def generate_phantom_cohort(case, raw_dir, n_patients=2):
+    """
+    Bir fantom durumu için, data_organizer'ın beklediği ham klasör yapısında hastalar üretir.
+
+    Aynı durum daha önce aynı ayarlarla üretildiyse dosyalar yeniden yazılmaz.
+
+    Args:
+        case (dict): DEFAULT_CASES'teki gibi bir fantom tanımı.
+        raw_dir (str): Hasta klasörlerinin oluşturulacağı ham veri klasörü.
+        n_patients (int): Üretilecek hasta sayısı (her biri farklı tohumla).
+    """
+    spec_path = os.path.join(raw_dir, 'phantom.json')
+    spec = dict(case, n_patients=n_patients)
+    try:
+        with open(spec_path, encoding='utf-8') as f:
+            if json.load(f) == json.loads(json.dumps(spec)):
+                return
+    except (OSError, ValueError):
+        pass
+
+    shutil.rmtree(raw_dir, ignore_errors=True)
+    for patient in range(n_patients):
+        patient_dir = os.path.join(raw_dir, f"{case['name']}_{patient:03d}")
+        os.makedirs(patient_dir)
+        scan, mask = make_phantom(case['size'], case['spacing'], case['roi_radius_mm'],
+                                  case['channels'], seed=patient)
+        sitk.WriteImage(scan, os.path.join(patient_dir, 'tarama.nrrd'), case['compress'])
+        sitk.WriteImage(mask, os.path.join(patient_dir, 'segmentasyon.seg.nrrd'), case['compress'])
+
+    with open(spec_path, 'w', encoding='utf-8') as f:
+        json.dump(spec, f)
+
+
+def _peak_rss_mb(children=False):
+    """Sürecin (veya beklenmiş alt süreçlerinin) en yüksek bellek kullanımını MB olarak döndürür."""
+    try:
+        import resource  # Sadece Unix sistemlerde bulunur; Windows'ta ölçüm None olur.
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF).ru_maxrss
+    # Linux kB, macOS bayt cinsinden döndürür.
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def _run_stage(stage, options):
+    """Alt süreçte çalışır: Tek bir pipeline adımını çalıştırır ve ölçümleri döndürür."""
+    start = time.perf_counter()
+    if stage == 'organize':
+        from data_organizer import organize_data_for_radiomics
+        organize_data_for_radiomics(options['raw_dir'], options['structured_dir'],
+                                    staging_mode=options['staging_mode'])
+    elif stage == 'extract':
+        from radiomics_extractor import extract_radiomics_features
+        extract_radiomics_features(options['structured_dir'], n_jobs=options['n_jobs'],
+                                   crop_to_roi=options['crop_to_roi'], use_cache=False)
+        # İşçi süreçleri kapatıyoruz ki bellek kullanımları RUSAGE_CHILDREN'a yansısın.
+        from joblib.externals.loky import get_reusable_executor
+        get_reusable_executor().shutdown(wait=True)
+    elif stage == 'collect':
+        from csv_orginizer import collect_radiomics_csv
+        collect_radiomics_csv(options['structured_dir'], options['csv_dir'])
+    else:
+        raise ValueError(f"Bilinmeyen adım: '{stage}'")
+    wall_time = time.perf_counter() - start
+
+    return {
+        'wall_time_s': wall_time,
+        'peak_rss_mb': _peak_rss_mb(),
+        'peak_rss_workers_mb': _peak_rss_mb(children=True),
+    }
+
+
+def run_stage_in_subprocess(stage, options, log_path):
+    """
+    Adımı yeni bir Python sürecinde çalıştırır; böylece her adımın bellek ölçümü bağımsızdır.
+
+    Adımın konsol çıktısı log_path dosyasına yazılır.
+
+    Returns:
+        dict: Süre ve bellek ölçümleri; adım başarısız olursa 'error' anahtarı eklenir.
+    """
+    result_path = f'{log_path}.result.json'
+    if os.path.exists(result_path):
+        os.remove(result_path)
+
+    with open(log_path, 'w', encoding='utf-8') as log:
+        process = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), _STAGE_FLAG, stage, json.dumps(options), result_path],
+            stdout=log, stderr=subprocess.STDOUT, cwd=os.path.dirname(os.path.abspath(__file__)),
+        )
+
+    if process.returncode != 0 or not os.path.exists(result_path):
+        return {'error': f"Adım başarısız oldu (çıkış kodu {process.returncode}). Ayrıntılar: {log_path}"}
+    with open(result_path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _folder_stats(folder, suffix):
+    """Klasördeki (alt klasörler dahil) belirtilen uzantılı dosyaların sayısını ve toplam boyutunu döndürür."""
+    count, size = 0, 0
+    for root, dirs, files in os.walk(folder):
+        dirs[:] = [d for d in dirs if not d.startswith('.')]
+        for filename in files:
+            if filename.lower().endswith(suffix):
+                count += 1
+                size += os.path.getsize(os.path.join(root, filename))
+    return count, size
+
+
+def _environment():
+    """Sonuçları etkileyebilecek sürüm ve donanım bilgilerini toplar."""
+    environment = {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'numpy': np.__version__,
+        'SimpleITK': sitk.Version_VersionString(),
+    }
+    try:
+        import radiomics
+        environment['pyradiomics'] = radiomics.__version__
+    except ImportError:
+        environment['pyradiomics'] = None
+    try:
+        environment['git_commit'] = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip() or None
+    except OSError:
+        environment['git_commit'] = None
+    return environment
+
+
+def run_benchmark(work_dir, cases=DEFAULT_CASES, n_patients=2, n_jobs=1, crop_to_roi=False,
+                  staging_mode='copy', baseline_path=None):
+    """
+    Fantom durumlarını üretir, her biri için pipeline'ı çalıştırır ve sonuçları kaydeder.
+
+    Args:
+        work_dir (str): Fantomların, ara çıktıların ve adım kayıtlarının tutulacağı klasör.
+        cases (list): Çalıştırılacak fantom durumları (bkz. DEFAULT_CASES).
+        n_patients (int): Her durum için üretilecek hasta sayısı.
+        n_jobs (int): extract_radiomics_features'a verilen paralel işçi sayısı.
+        crop_to_roi (bool): extract_radiomics_features'a verilen ROI kırpma seçeneği.
+        staging_mode (str): data_organizer'a verilen dosya yerleştirme yöntemi.
+        baseline_path (str): Sonuç JSON dosyasının yolu. None ise
+                             '<work_dir>/baselines/<tarih>_<commit>.json'.
+
+    Returns:
+        str: Kaydedilen sonuç dosyasının yolu.
+    """
+    options = {'n_patients': n_patients, 'n_jobs': n_jobs, 'crop_to_roi': crop_to_roi,
+               'staging_mode': staging_mode}
+    report = {'created': time.strftime('%Y-%m-%dT%H:%M:%S'), 'environment': _environment(),
+              'options': options, 'cases': {}}
+
+    for case in cases:
+        print(f"\nDurum: {case['name']} (boyut {case['size']}, voksel aralığı {case['spacing']}, "
+              f"ROI {case['roi_radius_mm']} mm, {case['channels']} kanal, "
+              f"{'sıkıştırılmış' if case['compress'] else 'sıkıştırılmamış'})")
+
+        case_dir = os.path.join(work_dir, case['name'])
+        raw_dir = os.path.join(case_dir, 'raw')
+        structured_dir = os.path.join(case_dir, 'structured')
+        csv_dir = os.path.join(case_dir, 'csv')
+        log_dir = os.path.join(case_dir, 'logs')
+
+        generate_phantom_cohort(case, raw_dir, n_patients)
+        # Her ölçüm temiz bir başlangıçla yapılır (atlanan dosya veya önbellek olmaz).
+        shutil.rmtree(structured_dir, ignore_errors=True)
+        shutil.rmtree(csv_dir, ignore_errors=True)
+        os.makedirs(log_dir, exist_ok=True)
+
+        scan_paths = [os.path.join(raw_dir, p, 'tarama.nrrd') for p in sorted(os.listdir(raw_dir))
+                      if os.path.isdir(os.path.join(raw_dir, p))]
+        voxels = sum(nrrd_geometry(path)['voxels'] for path in scan_paths)
+        _, raw_bytes = _folder_stats(raw_dir, '.nrrd')
+
+        stage_options = dict(options, raw_dir=raw_dir, structured_dir=structured_dir, csv_dir=csv_dir)
+        stages = {}
+        for stage in STAGES:
+            result = run_stage_in_subprocess(stage, stage_options, os.path.join(log_dir, f'{stage}.log'))
+            if 'error' not in result:
+                seconds = result['wall_time_s']
+                result['patients_per_s'] = len(scan_paths) / seconds if seconds > 0 else None
+                if stage == 'organize':
+                    result['mb_per_s'] = raw_bytes / (1024 * 1024) / seconds if seconds > 0 else None
+                elif stage == 'extract':
+                    result['mvoxels_per_s'] = voxels / 1e6 / seconds if seconds > 0 else None
+                    # Kökteki birleşik CSV sayılmasın diye sadece hasta klasörlerine bakıyoruz.
+                    result['patient_csvs'] = len(find_patient_csvs(structured_dir))
+                else:
+                    n_csv, csv_bytes = _folder_stats(csv_dir, '.csv')
+                    result['csv_files'] = n_csv
+                    result['mb_per_s'] = csv_bytes / (1024 * 1024) / seconds if seconds > 0 else None
+                print(f"  {stage:<9}: {seconds:8.2f} sn | peak RSS {result['peak_rss_mb'] or 0:8.1f} MB "
+                      f"(işçiler {result['peak_rss_workers_mb'] or 0:.1f} MB)")
+            else:
+                print(f"  {stage:<9}: HATA - {result['error']}")
+            stages[stage] = result
+
+        report['cases'][case['name']] = {
+            'spec': case,
+            'patients': len(scan_paths),
+            'voxels': voxels,
+            'raw_bytes': raw_bytes,
+            'stages': stages,
+            'total_wall_time_s': sum(s.get('wall_time_s', 0) for s in stages.values()),
+        }
+
+    if baseline_path is None:
+        label = time.strftime('%Y%m%d_%H%M%S')
+        if report['environment']['git_commit']:
+            label += f"_{report['environment']['git_commit']}"
+        baseline_path = os.path.join(work_dir, 'baselines', f'{label}.json')
+    os.makedirs(os.path.dirname(os.path.abspath(baseline_path)), exist_ok=True)
+    with open(baseline_path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\nSonuçlar kaydedildi: {baseline_path}")
+    return baseline_path
+
+
+def compare_baselines(old_path, new_path, threshold=0.10):
+    """
+    İki benchmark sonucunu karşılaştırır ve yavaşlayan / daha çok bellek kullanan adımları listeler.
+
+    Args:
+        old_path (str): Referans (eski) sonuç JSON dosyası.
+        new_path (str): Yeni sonuç JSON dosyası.
+        threshold (float): Bu orandan fazla artış gerileme (regression) sayılır (0.10 = %10).
+
+    Returns:
+        list: (durum, adım, ölçüm, eski, yeni) gerilemeleri.
+    """
+    with open(old_path, encoding='utf-8') as f:
+        old = json.load(f)
+    with open(new_path, encoding='utf-8') as f:
+        new = json.load(f)
+
+    regressions = []
+    print(f"{'Durum':<14}{'Adım':<10}{'Süre (eski -> yeni)':>28}{'Peak RSS MB (eski -> yeni)':>32}")
+    for case_name, new_case in new['cases'].items():
+        old_case = old['cases'].get(case_name)
+        if old_case is None:
+            continue
+        for stage, new_stage in new_case['stages'].items():
+            old_stage = old_case['stages'].get(stage, {})
+            if 'error' in new_stage or 'error' in old_stage or not old_stage:
+                continue
+            flags = []
+            for metric in ('wall_time_s', 'peak_rss_mb'):
+                old_value, new_value = old_stage.get(metric), new_stage.get(metric)
+                if old_value and new_value and new_value > old_value * (1 + threshold):
+                    regressions.append((case_name, stage, metric, old_value, new_value))
+                    flags.append(metric)
+            marker = '  <-- GERİLEME' if flags else ''
+            print(f"{case_name:<14}{stage:<10}"
+                  f"{old_stage['wall_time_s']:>12.2f} -> {new_stage['wall_time_s']:<10.2f}"
+                  f"{old_stage['peak_rss_mb'] or 0:>16.1f} -> {new_stage['peak_rss_mb'] or 0:<10.1f}{marker}")
+    return regressions
+
+
+if __name__ == '__main__':
+    if len(sys.argv) == 5 and sys.argv[1] == _STAGE_FLAG:
+        # run_stage_in_subprocess tarafından başlatılan alt süreç.
+        _, _, stage_name, stage_options, result_file = sys.argv
+        stage_result = _run_stage(stage_name, json.loads(stage_options))
+        with open(result_file, 'w', encoding='utf-8') as f:
+            json.dump(stage_result, f)
+        sys.exit(0)
+
+    parser = argparse.ArgumentParser(description='Sentetik fantomlarla pipeline performans ölçümü.')
+    parser.add_argument('--large', action='store_true',
+                        help='512x512x64 gibi büyük hacimli durumları da çalıştır (uzun sürer).')
+    cli_args = parser.parse_args()
+
+    # --- KULLANIM ---
+    # Fantomların ve sonuçların yazılacağı klasör (git dışında tutulması önerilir).
+    benchmark_dir = 'data/benchmark'
+
+    # Çalıştırılacak durumlar. Hızlı bir kontrol için örn. [c for c in DEFAULT_CASES if c['name'] == 'kucuk'].
+    benchmark_cases = DEFAULT_CASES + (LARGE_CASES if cli_args.large else [])
+
+    # Her durumdaki hasta sayısı ve extractor ayarları.
+    patients_per_case = 2
+    n_jobs = 1
+    crop_to_roi = False
+
+    # Karşılaştırma için önceki bir sonuç dosyası (örn. 'data/benchmark/baselines/<...>.json').
+    compare_with = None
+
+    new_baseline = run_benchmark(benchmark_dir, benchmark_cases, n_patients=patients_per_case,
+                                 n_jobs=n_jobs, crop_to_roi=crop_to_roi)
+    if compare_with:
+        compare_baselines(compare_with, new_baseline)
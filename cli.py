@@ -0,0 +1,150 @@
+import os
+import sys
+import argparse
+
+from data_organizer import STAGING_MODES
+from pipeline_config import DEFAULT_MASK_NAMES
+
+# --- Komut Satırı Aracı ---
+# Pipeline'ın dört adımını tek bir komutla çalıştırır:
+#
+#   python cli.py organize data/raw/Hastalar data/structured --staging-mode hardlink
+#   python cli.py extract data/structured --n-jobs 4 --required-features model_features.txt
+#   python cli.py collect data/structured data/Radyomik_CSV_Ciktilari
+#   python cli.py inspect "data/structured/Hasta_1"
+#
+# PyRadiomics, SimpleITK, pandas ve Matplotlib gibi ağır kütüphaneler sadece onlara ihtiyaç duyan
+# alt komut çalışırken yüklenir; '--help', '--dry-run' ve planlama bu kütüphaneler olmadan anında
+# başlar. Modüllerin fonksiyonları (örn. extract_radiomics_features) başka kodlardan da yan etkisiz
+# olarak içe aktarılabilir; çalıştırma kodu sadece betikler doğrudan çalıştırıldığında devreye girer.
+
+
+def _cmd_organize(args):
+    from data_organizer import organize_data_for_radiomics
+    organize_data_for_radiomics(args.source_dir, args.dest_dir, staging_mode=args.staging_mode,
+                                max_workers=args.max_workers,
+                                require_geometry_match=args.require_geometry_match,
+                                build_volume_cache=args.volume_cache, dry_run=args.dry_run)
+    return 0
+
+
+def _cmd_extract(args):
+    mask_names = tuple(args.mask_names)
+    if args.dry_run:
+        from extraction_plan import plan_extraction_run
+        try:
+            plan_extraction_run(args.data_folder, mask_names, args.required_features)
+        except (OSError, ValueError) as e:
+            print(f"HATA: Çalışma planlanamadı: {e}")
+            return 1
+        return 0
+
+    from radiomics_extractor import extract_radiomics_features
+    extract_radiomics_features(args.data_folder, n_jobs=args.n_jobs, sitk_threads=args.sitk_threads,
+                               crop_to_roi=args.crop_to_roi, use_cache=not args.no_cache,
+                               cache_dir=args.cache_dir, store_dtype=args.store_dtype,
+                               export_csv=not args.no_csv, mask_names=mask_names, labels=args.labels,
+                               use_volume_cache=args.volume_cache, profile=args.profile,
+                               required_features=args.required_features, distributed=args.distributed,
+                               lease_seconds=args.lease_seconds, wait_for_workers=not args.no_wait,
+                               prefetch_depth=args.prefetch_depth, prefetch_memory_mb=args.prefetch_memory_mb)
+    return 0
+
+
+def _cmd_collect(args):
+    from csv_orginizer import collect_radiomics_csv
+    collect_radiomics_csv(args.source_dir, args.destination_dir, dtype=args.dtype,
+                          export_csv=not args.no_csv, dry_run=args.dry_run)
+    return 0
+
+
+def _cmd_inspect(args):
+    scan_path = os.path.join(args.patient_folder, 'scan.nrrd')
+    mask_path = os.path.join(args.patient_folder, args.mask_name)
+    from mask_inspect import launch_interactive_viewer
+    launch_interactive_viewer(scan_path, mask_path, use_volume_cache=args.volume_cache,
+                              measure_fps=args.measure_fps, feature_map_path=args.feature_map)
+    return 0
+
+
+def build_parser():
+    """Alt komutlarıyla birlikte argüman ayrıştırıcısını kurar (hiçbir ağır kütüphane yüklenmez)."""
+    parser = argparse.ArgumentParser(prog='cli.py', description='asil-radiomics pipeline komut satırı aracı.')
+    subparsers = parser.add_subparsers(dest='command', required=True, metavar='<komut>')
+
+    organize = subparsers.add_parser('organize', help='Ham hasta klasörlerini yapılandırır (Adım 1).')
+    organize.add_argument('source_dir', nargs='?', default='data/raw/Hastalar', help='Ham veri klasörü.')
+    organize.add_argument('dest_dir', nargs='?', default='data/structured', help='Yapılandırılmış veri klasörü.')
+    organize.add_argument('--staging-mode', choices=STAGING_MODES, default='copy',
+                          help='Dosyaların hedefe yerleştirilme yöntemi.')
+    organize.add_argument('--max-workers', type=int, default=4, help='Aynı anda yerleştirilecek en fazla dosya.')
+    organize.add_argument('--require-geometry-match', action='store_true',
+                          help='Segmentasyonla eşleşen tarama yoksa hastayı atla (varsayılan: uyar ve en büyük dosyayı seç).')
+    organize.add_argument('--volume-cache', action='store_true', help='Sıkıştırılmamış hacim önbelleğini hazırla.')
+    organize.add_argument('--dry-run', action='store_true', help='Ön kontrol yap, hiçbir dosya yazma.')
+    organize.set_defaults(handler=_cmd_organize)
+
+    extract = subparsers.add_parser('extract', help='Radyomik özellikleri çıkarır (Adım 2).')
+    extract.add_argument('data_folder', nargs='?', default='data/structured', help='Hasta klasörlerinin bulunduğu klasör.')
+    extract.add_argument('--n-jobs', type=int, default=1, help='Paralel işçi sayısı (-1 tüm çekirdekler).')
+    extract.add_argument('--sitk-threads', type=int, default=None, help='İşçi başına SimpleITK iş parçacığı.')
+    extract.add_argument('--crop-to-roi', action='store_true', help='Filtreleri ROI çevresindeki kutuda hesapla.')
+    extract.add_argument('--no-cache', action='store_true', help='Sonuç önbelleğini kullanma.')
+    extract.add_argument('--cache-dir', default=None, help="Önbellek klasörü (varsayılan '<veri>/.radiomics_cache').")
+    extract.add_argument('--store-dtype', choices=('float64', 'float32'), default='float64',
+                         help='Ana depodaki özellik sütunlarının tipi.')
+    extract.add_argument('--no-csv', action='store_true', help='Ana CSV dosyasını üretme.')
+    extract.add_argument('--mask-names', nargs='+', default=list(DEFAULT_MASK_NAMES),
+                         help='Her hasta klasöründe okunacak segmentasyon dosyaları.')
+    extract.add_argument('--labels', nargs='+', type=int, default=None, help='Özellik çıkarılacak etiketler.')
+    extract.add_argument('--volume-cache', action='store_true', help='Sıkıştırılmamış hacim önbelleğini kullan.')
+    extract.add_argument('--profile', action='store_true', help='Hasta ve adım bazında süre/bellek profili çıkar.')
+    extract.add_argument('--required-features', default=None,
+                         help='Gerekli sütunların listesi (.txt veya .csv); sadece bunlar hesaplanır.')
+    extract.add_argument('--distributed', action='store_true', help='Paylaşılan kuyruktan hasta alan işçi olarak çalış.')
+    extract.add_argument('--lease-seconds', type=float, default=600, help='Dağıtık modda kiralama süresi (sn).')
+    extract.add_argument('--no-wait', action='store_true', help='Dağıtık modda diğer işçileri bekleme.')
+    extract.add_argument('--prefetch-depth', type=int, default=2,
+                         help='Seri çalışmada arka planda önden okunacak hasta sayısı (0 kapalı).')
+    extract.add_argument('--prefetch-memory-mb', type=float, default=2048,
+                         help='Önden okunan girdilerin toplam bellek sınırı (MB).')
+    extract.add_argument('--dry-run', action='store_true',
+                         help="PyRadiomics'i yüklemeden hastaları ve planı listele, hiçbir şey hesaplama.")
+    extract.set_defaults(handler=_cmd_extract)
+
+    collect = subparsers.add_parser('collect', help='Hasta CSV\'lerini birleşik depoda toplar (Adım 3).')
+    collect.add_argument('source_dir', nargs='?', default='data/structured', help='Hasta klasörlerinin bulunduğu klasör.')
+    collect.add_argument('destination_dir', nargs='?', default='data/Radyomik_CSV_Ciktilari',
+                         help='Deponun yazılacağı klasör.')
+    collect.add_argument('--dtype', choices=('float64', 'float32'), default='float64', help='Depodaki sütun tipi.')
+    collect.add_argument('--no-csv', action='store_true', help='Ana CSV dosyasını üretme.')
+    collect.add_argument('--dry-run', action='store_true', help='Birleştirilecek CSV\'leri listele, hiçbir dosya yazma.')
+    collect.set_defaults(handler=_cmd_collect)
+
+    inspect = subparsers.add_parser('inspect', help='Tarama ve maskeyi interaktif görüntüleyicide açar.')
+    inspect.add_argument('patient_folder', help="'scan.nrrd' ve maskeyi içeren hasta klasörü.")
+    inspect.add_argument('--mask-name', default='segmentation.nrrd', help='Hasta klasöründeki maske dosyası.')
+    inspect.add_argument('--feature-map', default=None, help='Üzerine çizilecek voksel bazlı özellik haritası (.nrrd).')
+    inspect.add_argument('--volume-cache', action='store_true', help='Sıkıştırılmamış hacim önbelleğini kullan.')
+    inspect.add_argument('--measure-fps', action='store_true', help='Açılmadan önce kaydırma hızını ölç.')
+    inspect.set_defaults(handler=_cmd_inspect)
+
+    return parser
+
+
+def main(argv=None):
+    """
+    Komut satırı argümanlarını ayrıştırır ve ilgili alt komutu çalıştırır.
+
+    Args:
+        argv (list): Argümanlar. None ise sys.argv kullanılır.
+
+    Returns:
+        int: Çıkış kodu (0 başarılı).
+    """
+    args = build_parser().parse_args(argv)
+    return args.handler(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
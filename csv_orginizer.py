@@ -1,63 +1,223 @@
 import os
-import shutil
+import csv
+import json
 
-def collect_radiomics_csv(source_dir, destination_dir):
+# --- Birleşik Özellik Deposu ---
+# Hasta CSV'lerini ayrı bir klasör ağacına kopyalamak yerine, hepsini tek bir tipli ve indeksli
+# depoda ('radiomics_features.rfs', bkz. feature_store) birleştiriyoruz. 1500'den fazla sütunlu
+# metin CSV'lerini her seferinde yeniden ayrıştırmak gerekmez; tek bir hastanın satırı veya
+# birkaç sütun, tablo yüklenmeden okunabilir:
+#
+#   reader = FeatureStoreReader('data/Radyomik_CSV_Ciktilari/radiomics_features.rfs')
+#   reader.read_row('Hasta_1')
+#   reader.read_columns(['original_firstorder_Mean', 'wavelet-LLH_glcm_Correlation'])
+#
+# Birleştirme artımlıdır: Hangi CSV'nin hangi boyut ve değiştirilme zamanıyla depoya alındığı
+# 'radiomics_features.manifest.json' dosyasında tutulur; sadece yeni veya değişmiş CSV'ler okunur.
+# Değişmiş bir hastanın satırı depoya yeniden eklenir ve eski kopyası geçersiz sayılır; geçersiz
+# satırlar çoğaldığında depo sıkıştırılır.
+
+STORE_FILENAME = 'radiomics_features.rfs'
+MANIFEST_FILENAME = 'radiomics_features.manifest.json'
+MASTER_CSV_FILENAME = 'ALL_PATIENTS_radiomics_features.csv'
+
+# Hasta CSV'lerinde satırı tanımlayan sütunlar (çoklu maske/etiket modunda 'Mask' ve 'Label').
+INDEX_COLUMNS = ('PatientID', 'Mask', 'Label')
+PATIENT_CSV_SUFFIX = '_radiomics_features.csv'
+
+
+def find_patient_csvs(source_dir):
     """
-    Belirtilen kaynak klasörden bireysel ve ana radyomik CSV dosyalarını
-    toplayıp yeni bir hedef klasöre organize eder.
+    Kaynak klasördeki hasta klasörlerinde bulunan bireysel özellik CSV'lerini listeler.
 
     Args:
-        source_dir (str): İçinde hasta klasörleri ve ana CSV'nin bulunduğu klasör.
+        source_dir (str): İçinde hasta klasörlerinin bulunduğu klasör (örn. 'data/structured').
+
+    Returns:
+        list: Hasta klasörü adına göre sıralı (hasta klasörü adı, CSV yolu) ikilileri.
+    """
+    found = []
+    for item_name in sorted(os.listdir(source_dir)):
+        patient_dir = os.path.join(source_dir, item_name)
+        if not os.path.isdir(patient_dir) or item_name.startswith('.'):
+            continue
+        for filename in sorted(os.listdir(patient_dir)):
+            if filename.endswith(PATIENT_CSV_SUFFIX):
+                found.append((item_name, os.path.join(patient_dir, filename)))
+                break  # Bu hasta için CSV bulundu, sonraki hastaya geç
+    return found
+
+
+def read_patient_csv(csv_path):
+    """
+    Bir hastanın özellik CSV'sini okur.
+
+    Returns:
+        tuple: (indeks sütunlarının adları, [(indeks değerleri, {özellik: değer}), ...]).
+    """
+    with open(csv_path, newline='', encoding='utf-8') as f:
+        reader = csv.reader(f)
+        header = next(reader)
+        index_positions = [i for i, name in enumerate(header) if name in INDEX_COLUMNS]
+        feature_positions = [i for i, name in enumerate(header) if name not in INDEX_COLUMNS]
+        rows = []
+        for values in reader:
+            index = tuple(values[i] for i in index_positions)
+            rows.append((index, {header[i]: values[i] for i in feature_positions}))
+    return [header[i] for i in index_positions], rows
+
+
+def _csv_signature(csv_path):
+    stat = os.stat(csv_path)
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+
+def _load_manifest(manifest_path):
+    try:
+        with open(manifest_path, encoding='utf-8') as f:
+            manifest = json.load(f)
+        return manifest if isinstance(manifest.get('files'), dict) else None
+    except (OSError, ValueError):
+        return None
+
+
+def _write_manifest(manifest_path, manifest):
+    tmp_path = f'{manifest_path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=1)
+    os.replace(tmp_path, manifest_path)
+
+
+def collect_radiomics_csv(source_dir, destination_dir, dtype='float64', export_csv=True, compact_ratio=0.5,
+                          dry_run=False):
+    """
+    Hastaların bireysel radyomik CSV dosyalarını tek bir tipli ve indeksli depoda birleştirir.
+
+    Sadece son birleştirmeden sonra eklenen veya değişen CSV'ler okunur. Bir hasta CSV'si
+    silinmişse, indeks sütunları değişmişse (örn. çoklu maske moduna geçildiyse) veya depo ya da
+    kayıt dosyası eksikse depo baştan kurulur.
+
+    Args:
+        source_dir (str): İçinde hasta klasörlerinin bulunduğu klasör.
                           (Örn: 'data/structured')
-        destination_dir (str): Tüm CSV dosyalarının kopyalanacağı yeni hedef klasör.
+        destination_dir (str): Deponun ('radiomics_features.rfs') yazılacağı klasör.
+        dtype (str): Özellik sütunlarının tipi ('float64' veya 'float32').
+        export_csv (bool): True ise depo değiştiğinde 'ALL_PATIENTS_radiomics_features.csv'
+                           dosyası da depodan yeniden üretilir.
+        compact_ratio (float): Geçersiz satırların geçerli satırlara oranı bunu aşarsa depo sıkıştırılır.
+        dry_run (bool): True ise sadece birleştirilecek CSV'ler listelenir; hiçbir dosya yazılmaz.
+
+    Returns:
+        str veya None: Deponun yolu; birleştirilecek CSV bulunamazsa None.
     """
     print(f"Kaynak Klasör: {source_dir}")
     print(f"Hedef Klasör: {destination_dir}")
 
-    # 1. Ana hedef klasörü oluştur (eğer mevcut değilse)
+    # 1. Depo ve kayıt dosyalarının yolları
+    store_path = os.path.join(destination_dir, STORE_FILENAME)
+    manifest_path = os.path.join(destination_dir, MANIFEST_FILENAME)
+
+    # 2. Kaynak klasördeki hasta CSV'lerini bul ve son birleştirmeyle karşılaştır
+    print("\nHasta CSV'leri taranıyor...")
+    patient_csvs = find_patient_csvs(source_dir)
+    if not patient_csvs:
+        print("UYARI: Birleştirilecek hasta CSV'si bulunamadı.")
+        return None
+    signatures = {os.path.relpath(path, source_dir): _csv_signature(path) for _, path in patient_csvs}
+
+    manifest = _load_manifest(manifest_path)
+    rebuild = manifest is None or not os.path.exists(store_path)
+    if not rebuild and set(manifest['files']) - set(signatures):
+        print("BİLGİ: Bazı hasta CSV'leri silinmiş; depo baştan kuruluyor.")
+        rebuild = True
+
+    parsed = {}
+
+    def _parse(relative_path):
+        if relative_path not in parsed:
+            parsed[relative_path] = read_patient_csv(os.path.join(source_dir, relative_path))
+        return parsed[relative_path]
+
+    to_merge = [rel for rel in signatures if rebuild or manifest['files'].get(rel) != signatures[rel]]
+    index_names = None if rebuild else manifest.get('index_names')
+    if to_merge:
+        new_index_names = _parse(to_merge[0])[0]
+        if index_names is not None and new_index_names != index_names:
+            print("BİLGİ: İndeks sütunları değişmiş; depo baştan kuruluyor.")
+            rebuild = True
+            to_merge = list(signatures)
+        index_names = new_index_names
+
+    print(f"{len(to_merge)} yeni veya değişmiş CSV birleştirilecek, "
+          f"{len(signatures) - len(to_merge)} CSV değişmemiş.")
+    if not to_merge:
+        print("\nDepo güncel.")
+        return store_path
+    if dry_run:
+        for relative_path in to_merge:
+            print(f"  -> '{relative_path}' birleştirilecekti.")
+        print("\nDeneme çalışması: Hiçbir dosya yazılmadı.")
+        return store_path
+
+    # Depo modülü NumPy ve pandas'ı yüklediği için sadece gerçekten yazılacaksa içe aktarılır.
+    from feature_store import FeatureStoreWriter, FeatureStoreReader, compact_feature_store
+
+    # 3. CSV'leri depoya ekle. Baştan kurulurken eski kayıt önce silinir ki yarıda kalan bir
+    #    kurulum, eksik bir depoyu tamam sanmasın.
     os.makedirs(destination_dir, exist_ok=True)
-    print(f"'{destination_dir}' klasörü oluşturuldu veya zaten mevcut.")
-
-    # 2. Kaynak klasördeki tüm öğeleri tara
-    print("\nDosyalar ve klasörler taranıyor...")
-    for item_name in os.listdir(source_dir):
-        source_item_path = os.path.join(source_dir, item_name)
-
-        # EĞER ÖĞE BİR KLASÖR İSE (Hasta Klasörü)
-        if os.path.isdir(source_item_path):
-            # Klasörün içine girip .csv uzantılı dosyayı ara
-            for filename in os.listdir(source_item_path):
-                if filename.lower().endswith('.csv'):
-                    # Hedefte bu hasta için yeni bir klasör oluştur
-                    dest_patient_dir = os.path.join(destination_dir, item_name)
-                    os.makedirs(dest_patient_dir, exist_ok=True)
-                    
-                    # CSV dosyasını kopyala
-                    source_csv_path = os.path.join(source_item_path, filename)
-                    shutil.copy2(source_csv_path, dest_patient_dir)
-                    print(f"  -> '{item_name}' klasöründeki '{filename}' kopyalandı.")
-                    break # Bu hasta için CSV bulundu, sonraki hastaya geç
-
-        # EĞER ÖĞE BİR DOSYA İSE ve adı ana CSV ile eşleşiyorsa
-        elif os.path.isfile(source_item_path) and item_name.lower() == 'all_patients_radiomics_features.csv':
-            shutil.copy2(source_item_path, destination_dir)
-            print(f"  -> Ana CSV dosyası '{item_name}' kopyalandı.")
+    if rebuild:
+        manifest = {'files': {}}
+        if os.path.exists(manifest_path):
+            os.remove(manifest_path)
+    manifest['index_names'] = index_names
+
+    with FeatureStoreWriter(store_path, index_names=index_names, dtype=dtype, append=not rebuild) as store:
+        for relative_path in to_merge:
+            csv_index_names, rows = _parse(relative_path)
+            if csv_index_names != index_names:
+                print(f"  UYARI: '{relative_path}' farklı indeks sütunlarına sahip "
+                      f"({', '.join(csv_index_names)}); atlanıyor.")
+                continue
+            store.append_rows(rows)
+            manifest['files'][relative_path] = signatures[relative_path]
+            print(f"  -> '{relative_path}' birleştirildi ({len(rows)} satır).")
+    _write_manifest(manifest_path, manifest)
+
+    # 4. Güncellenen hastaların eski satırları çoğaldıysa depoyu sıkıştır
+    reader = FeatureStoreReader(store_path)
+    n_live = len(reader.row_locations())
+    if reader.n_stale_rows > compact_ratio * n_live:
+        print(f"Depo sıkıştırılıyor ({reader.n_stale_rows} geçersiz satır)...")
+        compact_feature_store(store_path)
+        reader = FeatureStoreReader(store_path)
+
+    print(f"\nDepo güncellendi: {store_path} ({n_live} satır, {len(reader.columns)} özellik sütunu)")
+
+    if export_csv:
+        master_csv_path = os.path.join(destination_dir, MASTER_CSV_FILENAME)
+        reader.export_csv(master_csv_path)
+        print(f"Ana CSV dosyası depodan üretildi: {master_csv_path}")
 
     print("\nİşlem tamamlandı!")
+    return store_path
 
 
 # --- KULLANIM ---
+# Başka modüller (örn. benchmark) fonksiyonları içe aktarabilsin diye, çalıştırma kodu
+# sadece betik doğrudan çalıştırıldığında devreye girer.
+if __name__ == '__main__':
+    # Lütfen bu yolları kendi klasör yapınıza göre güncelleyin.
 
-# Lütfen bu yolları kendi klasör yapınıza göre güncelleyin.
-
-# 1. İçinde hasta klasörlerinin VE birleştirilmiş ana CSV'nin bulunduğu kaynak klasör
-#    Sizin tanımınıza göre bu 'data/structured' klasörü.
-source_directory = 'data/structured'
+    # 1. İçinde hasta klasörlerinin bulunduğu kaynak klasör
+    #    Sizin tanımınıza göre bu 'data/structured' klasörü.
+    source_directory = 'data/structured'
 
-# 2. Tüm CSV'lerin toplanmasını istediğiniz yeni klasörün adı.
-#    Bu klasör mevcut değilse, betik tarafından otomatik olarak oluşturulacaktır.
-csv_destination_folder = 'data/Radyomik_CSV_Ciktilari'
+    # 2. Birleşik özellik deposunun yazılacağı klasörün adı.
+    #    Bu klasör mevcut değilse, betik tarafından otomatik olarak oluşturulacaktır.
+    csv_destination_folder = 'data/Radyomik_CSV_Ciktilari'
 
+    # Depodaki özellik sütunlarının tipi. 'float32' depo boyutunu yarıya indirir.
+    store_dtype = 'float64'
 
-# Fonksiyonu tanımladığınız yollarla çağırın
-collect_radiomics_csv(source_directory, csv_destination_folder)
\ No newline at end of file
+    # Fonksiyonu tanımladığınız yollarla çağırın
+    collect_radiomics_csv(source_directory, csv_destination_folder, dtype=store_dtype)
@@ -1,23 +1,214 @@
 import os
+import json
 import shutil
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
-def organize_data_for_radiomics(source_dir, dest_dir):
+from nrrd_header import nrrd_geometry, geometry_mismatches, same_voxel_grid, DEFAULT_GEOMETRY_TOLERANCE
+from pipeline_config import RADIOMICS_SETTINGS
+
+# --- Dosya Yerleştirme (Staging) Yöntemleri ---
+# 'copy'     : Dosyanın tam bir kopyası oluşturulur (varsayılan, en güvenli).
+# 'hardlink' : Aynı dosyaya ikinci bir isim verilir; ek disk alanı kullanmaz. Kaynak ve hedef
+#              aynı dosya sisteminde olmalıdır. İçerik ortaktır; birinde yapılan değişiklik
+#              diğerinde de görünür.
+# 'reflink'  : Yazma anında kopyalanan (copy-on-write) klon oluşturulur (Btrfs, XFS, APFS...).
+#              Ek disk alanı kullanmaz ve kopyalar birbirinden bağımsızdır.
+# 'symlink'  : Hedefte kaynağı gösteren sembolik bağlantı oluşturulur.
+# Seçilen yöntem mümkün değilse (farklı dosya sistemi, desteklenmeyen işletim sistemi vb.)
+# dosya parça parça kopyalanır.
+STAGING_MODES = ('copy', 'hardlink', 'reflink', 'symlink')
+
+# Parçalı kopyalamada kullanılan okuma/yazma bloğu boyutu (bayt).
+COPY_CHUNK_SIZE = 16 * 1024 * 1024
+
+# Linux'ta reflink için kullanılan ioctl kodu (FICLONE).
+_FICLONE = 0x40049409
+
+
+def _is_up_to_date(source_path, dest_path):
+    """Hedef dosya kaynakla aynı boyut ve değiştirilme zamanına (mtime) sahipse True döndürür."""
+    try:
+        source_stat = os.stat(source_path)
+        dest_stat = os.stat(dest_path)
+    except OSError:
+        return False
+    return (source_stat.st_size == dest_stat.st_size
+            and source_stat.st_mtime_ns == dest_stat.st_mtime_ns)
+
+
+def _reflink(source_path, dest_path):
+    """Dosyanın copy-on-write klonunu oluşturur. Desteklenmiyorsa OSError fırlatır."""
+    import fcntl  # Sadece Unix sistemlerde bulunur; Windows'ta ImportError -> kopyalamaya düşülür.
+
+    with open(source_path, 'rb') as source, open(dest_path, 'wb') as dest:
+        fcntl.ioctl(dest.fileno(), _FICLONE, source.fileno())
+    shutil.copystat(source_path, dest_path)
+
+
+def _chunked_copy(source_path, dest_path):
+    """Dosyayı büyük bloklar halinde kopyalar ve zaman damgalarını korur."""
+    with open(source_path, 'rb') as source, open(dest_path, 'wb') as dest:
+        shutil.copyfileobj(source, dest, COPY_CHUNK_SIZE)
+    shutil.copystat(source_path, dest_path)
+
+
+def stage_file(source_path, dest_path, staging_mode='copy'):
+    """
+    Bir dosyayı seçilen yöntemle hedefe yerleştirir.
+
+    Hedefte boyutu ve değiştirilme zamanı kaynakla aynı olan bir dosya varsa hiçbir şey
+    yapılmaz; böylece bir kohortu yeniden yerleştirmek neredeyse anında biter. Dosya önce
+    geçici bir isimle oluşturulup sonra yerine taşındığı için yarıda kalan bir işlem hedefte
+    bozuk dosya bırakmaz.
+
+    Args:
+        source_path (str): Kaynak dosya yolu.
+        dest_path (str): Hedef dosya yolu.
+        staging_mode (str): 'copy', 'hardlink', 'reflink' veya 'symlink'.
+
+    Returns:
+        str: Kullanılan yöntem ('atlandı' veya STAGING_MODES'tan biri).
+    """
+    if _is_up_to_date(source_path, dest_path):
+        return 'atlandı'
+
+    tmp_path = f'{dest_path}.staging-tmp'
+    if os.path.lexists(tmp_path):
+        os.remove(tmp_path)
+
+    try:
+        if staging_mode == 'hardlink':
+            os.link(source_path, tmp_path)
+        elif staging_mode == 'symlink':
+            os.symlink(os.path.abspath(source_path), tmp_path)
+        elif staging_mode == 'reflink':
+            _reflink(source_path, tmp_path)
+        else:
+            _chunked_copy(source_path, tmp_path)
+        used_mode = staging_mode
+    except (OSError, ImportError):
+        # Bağlantı/klon oluşturulamadıysa parça parça kopyalamaya geri düşüyoruz.
+        if os.path.lexists(tmp_path):
+            os.remove(tmp_path)
+        _chunked_copy(source_path, tmp_path)
+        used_mode = 'copy'
+
+    os.replace(tmp_path, dest_path)
+    return used_mode
+
+
+def _stage_and_cache(source_path, dest_path, staging_mode, build_volume_cache):
+    """Dosyayı yerleştirir ve istenirse hızlı yükleme önbelleğini hazırlar."""
+    used_mode = stage_file(source_path, dest_path, staging_mode)
+    if build_volume_cache:
+        # SimpleITK sadece önbellek istendiğinde yüklenir; düzenleme ve deneme çalışması onsuz başlar.
+        from volume_cache import cache_volume
+        if cache_volume(dest_path):
+            used_mode += ' + hacim önbelleği'
+    return used_mode
+
+
+def preflight_patient(patient_folder_name, segmentation_path, scan_paths, tolerance=None):
+    """
+    Sadece NRRD başlıklarını okuyarak hastanın tarama adaylarını segmentasyonla karşılaştırır.
+
+    Voksel verisi hiç çözülmez; bozuk veya geometrisi uyuşmayan bir vaka milisaniyeler içinde
+    tespit edilir. Segmentasyonla aynı fiziksel uzayda olan (yön ve voksel aralığı aynı, maske
+    taramanın kapsamı içinde) adaylar arasından en çok voksel içeren seçilir. Segment sınırlarına
+    kırpılmış maskeler de eşleşir; bu durumda rapora bir uyarı eklenir.
+
+    Args:
+        patient_folder_name (str): Hasta klasörünün adı.
+        segmentation_path (str): '.seg.nrrd' dosyasının yolu.
+        scan_paths (list): Tarama adayı '.nrrd' dosyalarının yolları.
+        tolerance (float): Geometri karşılaştırma toleransı (bkz. geometry_mismatches). None ise
+                           RADIOMICS_SETTINGS'teki 'geometryTolerance' (o da yoksa ITK varsayılanı).
+
+    Returns:
+        dict: Doğrulama raporu. 'selected' seçilen taramanın yolu (yoksa None), 'status' ise
+              'TAMAM' veya 'HATA'; 'warnings' seçimle ilgili uyarıları içerir.
+    """
+    if tolerance is None:
+        tolerance = RADIOMICS_SETTINGS['setting'].get('geometryTolerance') or DEFAULT_GEOMETRY_TOLERANCE
+    report = {'patient': patient_folder_name, 'segmentation': {'path': segmentation_path},
+              'candidates': [], 'selected': None, 'status': 'HATA', 'warnings': []}
+
+    try:
+        segmentation_geometry = nrrd_geometry(segmentation_path)
+        report['segmentation']['geometry'] = segmentation_geometry
+    except (OSError, ValueError, KeyError, IndexError) as e:
+        report['segmentation']['error'] = f"Başlık okunamadı: {e}"
+        return report
+
+    matching = []
+    for scan_path in scan_paths:
+        candidate = {'path': scan_path, 'file_size': os.path.getsize(scan_path)}
+        try:
+            candidate['geometry'] = nrrd_geometry(scan_path)
+        except (OSError, ValueError, KeyError, IndexError) as e:
+            candidate['error'] = f"Başlık okunamadı: {e}"
+            report['candidates'].append(candidate)
+            continue
+        candidate['mismatches'] = geometry_mismatches(candidate['geometry'], segmentation_geometry, tolerance)
+        candidate['same_grid'] = same_voxel_grid(candidate['geometry'], segmentation_geometry, tolerance)
+        if not candidate['mismatches']:
+            matching.append(candidate)
+        report['candidates'].append(candidate)
+
+    if matching:
+        # Eşleşen adaylardan en çok voksel (ve kanal) içereni, eşitlikte en büyük dosyayı seçiyoruz.
+        best = max(matching, key=lambda c: (c['geometry']['voxels'] * c['geometry']['components'], c['file_size']))
+        report['selected'] = best['path']
+        report['status'] = 'TAMAM'
+        if not best['same_grid']:
+            report['warnings'].append("Segmentasyon taramanın bir alt bölgesini kapsıyor (kırpılmış veya kaydırılmış "
+                                      "ızgara); PyRadiomics'te maskenin yeniden örneklenmesi ('correctMask') gerekebilir.")
+    return report
+
+
+def organize_data_for_radiomics(source_dir, dest_dir, staging_mode='copy', max_workers=4,
+                                require_geometry_match=False, build_volume_cache=False, dry_run=False):
     """
     Dağınık bir veri setini, radyomik analizi için yapılandırılmış bir formata getirir.
 
-    Her hasta klasöründen '.seg.nrrd' dosyasını ve en büyük boyutlu '.nrrd' dosyasını
-    alarak hedef klasörde yeni bir yapı oluşturur.
+    Her hasta klasöründen '.seg.nrrd' dosyasını ve onunla aynı fiziksel uzaydaki en büyük
+    '.nrrd' taramasını alarak hedef klasörde yeni bir yapı oluşturur. Seçim sadece NRRD
+    başlıkları okunarak yapılır ve her hasta için '<dest_dir>/.preflight/<hasta>.json'
+    doğrulama raporu yazılır.
+
+    Dosyalar 'staging_mode' ile seçilen yöntemle (kopya, hard link, reflink veya sembolik
+    bağlantı) yerleştirilir ve hastalar paralel işlenir. Hedefte zaten güncel olan
+    dosyalar atlanır.
 
     Args:
         source_dir (str): Dağınık hasta klasörlerinin bulunduğu ana kaynak klasör.
         dest_dir (str): Düzenlenmiş verilerin kaydedileceği ana hedef klasör.
+        staging_mode (str): 'copy', 'hardlink', 'reflink' veya 'symlink'.
+        max_workers (int): Aynı anda yerleştirilecek en fazla dosya sayısı.
+        require_geometry_match (bool): False ise (varsayılan) segmentasyonla eşleşen tarama
+                                       bulunamayan hastalarda eski davranışla en büyük dosya seçilir
+                                       ve uyarı ön kontrol raporuna yazılır. True ise bu hastalar atlanır.
+        build_volume_cache (bool): True ise yerleştirilen her NRRD için sıkıştırılmamış,
+                                   bellek eşlemeli önbellek kaydı hazırlanır (bkz. volume_cache).
+        dry_run (bool): True ise ön kontrol yapılır ve yerleştirilecek dosyalar listelenir; hedefte
+                        hiçbir klasör veya dosya oluşturulmaz.
     """
+    if staging_mode not in STAGING_MODES:
+        raise ValueError(f"Geçersiz staging_mode: '{staging_mode}'. Seçenekler: {', '.join(STAGING_MODES)}")
+
     print(f"Veri düzenleme işlemi başlatıldı.")
     print(f"Kaynak Klasör: {source_dir}")
     print(f"Hedef Klasör: {dest_dir}")
+    print(f"Yerleştirme Yöntemi: {staging_mode}")
 
-    # 1. Hedef ana klasörü oluştur (eğer mevcut değilse)
-    os.makedirs(dest_dir, exist_ok=True)
+    # 1. Hedef ana klasörü ve doğrulama raporları klasörünü oluştur (eğer mevcut değilse)
+    preflight_dir = os.path.join(dest_dir, '.preflight')
+    if not dry_run:
+        os.makedirs(preflight_dir, exist_ok=True)
+    failed_patients = []
+
+    # Yerleştirilecek dosyaları önce topluyoruz, sonra paralel olarak yerleştiriyoruz.
+    staging_jobs = []
 
     # Kaynak klasördeki tüm öğeleri (hasta klasörleri) tara
     for patient_folder_name in os.listdir(source_dir):
@@ -43,51 +234,120 @@ def organize_data_for_radiomics(source_dir, dest_dir):
                 elif filename.lower().endswith('.nrrd'):
                     file_size = os.path.getsize(file_path)
                     scan_candidates.append((file_path, file_size))
-            
-            # 4. En büyük tarama dosyasını seç
+
             if not scan_candidates:
                 print(f"  UYARI: {patient_folder_name} içinde '.nrrd' uzantılı tarama dosyası bulunamadı. Atlanıyor.")
                 continue
-            
-            # Boyuta göre en büyük olanı bul
-            largest_scan_path, largest_size = max(scan_candidates, key=lambda item: item[1])
-            print(f"  -> En büyük tarama dosyası bulundu: {os.path.basename(largest_scan_path)} (Boyut: {largest_size / (1024*1024):.2f} MB)")
 
             # Segmentasyon dosyasının bulunduğundan emin ol
             if not segmentation_source_path:
                 print(f"  UYARI: {patient_folder_name} içinde '.seg.nrrd' uzantılı dosya bulunamadı. Atlanıyor.")
                 continue
 
-            # 5. Yeni klasör yapısını oluştur ve dosyaları kopyala
+            # 4. Ön kontrol: Sadece başlıkları okuyarak segmentasyonla eşleşen taramayı seç
+            report = preflight_patient(patient_folder_name, segmentation_source_path,
+                                       [path for path, _ in scan_candidates])
+            if report['status'] != 'TAMAM' and not require_geometry_match:
+                # Eski davranış: Geometriye bakmadan boyuta göre en büyük dosyayı seç.
+                largest_scan_path, _ = max(scan_candidates, key=lambda item: item[1])
+                report['selected'] = largest_scan_path
+                report['status'] = 'UYARI'
+                report['warnings'].append("Segmentasyonla geometrisi eşleşen tarama bulunamadı; en büyük dosya "
+                                          "seçildi. PyRadiomics geometri uyuşmazlığı hatası verebilir.")
+
+            if not dry_run:
+                with open(os.path.join(preflight_dir, f'{patient_folder_name}.json'), 'w', encoding='utf-8') as f:
+                    json.dump(report, f, ensure_ascii=False, indent=2)
+
+            if report['status'] == 'HATA':
+                failed_patients.append(patient_folder_name)
+                print(f"  HATA: {patient_folder_name} ön kontrolden geçemedi. Atlanıyor.")
+                if 'error' in report['segmentation']:
+                    print(f"     - Segmentasyon: {report['segmentation']['error']}")
+                for candidate in report['candidates']:
+                    problems = [candidate['error']] if 'error' in candidate else candidate['mismatches']
+                    print(f"     - {os.path.basename(candidate['path'])}: {'; '.join(problems)}")
+                continue
+
+            largest_scan_path = report['selected']
+            largest_size = os.path.getsize(largest_scan_path)
+            for warning in report['warnings']:
+                print(f"  UYARI: {warning}")
+            print(f"  -> Tarama dosyası seçildi: {os.path.basename(largest_scan_path)} (Boyut: {largest_size / (1024*1024):.2f} MB)")
+
+            # 5. Yeni klasör yapısını oluştur
             # Hedefte yeni hasta klasörünü oluştur
             dest_patient_dir = os.path.join(dest_dir, patient_folder_name)
-            os.makedirs(dest_patient_dir, exist_ok=True)
+            if not dry_run:
+                os.makedirs(dest_patient_dir, exist_ok=True)
 
             # Hedef dosya yollarını belirle (yeni isimleriyle)
             dest_scan_path = os.path.join(dest_patient_dir, 'scan.nrrd')
             dest_segmentation_path = os.path.join(dest_patient_dir, 'segmentation.nrrd')
 
-            # Dosyaları kopyala ve yeniden adlandır
-            shutil.copy2(largest_scan_path, dest_scan_path)
-            shutil.copy2(segmentation_source_path, dest_segmentation_path)
-            
-            print(f"  -> Dosyalar başarıyla '{dest_patient_dir}' klasörüne kopyalandı.")
+            staging_jobs.append((patient_folder_name, largest_scan_path, dest_scan_path))
+            staging_jobs.append((patient_folder_name, segmentation_source_path, dest_segmentation_path))
+
+    if dry_run:
+        n_up_to_date = sum(1 for _, source_path, dest_path in staging_jobs if _is_up_to_date(source_path, dest_path))
+        print(f"\nDeneme çalışması: {len(staging_jobs)} dosya yerleştirilecekti "
+              f"({n_up_to_date} dosya hedefte zaten güncel), {len(failed_patients)} hasta ön kontrolden geçemedi.")
+        print("Hiçbir dosya yazılmadı.")
+        return
+
+    # 6. Dosyaları seçilen yöntemle ve paralel olarak hedefe yerleştir
+    print(f"\n{len(staging_jobs)} dosya yerleştiriliyor...")
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            executor.submit(_stage_and_cache, source_path, dest_path, staging_mode, build_volume_cache):
+                (patient_folder_name, dest_path)
+            for patient_folder_name, source_path, dest_path in staging_jobs
+        }
+        for future in as_completed(futures):
+            patient_folder_name, dest_path = futures[future]
+            try:
+                used_mode = future.result()
+                print(f"  -> {patient_folder_name}/{os.path.basename(dest_path)}: {used_mode}")
+            except Exception as e:
+                print(f"  HATA: {patient_folder_name}/{os.path.basename(dest_path)} yerleştirilemedi: {e}")
+
+    if failed_patients:
+        print(f"\n{len(failed_patients)} hasta ön kontrolden geçemedi (raporlar: {preflight_dir}):")
+        for patient_folder_name in failed_patients:
+            print(f"  - {patient_folder_name}")
 
     print("\nTüm işlemler tamamlandı!")
 
 # --- BETİĞİ KULLANMA ---
+# Başka modüller (örn. benchmark) fonksiyonları içe aktarabilsin diye, çalıştırma kodu
+# sadece betik doğrudan çalıştırıldığında devreye girer.
+if __name__ == '__main__':
+    # LÜTFEN BU 2 SATIRI DEĞİŞTİRİN:
+
+    # 1. Dağınık verilerinizin bulunduğu ana klasörün yolu
+    # Örnek: "C:/Users/Kullanici/Desktop/Ham_Veriler"
+    source_folder = 'data/raw/Hastalar'
+
+    # 2. Düzenlenmiş verilerin kaydedileceği yeni klasörün yolu
+    # Bu klasör mevcut değilse, betik tarafından otomatik olarak oluşturulacaktır.
+    # Örnek: "C:/Users/Kullanici/Desktop/Duzenlenmis_Veriler"
+    destination_folder = 'data/structured'
 
-# LÜTFEN BU 2 SATIRI DEĞİŞTİRİN:
+    # 3. Dosyaların hedefe nasıl yerleştirileceği: 'copy', 'hardlink', 'reflink' veya 'symlink'.
+    # 'hardlink' ve 'reflink' ek disk alanı kullanmaz; mümkün olmadığında kopyalamaya geri düşülür.
+    staging_mode = 'copy'
 
-# 1. Dağınık verilerinizin bulunduğu ana klasörün yolu
-# Örnek: "C:/Users/Kullanici/Desktop/Ham_Veriler"
-source_folder = 'data/raw/Hastalar' 
+    # 4. True ise, segmentasyonla aynı fiziksel uzayda (yön, voksel aralığı, kapsam) tarama
+    # bulunamayan hastalar atlanır. False ise en büyük dosya seçilir ve uyarı verilir.
+    # Raporlar her iki durumda da '<hedef klasör>/.preflight/' içine yazılır.
+    require_geometry_match = False
 
-# 2. Düzenlenmiş verilerin kaydedileceği yeni klasörün yolu
-# Bu klasör mevcut değilse, betik tarafından otomatik olarak oluşturulacaktır.
-# Örnek: "C:/Users/Kullanici/Desktop/Duzenlenmis_Veriler"
-destination_folder = 'data/structured'
+    # 5. True ise yerleştirilen NRRD'ler bir kez sıkıştırılmamış önbelleğe ('<hasta>/.volume_cache')
+    # dönüştürülür; extractor ve görüntüleyici 'use_volume_cache' ile bunları anında açar.
+    build_volume_cache = False
 
 
-# Fonksiyonu tanımladığınız yollarla çağırın
-organize_data_for_radiomics(source_folder, destination_folder)
\ No newline at end of file
+    # Fonksiyonu tanımladığınız yollarla çağırın
+    organize_data_for_radiomics(source_folder, destination_folder, staging_mode=staging_mode,
+                                require_geometry_match=require_geometry_match,
+                                build_volume_cache=build_volume_cache)
@@ -0,0 +1,119 @@
+import os
+import json
+import hashlib
+import socket
+
+
+class ExtractionCache:
+    """
+    Hasta bazında, içerik özetiyle (hash) anahtarlanmış kalıcı radyomik sonuç önbelleği.
+
+    Her hasta için '<cache_dir>/<patient_id>.json' dosyasında; anahtar, tarama ve maske
+    dosyalarının özet bilgileri ve çıkarılan özellik satırları saklanır. Anahtar; 'scan.nrrd' ve
+    'segmentation.nrrd' dosyalarının SHA-256 özetlerinden, extractor ayarlarından ve
+    PyRadiomics sürümünden üretilir. Bunlardan biri değişirse hasta yeniden hesaplanır.
+
+    Dosyaların boyutu ve değiştirilme zamanı (mtime) kayıttakiyle aynıysa, kayıtlı özet
+    yeniden kullanılır ve dosya tekrar okunmaz. Böylece değişmeyen bir kohortta anahtar
+    kontrolü saniyeler sürer.
+    """
+
+    def __init__(self, cache_dir, config):
+        """
+        Args:
+            cache_dir (str): Önbellek kayıtlarının tutulacağı klasör.
+            config (dict): Sonucu etkileyen tüm ayarlar (extractor ayarları, sürüm vb.).
+                           JSON'a çevrilebilir olmalıdır; olmayan değerler str() ile yazılır.
+        """
+        self.cache_dir = cache_dir
+        self.config_digest = hashlib.sha256(
+            json.dumps(config, sort_keys=True, default=str).encode('utf-8')
+        ).hexdigest()
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _entry_path(self, patient_id):
+        return os.path.join(self.cache_dir, f'{patient_id}.json')
+
+    def _read_entry(self, patient_id):
+        try:
+            with open(self._entry_path(patient_id), encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            # Kayıt yoksa veya yarım kalmış/bozuksa önbellekte yok sayıyoruz.
+            return None
+
+    @staticmethod
+    def _file_info(path, previous=None, chunk_size=1024 * 1024):
+        """Dosyanın boyut, mtime ve SHA-256 bilgisini döndürür; mümkünse kayıtlı özeti kullanır."""
+        stat = os.stat(path)
+        if previous and previous.get('size') == stat.st_size and previous.get('mtime_ns') == stat.st_mtime_ns:
+            return previous
+
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(chunk_size), b''):
+                digest.update(chunk)
+        return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha256': digest.hexdigest()}
+
+    def lookup(self, patient_id, input_paths):
+        """
+        Hastanın güncel anahtarını hesaplar ve önbellekte geçerli bir sonuç varsa döndürür.
+
+        Args:
+            patient_id (str): Hasta kimliği.
+            input_paths (dict): Sonucu belirleyen girdi dosyaları, örn. {'scan': ..., 'mask': ...}.
+
+        Returns:
+            tuple: (entry, rows). 'entry', store() için gereken anahtar bilgisidir;
+                   'rows' önbellekte geçerli kayıt yoksa None olur.
+        """
+        previous = self._read_entry(patient_id) or {}
+        files = {
+            name: self._file_info(path, previous.get('files', {}).get(name))
+            for name, path in sorted(input_paths.items())
+        }
+        key = hashlib.sha256(json.dumps(
+            {'config': self.config_digest, 'files': {n: i['sha256'] for n, i in files.items()}},
+            sort_keys=True,
+        ).encode('utf-8')).hexdigest()
+
+        entry = {'key': key, 'files': files}
+        if previous.get('key') == key and 'rows' in previous:
+            return entry, previous['rows']
+        return entry, None
+
+    def store(self, patient_id, entry, rows):
+        """
+        Hastanın sonucunu önbelleğe atomik olarak yazar.
+
+        Önce geçici dosyaya yazılıp sonra yeniden adlandırıldığı için, çalışma yarıda
+        kesilse bile önbellekte yarım kayıt kalmaz.
+
+        Args:
+            patient_id (str): Hasta kimliği.
+            entry (dict): lookup() tarafından döndürülen anahtar bilgisi.
+            rows (list): Hastanın özellik satırları (sütun adı -> değer sözlükleri).
+        """
+        record = dict(entry)
+        record['rows'] = [{key: _to_json_value(val) for key, val in row.items()} for row in rows]
+
+        entry_path = self._entry_path(patient_id)
+        # Paylaşılan klasörde birden fazla makine aynı anda yazabilir; geçici dosya adı
+        # süreç numarasıyla birlikte makine adını da içerir.
+        tmp_path = f'{entry_path}.{socket.gethostname()}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(record, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, entry_path)
+
+
+def _to_json_value(value):
+    """PyRadiomics'in döndürdüğü NumPy değerlerini JSON'a yazılabilir hale getirir."""
+    # Kimlik sütunları ('PatientID', 'Mask', 'Label') olduğu gibi saklanır.
+    if isinstance(value, (str, int)):
+        return value
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return str(value)
@@ -0,0 +1,426 @@
+import os
+import csv
+import re
+
+from pipeline_config import RADIOMICS_SETTINGS, DEFAULT_MASK_NAMES, find_patient_folders, patient_input_paths
+from nrrd_header import nrrd_geometry
+
+# --- İstenen Özelliklerden En Küçük Çıkarım Planı ---
+# Üretimde modelimiz 1500'den fazla sütunun sadece birkaç yüzünü kullanıyor. Bu modül, istenen
+# sütun adlarından (örn. 'wavelet-LLH_glcm_Correlation') hangi görüntü tiplerinin, filtre
+# parametrelerinin, özellik sınıflarının ve tek tek özelliklerin gerektiğini çıkarır.
+#
+# PyRadiomics sütun adları '<türetilmiş görüntü>_<özellik sınıfı>_<özellik>' biçimindedir.
+# Türetilmiş görüntü adı görüntü tipini ve parametresini içerir:
+#   original, square, squareroot, logarithm, exponential, gradient
+#   wavelet-LLH, wavelet2-HHL ...       (Wavelet; '2' seviye numarasıdır)
+#   log-sigma-3-0-mm-3D                 (LoG; sigma = 3.0 mm)
+#   lbp-2D, lbp-3D-m1, lbp-3D-k ...     (LBP2D / LBP3D)
+# Bu modül PyRadiomics'i içe aktarmaz; plan, radiomics_extractor tarafından çalıştırılır. Aynı nedenle
+# komut satırı aracının deneme çalışması (plan_extraction_run) da buradadır.
+
+FEATURE_CLASSES = ('shape', 'shape2D', 'firstorder', 'glcm', 'glrlm', 'glszm', 'gldm', 'ngtdm')
+
+# Çıktılarda özellik olmayan (kimlik) sütunlar; gerekli özellik listesi okunurken atlanır.
+INDEX_COLUMNS = ('PatientID', 'Mask', 'Label')
+
+_SIMPLE_IMAGE_TYPES = {
+    'original': 'Original',
+    'square': 'Square',
+    'squareroot': 'SquareRoot',
+    'logarithm': 'Logarithm',
+    'exponential': 'Exponential',
+    'gradient': 'Gradient',
+    'lbp-2D': 'LBP2D',
+}
+_WAVELET_RE = re.compile(r'^wavelet(\d*)-([LH]+)$')
+_LOG_RE = re.compile(r'^log-sigma-(.+)-mm-([23])D$')
+_LBP3D_RE = re.compile(r'^lbp-3D-(m\d+|k)$')
+
+# Profil özeti yoksa kullanılan kaba göreli maliyetler (birim: bir türetilmiş görüntü için
+# birinci dereceden (firstorder) özelliklerin hesaplanma süresi). Gerçek maliyetler için
+# extractor'ı profile=True ile çalıştırın; özet dosyası varsa bu tablo yerine o kullanılır.
+DEFAULT_CLASS_COSTS = {'shape': 2.0, 'shape2D': 1.0, 'firstorder': 1.0, 'glcm': 6.0, 'glrlm': 3.0,
+                       'glszm': 3.0, 'gldm': 3.0, 'ngtdm': 2.0}
+DEFAULT_FILTER_COST = 1.0
+
+
+def parse_feature_name(feature_name):
+    """
+    PyRadiomics sütun adını parçalarına ayırır.
+
+    Args:
+        feature_name (str): Örn. 'log-sigma-3-0-mm-3D_glszm_ZonePercentage'.
+
+    Returns:
+        dict: 'image' (türetilmiş görüntü adı), 'image_type', 'args' (görüntü tipi parametreleri),
+              'feature_class' ve 'feature'.
+
+    Raises:
+        ValueError: Ad tanınmıyorsa.
+    """
+    parts = feature_name.split('_', 2)
+    if len(parts) != 3 or parts[1] not in FEATURE_CLASSES:
+        raise ValueError(f"Tanınmayan özellik adı: '{feature_name}'")
+    image_name, feature_class, feature = parts
+
+    args = {}
+    if image_name in _SIMPLE_IMAGE_TYPES:
+        image_type = _SIMPLE_IMAGE_TYPES[image_name]
+    elif _WAVELET_RE.match(image_name):
+        image_type = 'Wavelet'
+        level = _WAVELET_RE.match(image_name).group(1)
+        args['level'] = int(level) if level else 1
+    elif _LOG_RE.match(image_name):
+        image_type = 'LoG'
+        args['sigma'] = float(_LOG_RE.match(image_name).group(1).replace('-', '.'))
+    elif _LBP3D_RE.match(image_name):
+        image_type = 'LBP3D'
+        level = _LBP3D_RE.match(image_name).group(1)
+        if level != 'k':
+            args['lbp3DLevels'] = int(level[1:])
+    else:
+        raise ValueError(f"'{feature_name}' içindeki görüntü tipi tanınmadı: '{image_name}'")
+
+    if feature_class.startswith('shape') and image_type != 'Original':
+        raise ValueError(f"Şekil özellikleri sadece 'original' görüntüde bulunur: '{feature_name}'")
+
+    return {'image': image_name, 'image_type': image_type, 'args': args,
+            'feature_class': feature_class, 'feature': feature}
+
+
+def read_required_features(source):
+    """
+    Gerekli özellik listesini okur.
+
+    Args:
+        source (list veya str): Sütun adları listesi, her satırda bir ad içeren bir metin dosyası
+                                veya başlık satırı gerekli sütunları içeren bir CSV dosyası.
+
+    Returns:
+        list: Sıralı ve tekrarsız sütun adları (kimlik sütunları hariç).
+    """
+    if isinstance(source, str):
+        with open(source, encoding='utf-8') as f:
+            if source.lower().endswith('.csv'):
+                names = next(csv.reader(f))
+            else:
+                names = [line.strip() for line in f if line.strip() and not line.startswith('#')]
+    else:
+        names = list(source)
+
+    seen = {}
+    for name in names:
+        if name not in INDEX_COLUMNS and not name.startswith('diagnostics'):
+            seen.setdefault(name, None)
+    return list(seen)
+
+
+def build_extraction_plan(required_features):
+    """
+    Gerekli sütunları üretmek için gereken en küçük çıkarım planını oluşturur.
+
+    Args:
+        required_features (list): İstenen sütun adları (bkz. read_required_features).
+
+    Returns:
+        dict:
+            'required': İstenen sütunlar (çıktı sütun sırası).
+            'image_types': Görüntü tipi -> PyRadiomics parametreleri (enableImageTypes için).
+            'feature_classes': Özellik sınıfı -> özellik adları (enableFeaturesByName için).
+            'images': Türetilmiş görüntü adı -> {özellik sınıfı: özellik adları}. Her türetilmiş
+                      görüntüde sadece kendisinden istenen özellikler hesaplanır.
+            'extra_passes': Görüntü tipi -> ek çalıştırmaların parametreleri (bkz. image_type_passes).
+
+    Raises:
+        ValueError: Tanınmayan sütun adları varsa (hepsi mesajda listelenir).
+    """
+    image_types, feature_classes, images = {}, {}, {}
+    errors = []
+    for name in required_features:
+        try:
+            parsed = parse_feature_name(name)
+        except ValueError as e:
+            errors.append(str(e))
+            continue
+
+        image_type, args = parsed['image_type'], parsed['args']
+        type_args = image_types.setdefault(image_type, {})
+        if 'sigma' in args:
+            type_args['sigma'] = sorted(set(type_args.get('sigma', [])) | {args['sigma']})
+        for key in ('level', 'lbp3DLevels'):
+            # Sadece varsayılandan (1 / 2) daha fazla seviye gerekiyorsa parametre eklenir.
+            default = 1 if key == 'level' else 2
+            if args.get(key, 0) > max(type_args.get(key, 0), default):
+                type_args[key] = args[key]
+
+        for container in (feature_classes.setdefault(parsed['feature_class'], []),
+                          images.setdefault(parsed['image'], {}).setdefault(parsed['feature_class'], [])):
+            if parsed['feature'] not in container:
+                container.append(parsed['feature'])
+
+    if errors:
+        raise ValueError("Gerekli özellik listesinde hatalar var:\n  " + "\n  ".join(errors))
+
+    # Şekil özellikleri görüntü tipinden bağımsız hesaplanır; sadece şekil isteniyorsa
+    # Original görüntü tipi etkinleştirilmez.
+    if 'Original' in image_types and not any(cls for cls in images.get('original', {})
+                                             if not cls.startswith('shape')):
+        del image_types['Original']
+
+    # PyRadiomics'in wavelet'i sadece en derin seviyenin yaklaşık (örn. LLL) görüntüsünü üretir;
+    # 'wavelet2-*' ile birlikte 'wavelet-LLL' de isteniyorsa 1. seviye ayrıca çalıştırılır.
+    extra_passes = {}
+    if 'Wavelet' in image_types:
+        deepest = image_types['Wavelet'].get('level', 1)
+        approximation_levels = sorted({int(match.group(1) or 1) for match in map(_WAVELET_RE.match, images)
+                                       if match and set(match.group(2)) == {'L'}})
+        extra_passes['Wavelet'] = [dict(image_types['Wavelet'], level=level)
+                                   for level in approximation_levels if level < deepest]
+    extra_passes = {image_type: passes for image_type, passes in extra_passes.items() if passes}
+
+    return {'required': list(required_features), 'image_types': image_types,
+            'feature_classes': feature_classes, 'images': images, 'extra_passes': extra_passes}
+
+
+def image_type_passes(image_types, extra_passes=None):
+    """
+    Görüntü tipi üreteçlerinin (örn. getWaveletImage) hangi parametrelerle çağrılacağını döndürür.
+
+    Etkin her görüntü tipi bir kez çalıştırılır; ardından planın ek çalıştırmaları gelir. Ek
+    çalıştırmaların ürettiği ve daha önce üretilmiş görüntüler atlanmalıdır.
+
+    Args:
+        image_types (dict): Görüntü tipi -> parametreler (örn. extractor.enabledImagetypes).
+        extra_passes (dict): Planın 'extra_passes' sözlüğü. Sadece etkin tiplerinkiler eklenir.
+
+    Returns:
+        list: (görüntü tipi, parametreler) ikilileri.
+    """
+    passes = list(image_types.items())
+    for image_type in image_types:
+        passes.extend((image_type, args) for args in (extra_passes or {}).get(image_type, []))
+    return passes
+
+
+def check_plan_coverage(plan, settings=None):
+    """
+    Plandaki her sütunun türetilmiş görüntüsünün, planın çalıştırmalarınca üretildiğini doğrular.
+
+    Aksi halde bu sütunlar her hastada sessizce boş (NaN) kalırdı (örn. 'force2D' ayarıyla
+    '-3D' adlı bir LoG sütunu veya en derin seviye dışındaki bir wavelet yaklaşık görüntüsü).
+
+    Args:
+        plan (dict): build_extraction_plan çıktısı.
+        settings (dict): Görüntü tipi parametreleriyle birleştirilecek genel ayarlar.
+
+    Raises:
+        ValueError: Üretilmeyecek sütunlar varsa (hepsi mesajda listelenir).
+    """
+    settings = settings or {}
+    dimensions = 2 if settings.get('force2D', False) else 3
+    produced = set()
+    for image_type, custom_args in image_type_passes(plan['image_types'], plan.get('extra_passes')):
+        args = dict(settings)
+        args.update(custom_args or {})
+        produced.update(derived_image_names(image_type, args, dimensions))
+
+    # Şekil özellikleri türetilmiş görüntülerden bağımsız hesaplanır.
+    missing = [name for name in plan['required']
+               if not name.split('_', 2)[1].startswith('shape') and name.split('_', 1)[0] not in produced]
+    if missing:
+        raise ValueError("Plan şu sütunları üretmiyor:\n  " + "\n  ".join(missing))
+
+
+def derived_image_names(image_type, args, dimensions=3):
+    """
+    Bir görüntü tipinin, verilen parametrelerle üreteceği türetilmiş görüntü adlarını döndürür.
+
+    Args:
+        image_type (str): PyRadiomics görüntü tipi (örn. 'Wavelet').
+        args (dict): Genel ayarlarla birleştirilmiş görüntü tipi parametreleri.
+        dimensions (int): Filtrelenen eksen sayısı (force2D ile 2).
+
+    Returns:
+        list: Türetilmiş görüntü adları.
+    """
+    if image_type == 'Wavelet':
+        names = []
+        levels = args.get('level', 1)
+        bands = [format(i, f'0{dimensions}b').replace('0', 'L').replace('1', 'H')
+                 for i in range(1, 2 ** dimensions)]
+        for level in range(1, levels + 1):
+            prefix = 'wavelet' if level == 1 else f'wavelet{level}'
+            names.extend(f'{prefix}-{band}' for band in bands)
+        names.append(f"{'wavelet' if levels == 1 else f'wavelet{levels}'}-{'L' * dimensions}")
+        return names
+    if image_type == 'LoG':
+        return [f"log-sigma-{str(float(s)).replace('.', '-')}-mm-{dimensions}D" for s in args.get('sigma', [])]
+    if image_type == 'LBP3D':
+        return [f'lbp-3D-m{level}' for level in range(1, args.get('lbp3DLevels', 2) + 1)] + ['lbp-3D-k']
+    reverse = {v: k for k, v in _SIMPLE_IMAGE_TYPES.items()}
+    return [reverse[image_type]] if image_type in reverse else []
+
+
+def _load_profile_costs(profile_summary_path):
+    """Profil özetinden (görüntü tipi, sınıf) ve filtre başına ortalama süreleri okur."""
+    class_costs, filter_costs = {}, {}
+    with open(profile_summary_path, newline='', encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            calls = int(row['calls'] or 0)
+            if not calls:
+                continue
+            per_call = float(row['total_seconds']) / calls
+            if row['stage'] == 'features':
+                class_costs[(row['image_type'], row['feature_class'])] = per_call
+            elif row['stage'] == 'filter':
+                filter_costs[row['image_type']] = per_call
+    return class_costs, filter_costs
+
+
+def estimate_plan_cost(image_types, feature_classes, images=None, settings=None, profile_summary_path=None,
+                       extra_passes=None):
+    """
+    Bir planın hasta başına göreli maliyetini tahmin eder.
+
+    Maliyet = (üretilen her türetilmiş görüntünün filtre maliyeti)
+            + (her türetilmiş görüntüde hesaplanan her özellik sınıfının maliyeti).
+    Bir görüntü tipi etkinse tüm türetilmiş görüntüleri üretilir (örn. tek bir wavelet bandı için
+    bile tüm bantlar hesaplanır); özellikler ise sadece istenen görüntülerde hesaplanır.
+
+    Args:
+        image_types (dict): Görüntü tipi -> parametreler.
+        feature_classes (dict): Etkin özellik sınıfları (şekil sınıfları hasta başına bir kez sayılır).
+        images (dict): Türetilmiş görüntü adı -> hesaplanacak özellik sınıfları. None ise (tam
+                       çalışma) etkin sınıfların hepsi her türetilmiş görüntüde hesaplanır.
+        settings (dict): Görüntü tipi parametreleriyle birleştirilecek genel ayarlar.
+        profile_summary_path (str): Varsa 'radiomics_profile_summary.csv'; süreler oradan alınır.
+        extra_passes (dict): Planın ek çalıştırmaları (bkz. image_type_passes).
+
+    Returns:
+        dict: 'derived_images', 'class_evaluations', 'cost' ve 'unit' ('sn' veya 'birim').
+    """
+    class_costs, filter_costs = {}, {}
+    default_class_cost, default_filter_cost = DEFAULT_CLASS_COSTS, DEFAULT_FILTER_COST
+    unit = 'birim'
+    if profile_summary_path and os.path.exists(profile_summary_path):
+        # Profilde ölçülmemiş adımlar (örn. profil çalışmasında kapalı olan bir tip) sıfır sayılır.
+        class_costs, filter_costs = _load_profile_costs(profile_summary_path)
+        default_class_cost, default_filter_cost = {}, 0.0
+        unit = 'sn'
+
+    settings = settings or {}
+    dimensions = 2 if settings.get('force2D', False) else 3
+    texture_classes = [cls for cls in feature_classes if not cls.startswith('shape')]
+    n_images, n_evaluations, cost = 0, 0, 0.0
+    computed = set()
+    for image_type, custom_args in image_type_passes(image_types, extra_passes):
+        args = dict(settings)
+        args.update(custom_args or {})
+        for image_name in derived_image_names(image_type, args, dimensions):
+            n_images += 1
+            if image_type != 'Original':
+                cost += filter_costs.get(image_type, default_filter_cost)
+            if image_name in computed:
+                continue
+            computed.add(image_name)
+            classes = texture_classes if images is None else images.get(image_name, ())
+            for feature_class in classes:
+                if feature_class.startswith('shape'):
+                    continue
+                n_evaluations += 1
+                cost += class_costs.get((image_type, feature_class), default_class_cost.get(feature_class, 0.0))
+
+    # Şekil özellikleri hasta başına bir kez hesaplanır.
+    for feature_class in feature_classes:
+        if feature_class.startswith('shape'):
+            n_evaluations += 1
+            cost += class_costs.get(('Original', 'shape'), default_class_cost.get(feature_class, 0.0))
+
+    return {'derived_images': n_images, 'class_evaluations': n_evaluations, 'cost': cost, 'unit': unit}
+
+
+def print_plan_summary(plan, full_estimate, plan_estimate, n_full_features):
+    """Planı ve tam çalışmaya göre tahmini kazancı konsola yazdırır."""
+    print("\n--- En Küçük Çıkarım Planı ---")
+    print(f"İstenen sütun: {len(plan['required'])} (tam çalışmada {n_full_features})")
+    for image_type, args in image_type_passes(plan['image_types'], plan.get('extra_passes')):
+        print(f"  Görüntü tipi: {image_type}" + (f" {args}" if args else ''))
+    for feature_class, features in plan['feature_classes'].items():
+        print(f"  Özellik sınıfı: {feature_class} ({len(features)} özellik)")
+    print(f"Türetilmiş görüntü: {full_estimate['derived_images']} -> {plan_estimate['derived_images']}")
+    print(f"Görüntü x sınıf hesabı: {full_estimate['class_evaluations']} -> {plan_estimate['class_evaluations']}")
+    if full_estimate['cost'] > 0:
+        saving = 100 * (1 - plan_estimate['cost'] / full_estimate['cost'])
+        print(f"Tahmini maliyet ({full_estimate['unit']}/hasta): {full_estimate['cost']:.1f} -> "
+              f"{plan_estimate['cost']:.1f} (yaklaşık %{saving:.0f} tasarruf)")
+
+
+def plan_extraction_run(data_folder_path, mask_names=DEFAULT_MASK_NAMES, required_features=None,
+                        settings=RADIOMICS_SETTINGS):
+    """
+    Bir çıkarım çalışmasını yapmadan planlar ve konsola yazdırır (deneme çalışması).
+
+    PyRadiomics yüklenmez, hiçbir hacim çözülmez ve hiçbir dosya yazılmaz: hasta klasörleri
+    listelenir, girdi dosyaları denetlenir, taramaların boyutu NRRD başlıklarından okunur ve
+    required_features verilirse en küçük plan ve tahmini maliyeti hesaplanır.
+
+    Args:
+        data_folder_path (str): İçinde hasta klasörlerinin bulunduğu ana veri klasörü.
+        mask_names (tuple): Her hasta klasöründe okunacak segmentasyon dosyalarının adları.
+        required_features (list veya str): Bkz. read_required_features. None ise tüm özellikler.
+        settings (dict): Çalışmanın PyRadiomics ayarları.
+
+    Returns:
+        dict: 'patients' (girdileri tam olan (hasta, klasör) ikilileri), 'incomplete'
+              ({hasta: eksik dosyalar}), 'voxels' (taramaların toplam voksel sayısı) ve
+              'plan' (required_features verilmediyse None).
+
+    Raises:
+        OSError, ValueError: Veri klasörü veya gerekli özellik listesi okunamazsa.
+    """
+    plan = None
+    if required_features is not None:
+        plan = build_extraction_plan(read_required_features(required_features))
+        check_plan_coverage(plan, settings['setting'])
+
+    patients, incomplete, unreadable = [], {}, []
+    n_voxels = 0
+    for patient_id, patient_folder_path in find_patient_folders(data_folder_path):
+        input_paths = patient_input_paths(patient_folder_path, mask_names)
+        missing = [os.path.basename(path) for path in input_paths.values() if not os.path.exists(path)]
+        if missing:
+            incomplete[patient_id] = missing
+            continue
+        patients.append((patient_id, patient_folder_path))
+        try:
+            n_voxels += nrrd_geometry(input_paths['scan'])['voxels']
+        except (OSError, ValueError, KeyError, IndexError):
+            unreadable.append(patient_id)
+
+    print("\n--- Deneme Çalışması (hiçbir dosya yazılmaz) ---")
+    print(f"Veri klasörü: {data_folder_path}")
+    print(f"İşlenecek hasta: {len(patients)} (taramalar toplam {n_voxels / 1e6:.1f} milyon voksel)")
+    for patient_id, missing in incomplete.items():
+        print(f"  UYARI: '{patient_id}' atlanacak; eksik dosyalar: {', '.join(missing)}")
+    for patient_id in unreadable:
+        print(f"  UYARI: '{patient_id}' taramasının başlığı okunamadı; çıkarım sırasında hata verebilir.")
+
+    if plan is None:
+        print("Özellikler: Tüm görüntü tipleri ve özellik sınıfları (gerekli özellik listesi verilmedi).")
+    else:
+        estimate = estimate_plan_cost(plan['image_types'], plan['feature_classes'], plan['images'],
+                                      settings['setting'],
+                                      os.path.join(data_folder_path, 'radiomics_profile_summary.csv'),
+                                      plan['extra_passes'])
+        print(f"İstenen sütun: {len(plan['required'])}")
+        for image_type, args in image_type_passes(plan['image_types'], plan.get('extra_passes')):
+            print(f"  Görüntü tipi: {image_type}" + (f" {args}" if args else ''))
+        for feature_class, features in plan['feature_classes'].items():
+            print(f"  Özellik sınıfı: {feature_class} ({len(features)} özellik)")
+        print(f"Türetilmiş görüntü: {estimate['derived_images']}, "
+              f"görüntü x sınıf hesabı: {estimate['class_evaluations']}")
+        print(f"Tahmini maliyet: {estimate['cost']:.1f} {estimate['unit']}/hasta, "
+              f"toplam {estimate['cost'] * len(patients):.1f} {estimate['unit']}")
+
+    return {'patients': patients, 'incomplete': incomplete, 'voxels': n_voxels, 'plan': plan}
@@ -0,0 +1,365 @@
+import os
+import csv
+import json
+import math
+import struct
+import zlib
+import numpy as np
+import pandas as pd
+
+# --- Radyomik Özellik Deposu (.rfs) Dosya Biçimi ---
+# Ana tabloyu tek seferde bellekte kurmak yerine, her biten hastayı dosyanın sonuna
+# tipli (float64/float32) bir satır grubu olarak ekliyoruz. Dosya şu kayıtlardan oluşur:
+#
+#   MAGIC (8 bayt)
+#   [önek][başlık JSON][veri] [önek][başlık JSON][veri] ...
+#
+# Önek: kayıt tipi (4 bayt), başlık uzunluğu (uint32), veri uzunluğu (uint64) ve
+# başlık+veri üzerinden CRC32 (uint32). İki kayıt tipi vardır:
+#   SCHM: Sütun adları, indeks sütun adları ve veri tipi. Verisi yoktur.
+#   ROWS: Satırların indeks değerleri; verisi sütun-öncelikli (n_sütun x n_satır) dizidir.
+#
+# Her kayıt diske yazılıp fsync edildikten sonra bir sonrakine geçilir. Okuyucu, sonda
+# yarım kalmış veya CRC'si tutmayan kaydı yok sayar. Bu sayede öldürülen bir iş, o ana kadar
+# biten tüm hastaları içeren geçerli bir dosya bırakır.
+
+MAGIC = b'RFSTORE1'
+_PREFIX = struct.Struct('<4sIQI')
+_SCHEMA = b'SCHM'
+_ROWS = b'ROWS'
+
+
+def _to_float(value):
+    """Özellik değerini float'a çevirir; sayısal olmayan değerler NaN olur."""
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return math.nan
+
+
+class FeatureStoreWriter:
+    """
+    Özellik satırlarını .rfs dosyasına satır grubu olarak ekleyen akış yazıcısı.
+
+    Bellekte sadece o an yazılan satır grubu tutulur; kohort büyüdükçe bellek kullanımı artmaz.
+    """
+
+    def __init__(self, path, index_names=('PatientID',), dtype='float64', append=False):
+        """
+        Args:
+            path (str): .rfs dosyasının yolu.
+            index_names (tuple): Satırları tanımlayan indeks sütunlarının adları.
+            dtype (str): Özellik sütunlarının veri tipi ('float64' veya 'float32').
+            append (bool): True ise mevcut dosyanın sonuna eklenir. Dosyanın sonunda yarım
+                           kalmış bir kayıt varsa önce o kısım kesilir.
+        """
+        self.path = path
+        self.index_names = list(index_names)
+        self.dtype = np.dtype(dtype).newbyteorder('<')
+        self._columns = None
+
+        if append and os.path.exists(path) and os.path.getsize(path) > 0:
+            reader = FeatureStoreReader(path)
+            self._file = open(path, 'r+b')
+            self._file.truncate(reader.valid_size)
+            self._file.seek(reader.valid_size)
+            if reader.schemas:
+                last = reader.schemas[-1]
+                if last['dtype'] == self.dtype.str and last['index_names'] == self.index_names:
+                    self._columns = last['columns']
+        else:
+            self._file = open(path, 'wb')
+            self._file.write(MAGIC)
+            self._sync()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _sync(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def _write_record(self, tag, header, payload=b''):
+        header_bytes = json.dumps(header, ensure_ascii=False).encode('utf-8')
+        crc = zlib.crc32(payload, zlib.crc32(header_bytes))
+        self._file.write(_PREFIX.pack(tag, len(header_bytes), len(payload), crc))
+        self._file.write(header_bytes)
+        self._file.write(payload)
+
+    def append(self, index, features):
+        """
+        Tek bir satırı kendi satır grubu olarak ekler ve diske kalıcı olarak yazar.
+
+        Args:
+            index (tuple veya str): Satırın indeks değerleri (index_names sırasıyla).
+            features (dict): Özellik adı -> değer sözlüğü. Sıra, sütun sırası olarak korunur.
+        """
+        self.append_rows([(index, features)])
+
+    def append_rows(self, rows):
+        """
+        Aynı sütunlara sahip ardışık satırları bir satır grubu olarak ekler.
+
+        Args:
+            rows (list): (index, features) ikilileri.
+        """
+        group_index, group_values = [], []
+        for index, features in rows:
+            columns = list(features)
+            if columns != self._columns:
+                self._flush_group(group_index, group_values)
+                group_index, group_values = [], []
+                self._columns = columns
+                self._write_record(_SCHEMA, {
+                    'columns': columns,
+                    'index_names': self.index_names,
+                    'dtype': self.dtype.str,
+                })
+            if not isinstance(index, (tuple, list)):
+                index = (index,)
+            group_index.append([str(i) for i in index])
+            group_values.append([_to_float(features[c]) for c in columns])
+        self._flush_group(group_index, group_values)
+        self._sync()
+
+    def _flush_group(self, group_index, group_values):
+        if not group_index:
+            return
+        # Sütun-öncelikli (n_sütun x n_satır) yazıyoruz ki tek sütun okumak bitişik olsun.
+        block = np.asarray(group_values, dtype=self.dtype).T
+        self._write_record(_ROWS, {'index': group_index}, np.ascontiguousarray(block).tobytes())
+
+    def close(self):
+        if not self._file.closed:
+            self._sync()
+            self._file.close()
+
+
+class FeatureStoreReader:
+    """
+    .rfs dosyasını okur. Veriler bellek eşlemeli (memmap) okunur; sadece istenen
+    satır ve sütunlar diskten yüklenir.
+    """
+
+    def __init__(self, path):
+        """
+        Args:
+            path (str): .rfs dosyasının yolu.
+        """
+        self.path = path
+        self.schemas = []
+        self.groups = []
+        self.valid_size = len(MAGIC)
+        self._scan()
+
+    def _scan(self):
+        """Kayıt başlıklarını okur; verileri atlar. Yarım kalan son kaydı yok sayar."""
+        file_size = os.path.getsize(self.path)
+        with open(self.path, 'rb') as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"'{self.path}' geçerli bir radyomik özellik deposu değil.")
+            offset = len(MAGIC)
+            while offset + _PREFIX.size <= file_size:
+                tag, header_len, payload_len, crc = _PREFIX.unpack(f.read(_PREFIX.size))
+                end = offset + _PREFIX.size + header_len + payload_len
+                if end > file_size or tag not in (_SCHEMA, _ROWS):
+                    break
+                header_bytes = f.read(header_len)
+                payload = f.read(payload_len)
+                if zlib.crc32(payload, zlib.crc32(header_bytes)) != crc:
+                    break
+                header = json.loads(header_bytes.decode('utf-8'))
+
+                if tag == _SCHEMA:
+                    self.schemas.append(header)
+                elif self.schemas:
+                    self.groups.append({
+                        'schema': len(self.schemas) - 1,
+                        'index': [tuple(i) for i in header['index']],
+                        'offset': offset + _PREFIX.size + header_len,
+                    })
+                offset = end
+                self.valid_size = end
+
+    @property
+    def index_names(self):
+        return self.schemas[-1]['index_names'] if self.schemas else ['PatientID']
+
+    @property
+    def columns(self):
+        """Tüm satır gruplarındaki sütunların, ilk görülme sırasıyla birleşimi."""
+        seen = {}
+        for schema in self.schemas:
+            for column in schema['columns']:
+                seen.setdefault(column, None)
+        return list(seen)
+
+    def _block(self, group):
+        schema = self.schemas[group['schema']]
+        return np.memmap(self.path, dtype=np.dtype(schema['dtype']), mode='r', offset=group['offset'],
+                         shape=(len(schema['columns']), len(group['index'])))
+
+    def row_locations(self):
+        """
+        İndeks -> (satır grubu, satır) eşlemesini döndürür. Aynı indeks birden fazla kez
+        yazıldıysa en son yazılan geçerlidir.
+        """
+        locations = {}
+        for group in self.groups:
+            for row, index in enumerate(group['index']):
+                locations[index] = (group, row)
+        return locations
+
+    def _column_positions(self, schema_number):
+        """Bir şemadaki sütun adı -> satır grubundaki sıra eşlemesi (önbellekli)."""
+        if not hasattr(self, '_positions'):
+            self._positions = {}
+        if schema_number not in self._positions:
+            self._positions[schema_number] = {c: i for i, c in enumerate(self.schemas[schema_number]['columns'])}
+        return self._positions[schema_number]
+
+    def _key(self, index):
+        return tuple(str(i) for i in index) if isinstance(index, (tuple, list)) else (str(index),)
+
+    @property
+    def n_stale_rows(self):
+        """Aynı indeksle daha sonra yeniden yazıldığı için geçersiz kalan satır sayısı."""
+        return sum(len(group['index']) for group in self.groups) - len(self.row_locations())
+
+    def read_row(self, index):
+        """
+        Tek bir satırı, tabloyu yüklemeden okur.
+
+        Args:
+            index (str veya tuple): Satırın indeks değerleri (örn. 'Hasta_1' veya
+                                    ('Hasta_1', 'segmentation', '1')).
+
+        Returns:
+            dict: Sütun -> değer sözlüğü.
+
+        Raises:
+            KeyError: İndeks depoda yoksa.
+        """
+        group, row = self.row_locations()[self._key(index)]
+        columns = self.schemas[group['schema']]['columns']
+        return dict(zip(columns, self._block(group)[:, row].tolist()))
+
+    def read_columns(self, columns, indices=None):
+        """
+        Sadece istenen sütunları (ve istenirse sadece istenen satırları) okur.
+
+        Sütunlar diskte bitişik tutulduğu için, 1500 sütunluk bir depodan birkaç sütun okumak
+        dosyanın sadece o kısımlarına dokunur.
+
+        Args:
+            columns (list): Okunacak özellik sütunlarının adları.
+            indices (list): Okunacak satırların indeksleri. None ise tüm satırlar (sıralı).
+
+        Returns:
+            pd.DataFrame: İndeks sütunları ve istenen sütunlar. Bir satırda olmayan sütunlar NaN.
+
+        Raises:
+            KeyError: Depoda olmayan bir sütun veya indeks istenirse.
+        """
+        available = set(self.columns)
+        unknown = [c for c in columns if c not in available]
+        if unknown:
+            raise KeyError(f"Depoda olmayan sütunlar: {', '.join(unknown)}")
+
+        locations = self.row_locations()
+        keys = sorted(locations) if indices is None else [self._key(i) for i in indices]
+        dtype = np.dtype(self.schemas[-1]['dtype']) if self.schemas else np.float64
+        data = {c: np.full(len(keys), np.nan, dtype=dtype) for c in columns}
+
+        # Satırları satır grubuna göre toplayıp her grubun ilgili sütunlarını tek seferde okuyoruz.
+        by_group = {}
+        for position, key in enumerate(keys):
+            group, row = locations[key]
+            by_group.setdefault(id(group), (group, [], []))
+            by_group[id(group)][1].append(position)
+            by_group[id(group)][2].append(row)
+        for group, positions, rows in by_group.values():
+            block = self._block(group)
+            column_positions = self._column_positions(group['schema'])
+            for c in columns:
+                if c in column_positions:
+                    data[c][positions] = block[column_positions[c], rows]
+
+        frame = pd.DataFrame(keys, columns=self.index_names)
+        for c in columns:
+            frame[c] = data[c]
+        return frame
+
+    def iter_rows(self, sort=True):
+        """
+        Satırları tek tek (index, {sütun: değer}) olarak döndürür.
+
+        Args:
+            sort (bool): True ise satırlar indekse göre sıralı döner.
+        """
+        locations = self.row_locations()
+        keys = sorted(locations) if sort else list(locations)
+        for index in keys:
+            group, row = locations[index]
+            columns = self.schemas[group['schema']]['columns']
+            values = self._block(group)[:, row]
+            yield index, dict(zip(columns, values.tolist()))
+
+    def read_table(self):
+        """Tüm depoyu bir DataFrame olarak okur (indeks sütunları en başta)."""
+        records = []
+        for index, features in self.iter_rows():
+            record = dict(zip(self.index_names, index))
+            record.update(features)
+            records.append(record)
+        return pd.DataFrame(records, columns=self.index_names + self.columns)
+
+    def export_csv(self, csv_path):
+        """
+        Depoyu, tüm tabloyu belleğe almadan satır satır bir CSV dosyasına yazar.
+
+        Satırlar indekse göre sıralanır; sütunlar ilk görülme sırasıyla birleştirilir.
+        Bir satırda olmayan sütunlar boş bırakılır.
+
+        Args:
+            csv_path (str): Yazılacak CSV dosyasının yolu.
+        """
+        columns = self.columns
+        with open(csv_path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(self.index_names + columns)
+            for index, features in self.iter_rows():
+                writer.writerow(list(index) + [
+                    '' if c not in features or math.isnan(features[c]) else repr(features[c])
+                    for c in columns
+                ])
+
+
+def compact_feature_store(path, chunk_rows=256):
+    """
+    Depoyu, sadece geçerli (en son yazılmış) satırları içerecek şekilde yeniden yazar.
+
+    Güncellenen satırlar dosyaya yeniden eklendiği için eski kopyaları yer kaplamaya devam eder.
+    Sıkıştırma yeni dosyayı yanına yazar ve en sonda atomik olarak yerine taşır.
+
+    Args:
+        path (str): .rfs dosyasının yolu.
+        chunk_rows (int): Aynı sütunlara sahip satırların en fazla kaçının tek grupta yazılacağı.
+    """
+    reader = FeatureStoreReader(path)
+    if not reader.schemas:
+        return
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with FeatureStoreWriter(tmp_path, index_names=reader.index_names, dtype=reader.schemas[-1]['dtype']) as writer:
+        chunk = []
+        for index, features in reader.iter_rows():
+            chunk.append((index, features))
+            if len(chunk) >= chunk_rows:
+                writer.append_rows(chunk)
+                chunk = []
+        if chunk:
+            writer.append_rows(chunk)
+    os.replace(tmp_path, path)
@@ -6,74 +6,322 @@ import SimpleITK as sitk
 import numpy as np
 import matplotlib.pyplot as plt
 import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from nrrd_header import nrrd_raw_layout, nrrd_geometry, physical_point_to_index, read_value_range
+from volume_cache import load_volume_array
+
+class SliceProvider:
+    """
+    Bir hacmin eksenel kesitlerini sadece istendiğinde yükleyen kesit sağlayıcı.
+
+    Hacim bellek eşlemeli (np.memmap) olduğunda sadece görüntülenen kesitler diskten okunur.
+    Son kullanılan kesitler küçük bir LRU önbellekte tutulur; bir kesit istendiğinde komşu
+    kesitler arka planda hazırlanır, böylece kaydırma sırasında disk beklenmez.
+    """
+    def __init__(self, volume, channel=None, dtype=None, cache_size=16, prefetch_radius=2):
+        """
+        Args:
+            volume (np.ndarray): (z, y, x[, kanal]) eksen sıralı hacim (np.memmap olabilir).
+            channel (int): Verilirse çok kanallı hacimden sadece bu kanal döndürülür.
+            dtype: Verilirse kesitler bu tipe çevrilir (örn. np.float32).
+            cache_size (int): Bellekte tutulacak en fazla kesit sayısı.
+            prefetch_radius (int): Her istekte arka planda hazırlanacak komşu kesit sayısı (her yönde).
+        """
+        self.volume = volume
+        self.channel = channel if volume.ndim == 4 else None
+        self.dtype = dtype
+        self.shape = volume.shape[:3] if self.channel is not None else volume.shape
+        self.ndim = len(self.shape)
+        self.cache_size = max(cache_size, 2 * prefetch_radius + 1)
+        self.prefetch_radius = prefetch_radius
+
+        self._cache = OrderedDict()
+        self._pending = set()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='slice-prefetch')
+
+    def __len__(self):
+        return self.shape[0]
+
+    def _load(self, index):
+        data = self.volume[index]
+        if self.channel is not None:
+            data = data[..., self.channel]
+        # Kopyalayarak memmap'ten ayırıyoruz; önbellekteki kesit dosyaya bağlı kalmaz.
+        return np.array(data, dtype=self.dtype or data.dtype)
+
+    def _remember(self, index, data):
+        with self._lock:
+            self._cache[index] = data
+            self._cache.move_to_end(index)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def _prefetch(self, index):
+        try:
+            self._remember(index, self._load(index))
+        finally:
+            with self._lock:
+                self._pending.discard(index)
+
+    def get(self, index):
+        """İstenen kesiti döndürür ve komşu kesitleri arka planda hazırlamaya başlar."""
+        with self._lock:
+            data = self._cache.get(index)
+            if data is not None:
+                self._cache.move_to_end(index)
+        if data is None:
+            data = self._load(index)
+            self._remember(index, data)
+        self.prefetch_around(index)
+        return data
+
+    def prefetch_around(self, index):
+        """Kesitin komşularını (önce ileri, sonra geri) arka plan kuyruğuna ekler."""
+        for offset in range(1, self.prefetch_radius + 1):
+            for neighbour in (index + offset, index - offset):
+                if not 0 <= neighbour < len(self):
+                    continue
+                with self._lock:
+                    if neighbour in self._cache or neighbour in self._pending:
+                        continue
+                    self._pending.add(neighbour)
+                self._executor.submit(self._prefetch, neighbour)
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+
+class PlacedVolume:
+    """
+    Taramanın sadece bir bölgesini kaplayan hacmi (örn. voksel bazlı özellik haritası) taramanın
+    ızgarasına yerleştirir. Kesitler istendiğinde tarama boyutunda oluşturulur; kaplanmayan
+    vokseller NaN olur.
+    """
+    def __init__(self, volume, offset, full_shape):
+        """
+        Args:
+            volume (np.ndarray): (z, y, x) eksen sıralı hacim (np.memmap olabilir).
+            offset (tuple): Hacmin ilk vokselinin taramadaki (z, y, x) indeksi.
+            full_shape (tuple): Taramanın (z, y, x) boyutu.
+        """
+        self.volume = volume
+        self.offset = offset
+        self.shape = tuple(full_shape)
+        self.ndim = 3
+        self.dtype = np.dtype(np.float32)
+
+    def __getitem__(self, index):
+        placed = np.full(self.shape[1:], np.nan, dtype=np.float32)
+        z = index - self.offset[0]
+        if not 0 <= z < self.volume.shape[0]:
+            return placed
+        # Haritanın tarama dışında kalan kısmı (olmaması gerekir) kırpılır.
+        target, source = [], []
+        for start, length, full in zip(self.offset[1:], self.volume.shape[1:], self.shape[1:]):
+            lower, upper = max(start, 0), min(start + length, full)
+            target.append(slice(lower, max(lower, upper)))
+            source.append(slice(lower - start, max(lower, upper) - start))
+        placed[tuple(target)] = self.volume[z][tuple(source)]
+        return placed
 
 class InteractiveViewer:
     """
     3D medikal görüntüleri interaktif olarak incelemek için geliştirilmiş sınıf.
     Maske toggle, dilim değiştirme ve piksel değerlerini hem ekranda hem konsolda
     gösterme özellikleri içerir.
+
+    Görüntü, maske ve metin nesneleri (artist) bir kez oluşturulur ve her olayda sadece
+    verileri güncellenir. Çok kanallı maskelerin RGBA katmanları kesit başına önbelleğe
+    alınır; fare gezdirildiğinde tüm tuval yerine sadece bilgi kutusu yeniden çizilir (blitting).
+
+    İsteğe bağlı olarak bir voksel bazlı özellik haritası (bkz. voxel_feature_maps) taramanın
+    üzerine yarı saydam bir renk katmanı olarak gösterilebilir.
     """
-    def __init__(self, scan_np, mask_np):
-        # Verileri ve temel bilgileri sakla
-        self.scan_np = scan_np
-        self.mask_np = mask_np
-        self.is_mask_multichannel = self.mask_np.ndim == 4
-        self.num_slices = scan_np.shape[0]
+    # Önbellekte tutulacak en fazla RGBA maske katmanı sayısı.
+    OVERLAY_CACHE_SIZE = 32
+
+    # Başlığında değer aralığı olmayan (eski) haritalarda renk aralığı için örneklenecek kesit sayısı.
+    RANGE_SAMPLE_SLICES = 16
+
+    def __init__(self, scan_np, mask_np, feature_map=None, feature_name=None, feature_range=None):
+        # Verileri ve temel bilgileri sakla. Diziler verilirse kesit sağlayıcıya sarılır;
+        # kesitler her durumda sadece görüntülendiklerinde yüklenir.
+        self.scan_provider = scan_np if isinstance(scan_np, SliceProvider) else SliceProvider(scan_np)
+        self.mask_provider = mask_np if isinstance(mask_np, SliceProvider) else SliceProvider(mask_np)
+        self.feature_provider = None
+        if feature_map is not None:
+            self.feature_provider = (feature_map if isinstance(feature_map, SliceProvider)
+                                     else SliceProvider(feature_map))
+        self.feature_name = feature_name or 'Özellik'
+        self.feature_range = feature_range
+        self.is_mask_multichannel = self.mask_provider.ndim == 4
+        self.num_slices = len(self.scan_provider)
         self.slice_index = self.num_slices // 2
         
         # Durum değişkenleri
         self.show_mask = True
+        self.show_feature = self.feature_provider is not None
         self.last_info_text = "Değerleri görmek için fareyi gezdirin..." # Son bilgiyi saklamak için
+        self._overlay_cache = OrderedDict()
+        self._background = None
 
         # Matplotlib figür ve eksenlerini oluştur
         self.fig, self.ax = plt.subplots(1, 1, figsize=(10, 10))
+        self.ax.axis('off')
+
+        # Kalıcı görüntü, maske ve bilgi kutusu nesnelerini oluştur
+        self.setup_artists()
         
         # Olayları (event) ilgili fonksiyonlara bağlıyoruz
         self.fig.canvas.mpl_connect('scroll_event', self.on_scroll)
         self.fig.canvas.mpl_connect('key_press_event', self.on_key_press)
         self.fig.canvas.mpl_connect('motion_notify_event', self.on_motion)
+        self.fig.canvas.mpl_connect('draw_event', self.on_draw)
 
         # Başlangıç görüntüsünü ve bilgi kutusunu çiz
         self.update_plot()
 
-    def setup_info_text(self):
-        """Sadece bir kez çalışacak olan, sabit metin kutusu gibi ayarları yapar."""
-        # Sol alt köşeye, güncellenecek bilgi kutusunu yerleştir
-        self.info_text = self.ax.text(0.02, 0.02, '',
+    def estimate_feature_range(self):
+        """
+        Başlığında değer aralığı olmayan haritalar için aralığı eşit aralıklı birkaç kesitten tahmin eder.
+        Tüm hacim okunmaz; haritanın sadece bu kesitleri yüklenir.
+        """
+        values = self.feature_provider.volume
+        values = getattr(values, 'volume', values)
+        n_slices = len(values)
+        indices = np.unique(np.linspace(0, n_slices - 1, min(n_slices, self.RANGE_SAMPLE_SLICES)).astype(int))
+        sample = np.asarray(values[indices], dtype=np.float32)
+        sample = sample[np.isfinite(sample)]
+        if sample.size == 0:
+            return 0.0, 1.0
+        return float(sample.min()), float(sample.max())
+
+    def setup_artists(self):
+        """Sadece bir kez çalışır: Görüntü, maske katmanı ve bilgi kutusu nesnelerini oluşturur."""
+        height, width = self.scan_provider.shape[1:3]
+        self.scan_artist = self.ax.imshow(np.zeros((height, width), dtype=np.float32), cmap='gray')
+
+        if self.is_mask_multichannel:
+            self.mask_artist = self.ax.imshow(np.zeros((height, width, 4), dtype=np.float32))
+        else:
+            empty = np.ma.masked_all((height, width))
+            self.mask_artist = self.ax.imshow(empty, cmap='autumn', alpha=0.5)
+
+        self.feature_artist = None
+        if self.feature_provider is not None:
+            # Renk aralığı tüm harita için sabittir; böylece kesitler arasında karşılaştırılabilir.
+            vmin, vmax = self.feature_range or self.estimate_feature_range()
+            self.feature_artist = self.ax.imshow(np.full((height, width), np.nan, dtype=np.float32),
+                                                 cmap='viridis', alpha=0.6, vmin=vmin, vmax=vmax)
+            self.fig.colorbar(self.feature_artist, ax=self.ax, fraction=0.046, pad=0.04, label=self.feature_name)
+
+        # Sol alt köşeye, güncellenecek bilgi kutusunu yerleştir. 'animated' olduğu için
+        # normal çizimlerde değil, sadece blitting ile çizilir.
+        self.info_text = self.ax.text(0.02, 0.02, self.last_info_text,
                                       transform=self.ax.transAxes,
                                       color='white', fontsize=10,
                                       bbox=dict(facecolor='black', alpha=0.7),
-                                      verticalalignment='bottom')
+                                      verticalalignment='bottom',
+                                      animated=True)
 
-    def update_plot(self):
-        """Görüntüyü mevcut dilim indeksi ve maske görünürlüğüne göre günceller."""
-        scan_slice = self.scan_np[self.slice_index, :, :]
-        self.ax.clear()
-        self.ax.imshow(scan_slice, cmap='gray')
+    def rgba_overlay(self, index):
+        """Çok kanallı maske kesitinin RGBA katmanını döndürür (kesit başına önbellekli)."""
+        rgba = self._overlay_cache.get(index)
+        if rgba is not None:
+            self._overlay_cache.move_to_end(index)
+            return rgba
+
+        mask_slice = self.mask_provider.get(index)
+        rgba = np.empty(mask_slice.shape[:-1] + (mask_slice.shape[-1] + 1,), dtype=np.float32)
+        rgba[..., :-1] = mask_slice
+        rgba[..., -1] = np.where(mask_slice.any(axis=2), 0.5, 0.0)
+
+        self._overlay_cache[index] = rgba
+        while len(self._overlay_cache) > self.OVERLAY_CACHE_SIZE:
+            self._overlay_cache.popitem(last=False)
+        return rgba
 
+    def render_slice(self):
+        """Mevcut kesitin verilerini kalıcı nesnelere aktarır (çizim yapmaz)."""
+        scan_slice = self.scan_provider.get(self.slice_index)
+        self.scan_artist.set_data(scan_slice)
+        # imshow gibi her kesitte renk aralığını o kesitin en küçük/en büyük değerine ayarla.
+        self.scan_artist.set_clim(scan_slice.min(), scan_slice.max())
+
+        self.mask_artist.set_visible(self.show_mask)
         if self.show_mask:
             if self.is_mask_multichannel:
-                mask_slice = self.mask_np[self.slice_index, :, :, :]
-                alpha_channel = np.ones(mask_slice.shape[:-1]) * 0.5
-                background_pixels = (mask_slice.sum(axis=2) == 0)
-                alpha_channel[background_pixels] = 0
-                rgba_mask = np.dstack((mask_slice, alpha_channel))
-                self.ax.imshow(rgba_mask)
+                self.mask_artist.set_data(self.rgba_overlay(self.slice_index))
             else:
-                mask_slice = self.mask_np[self.slice_index, :, :]
+                mask_slice = self.mask_provider.get(self.slice_index)
                 masked_mask = np.ma.masked_where(mask_slice == 0, mask_slice)
-                self.ax.imshow(masked_mask, cmap='autumn', alpha=0.5)
+                self.mask_artist.set_data(masked_mask)
+                if masked_mask.count():
+                    self.mask_artist.set_clim(masked_mask.min(), masked_mask.max())
 
-        mask_status = "Açık" if self.show_mask else "Kapalı"
-        self.ax.set_title(f'Kesit: {self.slice_index + 1}/{self.num_slices} | Maske [M]: {mask_status}')
-        
-        # Bilgi kutusunu yeniden oluştur ve son bilgiyi yazdır
-        self.setup_info_text()
+        title = f'Kesit: {self.slice_index + 1}/{self.num_slices} | Maske [M]: {"Açık" if self.show_mask else "Kapalı"}'
+        if self.feature_artist is not None:
+            self.feature_artist.set_visible(self.show_feature)
+            if self.show_feature:
+                self.feature_artist.set_data(self.feature_provider.get(self.slice_index))
+            title += f' | Harita [F]: {"Açık" if self.show_feature else "Kapalı"}'
+        self.ax.set_title(title)
         self.info_text.set_text(self.last_info_text)
 
-        self.ax.axis('off')
+    def update_plot(self):
+        """Görüntüyü mevcut dilim indeksi ve maske görünürlüğüne göre günceller."""
+        self.render_slice()
         self.fig.canvas.draw_idle()
 
+    def on_draw(self, event):
+        """Tam çizimden sonra arka planı saklar ve bilgi kutusunu üzerine çizer."""
+        canvas = self.fig.canvas
+        if getattr(canvas, 'supports_blit', False):
+            self._background = canvas.copy_from_bbox(self.ax.bbox)
+        self.ax.draw_artist(self.info_text)
+
+    def blit_info_text(self):
+        """Sadece bilgi kutusunu yeniden çizer; blitting desteklenmiyorsa tüm tuvali çizer."""
+        canvas = self.fig.canvas
+        if self._background is None:
+            canvas.draw_idle()
+            return
+        canvas.restore_region(self._background)
+        self.ax.draw_artist(self.info_text)
+        canvas.blit(self.ax.bbox)
+
+    def measure_scroll_fps(self, n_frames=None):
+        """
+        Kesitler arasında kaydırmanın saniyedeki kare sayısını (FPS) ölçer.
+
+        Her kare, kaydırma olayındaki işin aynısıdır (kesit verisi + tam tuval çizimi),
+        ancak çizim draw_idle yerine hemen yapılır. Ölçümden sonra başlangıç kesitine dönülür.
+
+        Args:
+            n_frames (int): Çizilecek kare sayısı. None ise tüm kesitler bir kez gezilir.
+
+        Returns:
+            float: Saniyedeki kare sayısı.
+        """
+        import time
+
+        n_frames = n_frames or self.num_slices
+        start_index = self.slice_index
+        start = time.perf_counter()
+        for frame in range(n_frames):
+            self.slice_index = frame % self.num_slices
+            self.render_slice()
+            self.fig.canvas.draw()
+            self.fig.canvas.flush_events()
+        elapsed = time.perf_counter() - start
+
+        self.slice_index = start_index
+        self.update_plot()
+        return n_frames / elapsed if elapsed > 0 else float('inf')
+
     def on_scroll(self, event):
         """Fare tekerleği ile dilim değiştirir."""
         if event.button == 'up': self.slice_index = min(self.slice_index + 1, self.num_slices - 1)
@@ -81,9 +329,10 @@ class InteractiveViewer:
         self.update_plot()
 
     def on_key_press(self, event):
-        """Klavye tuşları ile dilim değiştirir veya maskeyi açıp kapatır."""
+        """Klavye tuşları ile dilim değiştirir, maskeyi veya özellik haritasını açıp kapatır."""
         key = event.key.lower()
         if key == 'm': self.show_mask = not self.show_mask
+        elif key == 'f' and self.feature_provider is not None: self.show_feature = not self.show_feature
         elif key in ['up', 'k']: self.slice_index = min(self.slice_index + 1, self.num_slices - 1)
         elif key in ['down', 'j']: self.slice_index = max(self.slice_index - 1, 0)
         self.update_plot()
@@ -94,14 +343,17 @@ class InteractiveViewer:
         
         x, y = int(event.xdata), int(event.ydata)
         
-        if 0 <= y < self.scan_np.shape[1] and 0 <= x < self.scan_np.shape[2]:
-            scan_val = self.scan_np[self.slice_index, y, x]
-            mask_val = self.mask_np[self.slice_index, y, x]
+        if 0 <= y < self.scan_provider.shape[1] and 0 <= x < self.scan_provider.shape[2]:
+            # Kesitler LRU önbellekte olduğu için burada diske gidilmez.
+            scan_val = self.scan_provider.get(self.slice_index)[y, x]
+            mask_val = self.mask_provider.get(self.slice_index)[y, x]
             
             # Bilgi kutusunun metnini oluştur ve sakla
             info_str = (f"Koor(Y,X): ({y}, {x})\n"
                         f"Tarama Değeri: {scan_val:.2f}\n"
                         f"Maske Değeri: {mask_val}")
+            if self.feature_provider is not None:
+                info_str += f"\n{self.feature_name}: {self.feature_provider.get(self.slice_index)[y, x]:.4g}"
             self.last_info_text = info_str
             self.info_text.set_text(info_str)
             
@@ -109,36 +361,117 @@ class InteractiveViewer:
             if self.is_mask_multichannel and np.any(mask_val):
                 print(f"Konsol -> Koor({y},{x}): Maske Değeri = {mask_val}")
 
-            self.fig.canvas.draw_idle()
+            self.blit_info_text()
+
+def open_volume(nrrd_path, use_volume_cache=False):
+    """
+    NRRD hacmini mümkünse kopyalamadan, bellek eşlemeli olarak açar.
+
+    Sırasıyla şunlar denenir:
+      1. use_volume_cache açıksa hızlı yükleme önbelleği (bkz. volume_cache). Sıkıştırılmış
+         dosya sadece ilk açılışta bir kez çözülür.
+      2. Sıkıştırılmamış ('raw') NRRD ise dosyanın kendisi.
+      3. Hiçbiri olmazsa dosya SimpleITK ile tamamen okunur (kendi piksel tipinde).
+
+    Returns:
+        np.ndarray: (z, y, x[, kanal]) eksen sıralı hacim.
+    """
+    if use_volume_cache:
+        entry = load_volume_array(nrrd_path)
+        if entry is not None:
+            return entry[0]
+
+    try:
+        layout = nrrd_raw_layout(nrrd_path)
+    except (OSError, ValueError, KeyError):
+        layout = None
+    if layout is not None:
+        return np.memmap(nrrd_path, dtype=layout['dtype'], mode='r',
+                         offset=layout['offset'], shape=layout['shape'])
+
+    return sitk.GetArrayFromImage(sitk.ReadImage(nrrd_path))
+
+def load_viewer_slices(scan_path, mask_path, use_volume_cache=False):
+    """
+    Görüntüleyici için tarama ve maske kesit sağlayıcılarını oluşturur.
+
+    Tarama çok kanallıysa ilk kanal gösterilir ve kesitler float32'ye çevrilir; bu işlemler
+    tüm hacim yerine sadece görüntülenen kesitlere uygulanır.
+
+    Returns:
+        tuple: (scan_provider, mask_provider) SliceProvider nesneleri.
+    """
+    scan_provider = SliceProvider(open_volume(scan_path, use_volume_cache), channel=0, dtype=np.float32)
+    mask_provider = SliceProvider(open_volume(mask_path, use_volume_cache))
+    return scan_provider, mask_provider
+
+def load_feature_map(feature_map_path, scan_path, use_volume_cache=False):
+    """
+    Voksel bazlı özellik haritasını taramanın ızgarasına yerleşmiş bir kesit sağlayıcı olarak açar.
+
+    Harita taramanın sadece maske çevresindeki bölgesini kaplar; konumu haritanın orijininden
+    bulunur. Voksel aralığı ve yönü taramayla aynı olmalıdır.
+
+    Returns:
+        SliceProvider: Tarama boyutunda float32 kesitler (harita dışı NaN).
+
+    Raises:
+        ValueError: Harita taramanın ızgarasında değilse.
+    """
+    scan_geometry, map_geometry = nrrd_geometry(scan_path), nrrd_geometry(feature_map_path)
+    spacing_ok = np.allclose(scan_geometry['spacing'], map_geometry['spacing'], atol=1e-4)
+    direction_ok = np.allclose(scan_geometry['direction'], map_geometry['direction'], atol=1e-4)
+    index = physical_point_to_index(scan_geometry, map_geometry['origin'])
+    if not (spacing_ok and direction_ok and np.allclose(index, np.round(index), atol=1e-2)):
+        raise ValueError("Özellik haritası taramanın voksel ızgarasında değil.")
+
+    offset = tuple(int(round(i)) for i in reversed(index))
+    full_shape = tuple(reversed(scan_geometry['size']))
+    volume = PlacedVolume(open_volume(feature_map_path, use_volume_cache), offset, full_shape)
+    return SliceProvider(volume)
+
+def launch_interactive_viewer(scan_path, mask_path, use_volume_cache=False, measure_fps=False,
+                              feature_map_path=None):
+    """
+    Verilen yollardan görüntüleri yükler ve interaktif görüntüleyiciyi başlatır.
 
-def launch_interactive_viewer(scan_path, mask_path):
-    """Verilen yollardan görüntüleri yükler ve interaktif görüntüleyiciyi başlatır."""
+    measure_fps açıksa pencere açılmadan önce tüm kesitler bir kez gezilir ve kaydırma
+    hızı (saniyedeki kare sayısı) konsola yazdırılır. feature_map_path verilirse
+    voksel bazlı özellik haritası taramanın üzerine renk katmanı olarak eklenir.
+    """
     print("--- İnteraktif Görüntüleyici Başlatılıyor... ---")
     if not (os.path.exists(scan_path) and os.path.exists(mask_path)):
         print("HATA: Gerekli dosyalar bulunamadı."); return
         
     try:
-        scan_sitk = sitk.ReadImage(scan_path, sitk.sitkFloat32)
-        mask_sitk = sitk.ReadImage(mask_path)
-        
-        if scan_sitk.GetNumberOfComponentsPerPixel() > 1:
-            scan_sitk = sitk.VectorIndexSelectionCast(scan_sitk, 0, sitk.sitkFloat32)
-
-        scan_np = sitk.GetArrayFromImage(scan_sitk)
-        mask_np = sitk.GetArrayFromImage(mask_sitk)
+        scan_provider, mask_provider = load_viewer_slices(scan_path, mask_path, use_volume_cache)
+        feature_provider, feature_name, feature_range = None, None, None
+        if feature_map_path is not None:
+            feature_provider = load_feature_map(feature_map_path, scan_path, use_volume_cache)
+            feature_name = os.path.splitext(os.path.basename(feature_map_path))[0]
+            # Renk aralığı haritanın başlığından okunur (bkz. voxel_feature_maps); hacim taranmaz.
+            feature_range = read_value_range(feature_map_path)
         
         # --- YENİ KONTROL BURADA ---
         # Maskenin çok kanallı olup olmadığını başlangıçta bir kez kontrol et ve yazdır.
-        if mask_np.ndim == 4:
+        if mask_provider.ndim == 4:
             print("\n[DİKKAT] Yüklenen maske dosyası ÇOK KANALLI (Multi-channel) bir yapıya sahip.")
         
         print("\n--- İnteraktif Görüntüleyici Kontrolleri ---")
         print(" - Fare Tekerleği / Klavye (↑/↓, K/J): Dilim değiştir")
         print(" - M Tuşu: Maskeyi Aç/Kapa (Toggle)")
+        if feature_provider is not None:
+            print(f" - F Tuşu: Özellik haritasını ({feature_name}) Aç/Kapa")
         print(" - Fareyi Gezdir: Piksel değerlerini sol alttaki kutuda gör")
         
-        viewer = InteractiveViewer(scan_np, mask_np)
+        viewer = InteractiveViewer(scan_provider, mask_provider, feature_provider, feature_name, feature_range)
+        if measure_fps:
+            print(f"\nKaydırma hızı: {viewer.measure_scroll_fps():.1f} FPS ({viewer.num_slices} kesit)")
         plt.show()
+        scan_provider.close()
+        mask_provider.close()
+        if feature_provider is not None:
+            feature_provider.close()
 
     except Exception as e:
         print(f"İnteraktif görüntüleyici başlatılırken hata: {e}")
@@ -149,4 +482,16 @@ if __name__ == '__main__':
     scan_dosya_yolu = os.path.join(patient_folder, 'scan.nrrd')
     mask_dosya_yolu = os.path.join(patient_folder, 'segmentation.nrrd')
 
-    launch_interactive_viewer(scan_dosya_yolu, mask_dosya_yolu)
\ No newline at end of file
+    # True ise dosyalar '.volume_cache' klasöründeki sıkıştırılmamış kopyadan anında açılır.
+    # Sıkıştırılmış (gzip) NRRD'lerde sadece görüntülenen kesitlerin okunabilmesi için gereklidir;
+    # kapalıyken bu dosyalar açılışta tamamen çözülür.
+    use_volume_cache = True
+
+    # True ise pencere açılmadan önce kaydırma hızı (FPS) ölçülüp yazdırılır.
+    measure_fps = False
+
+    # Voksel bazlı özellik haritası (bkz. voxel_feature_maps), örn.
+    # os.path.join(patient_folder, 'voxel_maps', 'original_glcm_Correlation.nrrd'). None ise gösterilmez.
+    feature_map_yolu = None
+
+    launch_interactive_viewer(scan_dosya_yolu, mask_dosya_yolu, use_volume_cache, measure_fps, feature_map_yolu)
\ No newline at end of file
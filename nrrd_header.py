@@ -0,0 +1,328 @@
+import re
+import math
+import itertools
+
+# --- NRRD Başlık Okuyucu ---
+# NRRD dosyaları, sıkıştırılmış (gzip) voksel verisinden önce düz metin bir başlık içerir.
+# Bu modül sadece bu başlığı okur; voksel verisine hiç dokunmadan boyut, voksel aralığı,
+# orijin, yön, kanal sayısı ve kodlama bilgilerini milisaniyeler içinde çıkarır.
+
+# Başlık için okunacak en fazla bayt. Slicer .seg.nrrd dosyaları segment başına çok sayıda
+# anahtar/değer satırı içerebildiği için geniş tutulmuştur.
+MAX_HEADER_BYTES = 4 * 1024 * 1024
+
+# PyRadiomics'te 'geometryTolerance' verilmediğinde geçerli olan SimpleITK/ITK varsayılan toleransı.
+DEFAULT_GEOMETRY_TOLERANCE = 1e-6
+
+# Voksel bazlı özellik haritalarının değer aralığı başlıkta bu anahtarlarla ('anahtar:=değer')
+# saklanır; görüntüleyici renk aralığını hacmi okumadan buradan alır (bkz. voxel_feature_maps).
+VALUE_RANGE_KEYS = ('value_min', 'value_max')
+
+_VECTOR_RE = re.compile(r'\(([^)]*)\)|none')
+
+# NRRD 'type' alanındaki eş anlamlıların NumPy tip kodu (tür harfi + bayt sayısı).
+_TYPE_CODES = {
+    'signed char': 'i1', 'int8': 'i1', 'int8_t': 'i1',
+    'uchar': 'u1', 'unsigned char': 'u1', 'uint8': 'u1', 'uint8_t': 'u1',
+    'short': 'i2', 'short int': 'i2', 'signed short': 'i2', 'signed short int': 'i2', 'int16': 'i2', 'int16_t': 'i2',
+    'ushort': 'u2', 'unsigned short': 'u2', 'unsigned short int': 'u2', 'uint16': 'u2', 'uint16_t': 'u2',
+    'int': 'i4', 'signed int': 'i4', 'int32': 'i4', 'int32_t': 'i4',
+    'uint': 'u4', 'unsigned int': 'u4', 'uint32': 'u4', 'uint32_t': 'u4',
+    'longlong': 'i8', 'long long': 'i8', 'long long int': 'i8', 'signed long long': 'i8',
+    'signed long long int': 'i8', 'int64': 'i8', 'int64_t': 'i8',
+    'ulonglong': 'u8', 'unsigned long long': 'u8', 'unsigned long long int': 'u8', 'uint64': 'u8', 'uint64_t': 'u8',
+    'float': 'f4', 'double': 'f8',
+}
+
+
+def read_nrrd_header(path):
+    """
+    NRRD dosyasının metin başlığını okur.
+
+    Args:
+        path (str): .nrrd dosyasının yolu.
+
+    Returns:
+        dict: Küçük harfe çevrilmiş alan adları -> değer. 'key:=value' biçimindeki
+              anahtar/değer satırları 'key_values' altında, başlığın bayt uzunluğu
+              (voksel verisinin başladığı konum) 'header_size' altında toplanır.
+    """
+    with open(path, 'rb') as f:
+        raw = f.read(MAX_HEADER_BYTES)
+
+    if not raw.startswith(b'NRRD'):
+        raise ValueError(f"'{path}' bir NRRD dosyası değil.")
+
+    # Başlık ilk boş satırda biter; sonrası (sıkıştırılmış olabilecek) voksel verisidir.
+    end = raw.find(b'\n\n')
+    if end < 0:
+        raise ValueError(f"'{path}' dosyasının NRRD başlığı okunamadı.")
+
+    fields = {'key_values': {}, 'header_size': end + 2}
+    for line in raw[:end].decode('latin-1').splitlines()[1:]:
+        if not line or line.startswith('#'):
+            continue
+        if ':=' in line:
+            key, value = line.split(':=', 1)
+            fields['key_values'][key] = value
+        elif ': ' in line:
+            key, value = line.split(': ', 1)
+            fields[key.strip().lower()] = value.strip()
+    return fields
+
+
+def _parse_vectors(value):
+    """'(1,0,0) (0,1,0) none' gibi bir alanı vektör listesine çevirir ('none' -> None)."""
+    vectors = []
+    for match in _VECTOR_RE.finditer(value):
+        if match.group(0) == 'none':
+            vectors.append(None)
+        else:
+            vectors.append([float(v) for v in match.group(1).split(',')])
+    return vectors
+
+
+def nrrd_geometry(path):
+    """
+    NRRD başlığından, SimpleITK ile aynı kurallara göre görüntü geometrisini çıkarır.
+
+    Args:
+        path (str): .nrrd dosyasının yolu.
+
+    Returns:
+        dict: 'size' (x, y, z), 'spacing', 'origin', 'direction' (SimpleITK gibi satır öncelikli),
+              'components', 'type', 'encoding', 'voxels' ve 'bytes' (sıkıştırılmamış veri boyutu).
+    """
+    header = read_nrrd_header(path)
+    sizes = [int(s) for s in header['sizes'].split()]
+
+    if 'space directions' in header:
+        vectors = _parse_vectors(header['space directions'])
+    else:
+        # Uzay yönü verilmemişse eksenler dik kabul edilir; voksel aralığı 'spacings' alanındadır.
+        spacings = header.get('spacings', ' '.join(['1'] * len(sizes))).split()
+        vectors = []
+        for axis, spacing in enumerate(spacings):
+            if spacing.lower() == 'nan':
+                vectors.append(None)
+            else:
+                vector = [0.0] * len(sizes)
+                vector[axis] = float(spacing)
+                vectors.append(vector)
+
+    # Yön vektörü olmayan eksenler (örn. 'list', 'vector' tipleri) kanal eksenleridir.
+    spatial_axes = [i for i, v in enumerate(vectors) if v is not None]
+    components = 1
+    for i, v in enumerate(vectors):
+        if v is None:
+            components *= sizes[i]
+
+    dim = len(spatial_axes)
+    spatial_vectors = [vectors[i] for i in spatial_axes]
+    origin = _parse_vectors(header['space origin'])[0] if 'space origin' in header else [0.0] * dim
+
+    # ITK, RAS uzayında yazılmış dosyaları LPS'e çevirir (ilk iki eksenin işareti değişir).
+    space = header.get('space', 'left-posterior-superior').lower()
+    if space in ('right-anterior-superior', 'ras'):
+        spatial_vectors = [[-v[0], -v[1]] + v[2:] for v in spatial_vectors]
+        origin = [-origin[0], -origin[1]] + origin[2:]
+
+    spacing = [math.sqrt(sum(c * c for c in v)) for v in spatial_vectors]
+    # Yön matrisinin j. sütunu j. eksenin birim vektörüdür; SimpleITK satır öncelikli döndürür.
+    direction = [spatial_vectors[col][row] / spacing[col] for row in range(dim) for col in range(dim)]
+
+    size = [sizes[i] for i in spatial_axes]
+    voxels = 1
+    for s in size:
+        voxels *= s
+    pixel_type = header.get('type', '').lower()
+
+    return {
+        'size': size,
+        'spacing': spacing,
+        'origin': origin,
+        'direction': direction,
+        'components': components,
+        'type': pixel_type,
+        'encoding': header.get('encoding', 'raw').lower(),
+        'voxels': voxels,
+        'bytes': voxels * components * int(_TYPE_CODES.get(pixel_type, 'x0')[1:]),
+    }
+
+
+def geometry_mismatches(image_geometry, mask_geometry, tolerance=DEFAULT_GEOMETRY_TOLERANCE):
+    """
+    Maskenin taramayla aynı fiziksel uzayda olup olmadığını kontrol eder ve farkları listeler.
+
+    Voksel sayıları (size) doğrudan karşılaştırılmaz: Slicer'ın segment sınırlarına kırpılmış
+    .seg.nrrd dosyaları ve çok katmanlı segmentasyonlar taramadan daha az voksel içerir ama
+    aynı ızgaradadır. Bunun yerine yön, voksel aralığı ve maskenin fiziksel kapsamının
+    taramanın içinde kalıp kalmadığı karşılaştırılır.
+
+    Args:
+        image_geometry (dict): nrrd_geometry() ile okunan tarama geometrisi.
+        mask_geometry (dict): nrrd_geometry() ile okunan maske geometrisi.
+        tolerance (float): PyRadiomics'in 'geometryTolerance' ayarıyla aynı anlamda tolerans:
+                           yön için mutlak, voksel aralığı ve konum için voksel aralığı cinsinden.
+
+    Returns:
+        list: Farkları açıklayan metinler. Boşsa geometriler uyumludur.
+    """
+    problems = []
+    if len(image_geometry['size']) != len(mask_geometry['size']):
+        problems.append(f"boyut sayısı farklı: {len(image_geometry['size'])} != {len(mask_geometry['size'])}")
+        return problems
+
+    for a, b in zip(image_geometry['direction'], mask_geometry['direction']):
+        if abs(a - b) > tolerance:
+            problems.append(f"yön farklı: {image_geometry['direction']} != {mask_geometry['direction']}")
+            break
+
+    coordinate_tolerance = tolerance * min(image_geometry['spacing'])
+    for a, b in zip(image_geometry['spacing'], mask_geometry['spacing']):
+        if abs(a - b) > coordinate_tolerance:
+            problems.append(f"voksel aralığı farklı: {image_geometry['spacing']} != {mask_geometry['spacing']}")
+            break
+
+    # Maskenin köşe voksellerinin merkezleri, taramanın voksel merkezlerinin kapsadığı alanda olmalı.
+    corners = itertools.product(*[(0, s - 1) for s in mask_geometry['size']])
+    for corner in corners:
+        index = physical_point_to_index(image_geometry, index_to_physical_point(mask_geometry, corner))
+        if any(i < -tolerance or i > s - 1 + tolerance for i, s in zip(index, image_geometry['size'])):
+            problems.append("maske taramanın fiziksel kapsamı dışına taşıyor "
+                            f"(köşe {list(corner)} -> tarama indeksi {[round(i, 2) for i in index]})")
+            break
+
+    return problems
+
+
+def same_voxel_grid(image_geometry, mask_geometry, tolerance=DEFAULT_GEOMETRY_TOLERANCE):
+    """
+    Maske taramayla voksel voksel aynı ızgaradaysa (aynı boyut ve orijin) True döndürür.
+
+    geometry_mismatches ile uyumlu ama bu fonksiyonla False dönen (kırpılmış veya kaydırılmış)
+    maskeler için PyRadiomics'in maskeyi taramaya yeniden örneklemesi ('correctMask') gerekir.
+    """
+    if image_geometry['size'] != mask_geometry['size']:
+        return False
+    coordinate_tolerance = tolerance * min(image_geometry['spacing'])
+    return all(abs(a - b) <= coordinate_tolerance for a, b in zip(image_geometry['origin'], mask_geometry['origin']))
+
+
+def read_value_range(path):
+    """
+    Başlıktaki değer aralığını (VALUE_RANGE_KEYS) okur.
+
+    Returns:
+        tuple veya None: (en küçük, en büyük). Başlıkta yoksa veya sonlu sayı değilse None.
+    """
+    key_values = read_nrrd_header(path)['key_values']
+    try:
+        low, high = (float(key_values[key]) for key in VALUE_RANGE_KEYS)
+    except (KeyError, ValueError):
+        return None
+    if not (math.isfinite(low) and math.isfinite(high)):
+        return None
+    return low, high
+
+
+def nrrd_raw_layout(path):
+    """
+    Sıkıştırılmamış ('raw') NRRD dosyasında voksel verisinin yerleşimini döndürür.
+
+    Bu bilgiyle veri, dosyadan doğrudan bellek eşlemeli (np.memmap) okunabilir.
+
+    Args:
+        path (str): .nrrd dosyasının yolu.
+
+    Returns:
+        dict veya None: 'offset' (bayt), 'dtype' (örn. '<i2') ve 'shape' (z, y, x[, kanal]).
+                        Veri sıkıştırılmışsa, ayrı bir dosyadaysa veya yerleşim desteklenmiyorsa None.
+    """
+    header = read_nrrd_header(path)
+    code = _TYPE_CODES.get(header.get('type', '').lower())
+    if (code is None or header.get('encoding', '').lower() != 'raw'
+            or 'data file' in header or 'datafile' in header
+            or int(header.get('line skip', 0)) != 0 or int(header.get('byte skip', 0)) != 0):
+        return None
+
+    sizes = [int(s) for s in header['sizes'].split()]
+    # Kanal ekseni (yön vektörü olmayan eksen) sadece en hızlı değişen eksense desteklenir;
+    # bu durumda ters çevrilmiş boyutlar SimpleITK dizisiyle aynı (z, y, x, kanal) olur.
+    if 'space directions' in header:
+        vectors = _parse_vectors(header['space directions'])
+        if any(v is None for v in vectors[1:]):
+            return None
+    endian = '>' if header.get('endian', 'little').lower() == 'big' else '<'
+    return {
+        'offset': header['header_size'],
+        'dtype': endian + code,
+        'shape': tuple(reversed(sizes)),
+    }
+
+
+def index_to_physical_point(geometry, index):
+    """
+    Voksel indeksini (x, y, z) fiziksel koordinata çevirir (sitk.TransformIndexToPhysicalPoint gibi).
+
+    Args:
+        geometry (dict): nrrd_geometry() veya aynı anahtarlara sahip geometri.
+        index (list): Voksel indeksi (tam sayı olması gerekmez).
+
+    Returns:
+        list: Fiziksel koordinat (mm).
+    """
+    dim = len(geometry['size'])
+    direction, spacing = geometry['direction'], geometry['spacing']
+    return [geometry['origin'][row] + sum(direction[row * dim + col] * spacing[col] * index[col] for col in range(dim))
+            for row in range(dim)]
+
+
+def physical_point_to_index(geometry, point):
+    """
+    Fiziksel koordinatı sürekli voksel indeksine (x, y, z) çevirir. Yön matrisi ortonormal kabul edilir.
+
+    Returns:
+        list: Yuvarlanmamış voksel indeksi.
+    """
+    dim = len(geometry['size'])
+    direction, spacing = geometry['direction'], geometry['spacing']
+    delta = [point[row] - geometry['origin'][row] for row in range(dim)]
+    return [sum(direction[row * dim + col] * delta[row] for row in range(dim)) / spacing[col] for col in range(dim)]
+
+
+def format_raw_nrrd_header(size, spacing, origin, direction, pixel_type='float', key_values=None):
+    """
+    Sıkıştırılmamış ('raw', little-endian) bir NRRD dosyasının başlığını üretir.
+
+    Başlığın hemen ardından (z, y, x) C sıralı voksel verisi yazılırsa, dosya SimpleITK ile
+    aynı geometride okunur ve nrrd_raw_layout ile bellek eşlemeli açılabilir.
+
+    Args:
+        size (list): Eksen başına voksel sayısı (x, y, z).
+        spacing (list): Voksel aralığı (mm).
+        origin (list): Orijin (LPS, mm).
+        direction (list): SimpleITK gibi satır öncelikli yön matrisi.
+        pixel_type (str): NRRD tipi (örn. 'float', 'short').
+        key_values (dict): Başlığa 'anahtar:=değer' satırları olarak eklenecek metinler.
+
+    Returns:
+        bytes: Boş satırla biten başlık.
+    """
+    dim = len(size)
+    vectors = ['(' + ','.join(repr(float(direction[row * dim + col] * spacing[col])) for row in range(dim)) + ')'
+               for col in range(dim)]
+    lines = [
+        'NRRD0004',
+        f'type: {pixel_type}',
+        f'dimension: {dim}',
+        'space: left-posterior-superior',
+        'sizes: ' + ' '.join(str(int(s)) for s in size),
+        'space directions: ' + ' '.join(vectors),
+        'kinds: ' + ' '.join(['domain'] * dim),
+        'endian: little',
+        'encoding: raw',
+        'space origin: (' + ','.join(repr(float(o)) for o in origin) + ')',
+    ]
+    lines += [f'{key}:={value}' for key, value in (key_values or {}).items()]
+    return ('\n'.join(lines) + '\n\n').encode('ascii')
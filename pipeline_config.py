@@ -0,0 +1,55 @@
+import os
+
+# --- Ortak Pipeline Ayarları ve Hasta Klasörleri ---
+# Çıkarım ayarları ve hasta klasörlerinin düzeni, PyRadiomics'i yüklemeden de kullanılabilsin diye
+# (örn. komut satırı aracının deneme çalışması ve planlaması, bkz. cli) ağır kütüphanelerden
+# bağımsız bu modülde tutulur. radiomics_extractor bu adları olduğu gibi dışa aktarır.
+
+# --- Radyomik Özellik Çıkarıcının (Extractor) Ayarları ---
+# PyRadiomics'e hangi ayarlarla çalışacağını söylediğimiz bölüm.
+# Ayarları bir sözlük (dictionary) yapısı içinde tanımlıyoruz.
+# ÖNEMLİ DÜZELTME: 'force2D' ve 'label' gibi parametreler, 'setting' anahtarı altında olmalıdır.
+# Paralel modda her işçi süreç kendi extractor'ını bu sözlükten yeniden kurar.
+RADIOMICS_SETTINGS = {
+    'setting': {
+        'force2D': False,  # Görüntülerimiz 3D olduğu için bu ayar 'False' olmalı. Eğer 2D analiz yapsaydık 'True' olurdu.
+        'label': 1         # Segmentasyon (.nrrd) dosyasındaki tümör etiketinin sayısal değeri. Genellikle 1'dir.
+                           # Eğer maskenizde farklı değerler varsa (örn: 2, 3), bu sayıyı değiştirmeniz gerekir.
+    }
+}
+
+# Her hasta klasöründe okunacak segmentasyon dosyaları. Aynı taramaya ait birden fazla maske
+# (örn. A/B değerlendiricisi, alt bölgeler) varsa buraya eklenebilir.
+DEFAULT_MASK_NAMES = ('segmentation.nrrd',)
+
+
+def find_patient_folders(data_folder_path):
+    """
+    Ana veri klasöründeki hasta klasörlerini isme göre sıralı olarak listeler.
+
+    Args:
+        data_folder_path (str): İçinde hasta klasörlerinin bulunduğu ana veri klasörünün yolu.
+
+    Returns:
+        list: (patient_id, patient_folder_path) ikililerinden oluşan liste.
+    """
+    patients = []
+    # sorted() ile klasörlerin isme göre sıralı işlenmesini sağlıyoruz.
+    for patient_folder_name in sorted(os.listdir(data_folder_path)):
+        # Tam klasör yolunu oluşturuyoruz. os.path.join kullanmak, kodu Windows/Linux/Mac uyumlu yapar.
+        patient_folder_path = os.path.join(data_folder_path, patient_folder_name)
+
+        # Eğer işlediğimiz öğe bir dosya değil de bir klasör ise listeye ekliyoruz.
+        # '.' ile başlayan klasörler (örn. '.radiomics_cache') hasta klasörü değildir.
+        if os.path.isdir(patient_folder_path) and not patient_folder_name.startswith('.'):
+            patients.append((patient_folder_name, patient_folder_path))
+    return patients
+
+
+def patient_input_paths(patient_folder_path, mask_names=DEFAULT_MASK_NAMES):
+    """Hastanın sonucunu belirleyen girdi dosyalarını, önbellek anahtarındaki adlarıyla döndürür."""
+    input_paths = {'scan': os.path.join(patient_folder_path, 'scan.nrrd')}
+    for name in mask_names:
+        key = 'mask' if tuple(mask_names) == DEFAULT_MASK_NAMES else f'mask:{name}'
+        input_paths[key] = os.path.join(patient_folder_path, name)
+    return input_paths
@@ -0,0 +1,231 @@
+import os
+import csv
+import json
+import time
+import threading
+import contextlib
+
+# --- Çıkarım Profili (Süre ve Bellek Ölçümü) ---
+# Yavaş bir çalışmada sürenin nereye gittiğini (tarama okuma, çok kanallı dönüşüm, belirli bir
+# görüntü tipi veya özellik sınıfı) görebilmek için her adımın süresini ve o adım sırasında
+# ulaşılan en yüksek bellek kullanımını (RSS) kaydediyoruz.
+#
+# Bellek, arka planda çalışan bir iş parçacığı tarafından kısa aralıklarla örneklenir; böylece
+# SimpleITK/NumPy'ın C tarafındaki ayırmaları da ölçülür. İç içe adımlarda (örn. hastanın
+# toplamı ve içindeki filtre adımı) her adım kendi en yüksek değerini ayrı tutar.
+
+# Bellek örnekleme aralığı (saniye).
+RSS_SAMPLE_INTERVAL = 0.005
+
+# Profil kayıtlarında kullanılan sütunlar (CSV sütun sırası).
+PROFILE_FIELDS = ('PatientID', 'stage', 'image_type', 'image', 'feature_class', 'target',
+                  'seconds', 'peak_rss_mb', 'rss_delta_mb')
+
+
+def _current_rss_bytes():
+    """Sürecin o anki bellek kullanımını (RSS) bayt olarak döndürür; ölçülemiyorsa None."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import psutil  # Linux dışındaki sistemlerde (kuruluysa) kullanılır.
+        return psutil.Process().memory_info().rss
+    except ImportError:
+        return None
+
+
+class ExtractionProfiler:
+    """
+    Bir hastanın çıkarım adımlarını süre ve en yüksek bellek kullanımıyla kaydeder.
+
+    Kullanım:
+        profiler = ExtractionProfiler('Hasta_1')
+        with profiler.stage('read_scan'):
+            ...
+        profiler.close()
+        profiler.records  # adım başına bir sözlük
+    """
+
+    def __init__(self, patient_id, sample_interval=RSS_SAMPLE_INTERVAL):
+        """
+        Args:
+            patient_id (str): Kayıtlara yazılacak hasta kimliği.
+            sample_interval (float): Bellek örnekleme aralığı (saniye).
+        """
+        self.patient_id = patient_id
+        self.records = []
+        self._open_stages = []
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._sampler = None
+        if _current_rss_bytes() is not None:
+            self._sampler = threading.Thread(target=self._sample, args=(sample_interval,), daemon=True)
+            self._sampler.start()
+
+    def _sample(self, interval):
+        while not self._stop.wait(interval):
+            self._update_peaks(_current_rss_bytes())
+
+    def _update_peaks(self, rss):
+        if rss is None:
+            return
+        with self._lock:
+            for open_stage in self._open_stages:
+                if rss > open_stage['peak']:
+                    open_stage['peak'] = rss
+
+    @contextlib.contextmanager
+    def stage(self, name, **labels):
+        """
+        Bir adımı ölçer. Adım bittiğinde (hata olsa bile) bir kayıt eklenir.
+
+        Bağlam, kayda eklenecek alanların sözlüğünü döndürür; adım sırasında öğrenilen bilgiler
+        (örn. türetilmiş görüntünün adı) buna eklenebilir. Sözlüğe 'discard': True yazılırsa
+        kayıt eklenmez.
+
+        Args:
+            name (str): Adım adı (örn. 'read_scan', 'filter', 'features').
+            **labels: Kayda eklenecek ek alanlar (image_type, image, feature_class, target).
+        """
+        start_rss = _current_rss_bytes()
+        open_stage = {'peak': start_rss or 0}
+        with self._lock:
+            self._open_stages.append(open_stage)
+        start = time.perf_counter()
+        try:
+            yield labels
+        finally:
+            seconds = time.perf_counter() - start
+            end_rss = _current_rss_bytes()
+            self._update_peaks(end_rss)
+            with self._lock:
+                # list.remove '==' ile karşılaştırır; aynı tepe değerine sahip başka bir adımın
+                # sözlüğünü silmemek için kimliğe (is) göre siliyoruz.
+                del self._open_stages[next(i for i, s in enumerate(self._open_stages) if s is open_stage)]
+            if not labels.pop('discard', False):
+                record = {'PatientID': self.patient_id, 'stage': name}
+                record.update(labels)
+                record['seconds'] = seconds
+                if start_rss is None:
+                    record['peak_rss_mb'] = record['rss_delta_mb'] = None
+                else:
+                    record['peak_rss_mb'] = open_stage['peak'] / (1024 * 1024)
+                    record['rss_delta_mb'] = (end_rss - start_rss) / (1024 * 1024)
+                self.records.append(record)
+
+    def close(self):
+        """Bellek örnekleme iş parçacığını durdurur."""
+        self._stop.set()
+        if self._sampler is not None:
+            self._sampler.join()
+
+
+def profile_stage(profiler, name, **labels):
+    """profiler verilmişse profiler.stage(...), verilmemişse hiçbir şey yapmayan bağlam döndürür."""
+    if profiler is None:
+        return contextlib.nullcontext({})
+    return profiler.stage(name, **labels)
+
+
+def write_patient_profile(records, patient_id, patient_folder_path):
+    """
+    Hastanın profil kayıtlarını '<hasta>_profile.json' dosyasına yazar.
+
+    Returns:
+        str: Yazılan dosyanın yolu.
+    """
+    profile_path = os.path.join(patient_folder_path, f'{patient_id}_profile.json')
+    with open(profile_path, 'w', encoding='utf-8') as f:
+        json.dump(records, f, ensure_ascii=False, indent=1)
+    return profile_path
+
+
+def summarize_profiles(records):
+    """
+    Tüm hastaların kayıtlarını adım / görüntü tipi / özellik sınıfı bazında toplar.
+
+    Hastanın toplam süresini gösteren 'patient' kayıtları özete katılmaz; paylar bu toplamın
+    yüzdesi olarak verilir.
+
+    Returns:
+        list: Toplam süreye göre azalan sırada özet satırları.
+    """
+    total_seconds = sum(r['seconds'] for r in records if r['stage'] == 'patient')
+    groups = {}
+    for record in records:
+        if record['stage'] == 'patient':
+            continue
+        key = (record['stage'], record.get('image_type') or '', record.get('feature_class') or '')
+        group = groups.setdefault(key, {'seconds': 0.0, 'calls': 0, 'patients': set(), 'peak_rss_mb': None})
+        group['seconds'] += record['seconds']
+        group['calls'] += 1
+        group['patients'].add(record['PatientID'])
+        if record.get('peak_rss_mb') is not None:
+            group['peak_rss_mb'] = max(group['peak_rss_mb'] or 0, record['peak_rss_mb'])
+
+    summary = []
+    for (stage, image_type, feature_class), group in groups.items():
+        summary.append({
+            'stage': stage,
+            'image_type': image_type,
+            'feature_class': feature_class,
+            'total_seconds': group['seconds'],
+            'share_percent': 100 * group['seconds'] / total_seconds if total_seconds else None,
+            'seconds_per_patient': group['seconds'] / len(group['patients']),
+            'calls': group['calls'],
+            'peak_rss_mb': group['peak_rss_mb'],
+        })
+    summary.sort(key=lambda row: row['total_seconds'], reverse=True)
+    return summary
+
+
+def write_cohort_profile(profile_paths, output_folder, top_n=15):
+    """
+    Hastaların profil dosyalarını birleştirir, kohort özetini yazar ve en pahalı adımları basar.
+
+    Şu dosyalar output_folder içine yazılır:
+      - radiomics_profile.csv: Tüm hastaların tüm adım kayıtları.
+      - radiomics_profile_summary.csv: Adım / görüntü tipi / özellik sınıfı bazında özet.
+      - radiomics_profile.json: Kayıtlar ve özet birlikte.
+
+    Args:
+        profile_paths (list): write_patient_profile ile yazılmış dosyaların yolları.
+        output_folder (str): Birleşik dosyaların yazılacağı klasör.
+        top_n (int): Konsola yazdırılacak en pahalı adım sayısı.
+
+    Returns:
+        list: Özet satırları (bkz. summarize_profiles).
+    """
+    records = []
+    for profile_path in profile_paths:
+        with open(profile_path, encoding='utf-8') as f:
+            records.extend(json.load(f))
+
+    summary = summarize_profiles(records)
+
+    with open(os.path.join(output_folder, 'radiomics_profile.csv'), 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=PROFILE_FIELDS, extrasaction='ignore')
+        writer.writeheader()
+        writer.writerows(records)
+
+    summary_fields = ('stage', 'image_type', 'feature_class', 'total_seconds', 'share_percent',
+                      'seconds_per_patient', 'calls', 'peak_rss_mb')
+    with open(os.path.join(output_folder, 'radiomics_profile_summary.csv'), 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=summary_fields)
+        writer.writeheader()
+        writer.writerows(summary)
+
+    with open(os.path.join(output_folder, 'radiomics_profile.json'), 'w', encoding='utf-8') as f:
+        json.dump({'records': records, 'summary': summary}, f, ensure_ascii=False, indent=1)
+
+    n_patients = len({r['PatientID'] for r in records})
+    print(f"\nProfil: {n_patients} hasta. En pahalı {min(top_n, len(summary))} adım:")
+    print(f"  {'Adım':<12}{'Görüntü Tipi':<14}{'Özellik Sınıfı':<16}{'Toplam sn':>11}{'Pay %':>8}{'Peak MB':>10}")
+    for row in summary[:top_n]:
+        share = f"{row['share_percent']:.1f}" if row['share_percent'] is not None else '-'
+        peak = f"{row['peak_rss_mb']:.0f}" if row['peak_rss_mb'] is not None else '-'
+        print(f"  {row['stage']:<12}{row['image_type']:<14}{row['feature_class']:<16}"
+              f"{row['total_seconds']:>11.2f}{share:>8}{peak:>10}")
+    return summary
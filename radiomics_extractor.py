@@ -1,54 +1,1267 @@
 import os
-import pandas as pd
-import SimpleITK as sitk
-from radiomics import featureextractor
+import math
+import time
+import json
+import hashlib
+import collections
+from concurrent.futures import ThreadPoolExecutor
 import logging
 
+from extraction_cache import ExtractionCache
+from nrrd_header import nrrd_geometry
+from profiling import ExtractionProfiler, profile_stage, write_patient_profile, write_cohort_profile
+from extraction_plan import (build_extraction_plan, read_required_features, estimate_plan_cost,
+                             print_plan_summary, image_type_passes, check_plan_coverage)
+from work_queue import WorkQueue, DEFAULT_LEASE_SECONDS
+from csv_orginizer import read_patient_csv
+from pipeline_config import RADIOMICS_SETTINGS, DEFAULT_MASK_NAMES, find_patient_folders, patient_input_paths
+
+# --- Ağır Kütüphaneler ---
+# PyRadiomics, PyWavelets, SimpleITK, pandas, joblib ve bunlara dayanan modüller (feature_store,
+# volume_cache) modülün başında değil, onları kullanan fonksiyonların içinde yüklenir. Böylece bu
+# modülü içe aktarmak (örn. cli, planlama, dağıtık mod yardımcıları) anında biter; kütüphaneler
+# sadece gerçekten özellik çıkarılırken bir kez yüklenir.
+
 # --- Konsol Çıktısını Düzenleme ---
 # PyRadiomics normalde çalıştığı her adımla ilgili çok detaylı bilgi basar.
-# Bu, konsolun okunmasını zorlaştırabilir. Bu satır ile sadece ciddi HATA (ERROR) mesajlarını
-# göstermesini, diğer bilgilendirme mesajlarını gizlemesini sağlıyoruz.
-logger = logging.getLogger("radiomics")
-logger.setLevel(logging.ERROR)
+# Bu, konsolun okunmasını zorlaştırabilir. Bu seviye ile sadece ciddi HATA (ERROR) mesajlarını
+# göstermesini, diğer bilgilendirme mesajlarını gizlemesini sağlıyoruz. PyRadiomics yüklenirken
+# kendi seviyesini ayarladığı için bu ayar yüklemeden sonra, build_extractor içinde yapılır.
+RADIOMICS_LOG_LEVEL = logging.ERROR
 
-# --- Ana Fonksiyon ---
-def extract_radiomics_features(data_folder_path):
-    """
-    Belirtilen klasör yapısından radyomik özellikleri çıkarır.
+# Bir işçi sürecin içinde kurulan extractor'ı saklar. joblib (loky) işçi süreçleri
+# tekrar kullandığı için, extractor her hasta için değil süreç başına bir kez kurulur.
+_WORKER_EXTRACTOR = None
+_WORKER_PLAN = None
 
-    Bu fonksiyon, dağınık bir veri setini alır, olası veri formatı hatalarını
-    (örn: çok kanallı görüntüler) otomatik olarak düzeltir ve hem her hasta için
-    ayrı ayrı hem de tüm hastalar için birleşik bir CSV sonuç dosyası üretir.
+
+def build_extractor(settings=RADIOMICS_SETTINGS, feature_plan=None):
+    """
+    Verilen ayarlarla, tüm görüntü tipleri ve özellikleri etkinleştirilmiş bir extractor kurar.
 
     Args:
-        data_folder_path (str): İçinde hasta klasörlerinin bulunduğu ana veri klasörünün yolu.
+        settings (dict): PyRadiomics parametre sözlüğü.
+        feature_plan (dict): Verilirse (bkz. extraction_plan.build_extraction_plan) sadece planın
+                             görüntü tipleri, filtre parametreleri ve özellikleri etkinleştirilir.
+
+    Returns:
+        featureextractor.RadiomicsFeatureExtractor: Kullanıma hazır extractor.
+
+    Raises:
+        ValueError: Planda PyRadiomics'te bulunmayan veya plana göre üretilmeyecek özellikler varsa.
     """
-    # --- 1. Radyomik Özellik Çıkarıcının (Extractor) Ayarlanması ---
-    # PyRadiomics'e hangi ayarlarla çalışacağını söylediğimiz bölüm.
-    # Ayarları bir sözlük (dictionary) yapısı içinde tanımlıyoruz.
-    # ÖNEMLİ DÜZELTME: 'force2D' ve 'label' gibi parametreler, 'setting' anahtarı altında olmalıdır.
-    settings = {
-        'setting': {
-            'force2D': False,  # Görüntülerimiz 3D olduğu için bu ayar 'False' olmalı. Eğer 2D analiz yapsaydık 'True' olurdu.
-            'label': 1         # Segmentasyon (.nrrd) dosyasındaki tümör etiketinin sayısal değeri. Genellikle 1'dir.
-                               # Eğer maskenizde farklı değerler varsa (örn: 2, 3), bu sayıyı değiştirmeniz gerekir.
-        }
-    }
-    
+    import radiomics
+    from radiomics import featureextractor
+    logging.getLogger('radiomics').setLevel(RADIOMICS_LOG_LEVEL)
+
     # Özellik çıkarıcıyı (extractor) yukarıdaki ayarlarla başlatıyoruz.
     extractor = featureextractor.RadiomicsFeatureExtractor(settings)
-    
+
+    if feature_plan is not None:
+        # Özellik adlarını hesaplamadan önce doğruluyoruz; yazım hatası olan bir ad her
+        # hastada ayrı ayrı hata vermesin.
+        available = radiomics.getFeatureClasses()
+        unknown = [f'{feature_class}_{name}' for feature_class, names in feature_plan['feature_classes'].items()
+                   for name in names
+                   if feature_class not in available or name not in available[feature_class].getFeatureNames()]
+        if unknown:
+            raise ValueError(f"PyRadiomics'te bulunmayan özellikler: {', '.join(unknown)}")
+        check_plan_coverage(feature_plan, extractor.settings)
+
+        extractor.disableAllImageTypes()
+        extractor.enableImageTypes(**feature_plan['image_types'])
+        extractor.disableAllFeatures()
+        extractor.enableFeaturesByName(**feature_plan['feature_classes'])
+        return extractor
+
     # Mümkün olan TÜM özellikleri çıkarmasını istiyoruz.
     # Bu iki satır, Shape, First Order, GLCM, GLSZM gibi tüm özellik sınıflarını ve
     # Wavelet, LoG gibi tüm dönüştürülmüş görüntü tiplerini analize dahil eder.
     # Sonuç olarak 400 yerine 1000'in üzerinde özellik çıkarılmasını sağlar.
     extractor.enableAllImageTypes()
     extractor.enableAllFeatures()
+    return extractor
+
+
+# --- ROI Kırpma (Bounding Box + Kenar Payı) ---
+# Wavelet, LoG, Gradient, LBP gibi türetilmiş görüntüler normalde tüm tarama hacmi üzerinde
+# hesaplanır. Tümör hacmin küçük bir kısmını kapladığı için, görüntüyü ve maskeyi maskenin
+# sınırlayıcı kutusu (bounding box) artı en büyük filtre çekirdeğinin ihtiyaç duyduğu kenar
+# payı kadar kırparak aynı özellikleri çok daha kısa sürede hesaplayabiliriz.
+
+# Bu görüntü tipleri nokta bazlıdır ama tüm görüntünün en büyük mutlak değeriyle ölçeklenir.
+# Kırpılmış görüntünün en büyük değeri farklı olabileceği için bunlar kırpılmadan hesaplanır.
+GLOBAL_INTENSITY_IMAGE_TYPES = ('Square', 'SquareRoot', 'Logarithm', 'Exponential')
+
+# Filtre destek yarıçapına ek olarak bırakılan güvenlik payı (voksel).
+CROP_MARGIN_VOXELS = 2
+
+# LoG çekirdeğinin etkisinin ihmal edilebilir olduğu mesafe (sigma cinsinden).
+LOG_SUPPORT_SIGMAS = 4
+
+
+def image_type_of_feature(feature_name):
+    """
+    Özellik adından, onu üreten PyRadiomics görüntü tipini bulur.
+
+    Örn: 'wavelet-LLH_glcm_Correlation' -> 'Wavelet', 'original_shape_Elongation' -> 'Original'.
+
+    Args:
+        feature_name (str): PyRadiomics özellik (sütun) adı.
+
+    Returns:
+        str veya None: Görüntü tipi adı; tanınmazsa None.
+    """
+    prefix = feature_name.split('_', 1)[0]
+    if prefix.startswith('wavelet'):
+        return 'Wavelet'
+    if prefix.startswith('log-'):
+        return 'LoG'
+    if prefix.startswith('lbp-2D'):
+        return 'LBP2D'
+    if prefix.startswith('lbp-3D'):
+        return 'LBP3D'
+    return {
+        'original': 'Original',
+        'square': 'Square',
+        'squareroot': 'SquareRoot',
+        'logarithm': 'Logarithm',
+        'exponential': 'Exponential',
+        'gradient': 'Gradient',
+    }.get(prefix)
+
+
+def compute_crop_padding(extractor, image):
+    """
+    Etkin görüntü tiplerinin filtre çekirdeklerine göre eksen başına kenar payını hesaplar.
+
+    Args:
+        extractor (featureextractor.RadiomicsFeatureExtractor): Ayarları okunacak extractor.
+        image (sitk.Image): Voksel aralığı (spacing) kullanılacak tarama.
+
+    Returns:
+        list: SimpleITK eksen sırasıyla (x, y, z) voksel cinsinden kenar payları.
+    """
+    import pywt
+
+    spacing = image.GetSpacing()
+    padding = [0] * image.GetDimension()
+
+    for image_type, custom_args in extractor.enabledImagetypes.items():
+        args = dict(extractor.settings)
+        args.update(custom_args or {})
+
+        if image_type == 'Wavelet':
+            # Durağan wavelet dönüşümünde (SWT) her seviyede filtre iki kat genişler.
+            # Toplam destek: (filtre uzunluğu - 1) * (2^seviye - 1) voksel.
+            dec_len = pywt.Wavelet(args.get('wavelet', 'coif1')).dec_len
+            levels = args.get('start_level', 0) + args.get('level', 1)
+            axis_pad = [(dec_len - 1) * (2 ** levels - 1)] * len(padding)
+        elif image_type == 'LoG':
+            # Sigma değerleri mm cinsindendir; her eksende voksel aralığına bölüyoruz.
+            sigmas = args.get('sigma', [])
+            if not sigmas:
+                continue
+            axis_pad = [int(math.ceil(LOG_SUPPORT_SIGMAS * max(sigmas) / s)) for s in spacing]
+        elif image_type == 'Gradient':
+            axis_pad = [1] * len(padding)
+        elif image_type == 'LBP2D':
+            axis_pad = [int(math.ceil(args.get('lbp2DRadius', 1)))] * len(padding)
+        elif image_type == 'LBP3D':
+            radius = args.get('lbp3DLevels', 2) * args.get('lbp3DIcosphereRadius', 1)
+            axis_pad = [int(math.ceil(radius))] * len(padding)
+        else:
+            # Original ve nokta bazlı tipler komşu voksele ihtiyaç duymaz.
+            continue
+
+        padding = [max(p, a) for p, a in zip(padding, axis_pad)]
+
+    return [p + CROP_MARGIN_VOXELS for p in padding]
+
+
+def crop_image_and_masks(image, masks, padding, labels=(1,)):
+    """
+    Görüntüyü ve maskeleri, tüm maskelerdeki etiketlerin ortak sınırlayıcı kutusu artı
+    kenar payı kadar kırpar.
+
+    Maskelerden biri vektör tipindeyse, görüntüyle aynı ızgarada değilse veya hiçbir etiket
+    bulunamazsa kırpma yapılmaz; hata kontrolü PyRadiomics'e bırakılır.
+
+    Args:
+        image (sitk.Image): Tarama görüntüsü.
+        masks (dict): Maske adı -> segmentasyon maskesi (sitk.Image).
+        padding (list): Eksen başına (x, y, z) voksel cinsinden kenar payı.
+        labels (list): Sınırlayıcı kutusu alınacak etiket değerleri.
+
+    Returns:
+        tuple: Kırpılmış görüntü ve aynı anahtarlarla kırpılmış maskeler sözlüğü.
+    """
+    import SimpleITK as sitk
+
+    dim = image.GetDimension()
+    size = image.GetSize()
+    lower, upper = list(size), [0] * dim
+
+    for mask in masks.values():
+        if mask.GetNumberOfComponentsPerPixel() > 1 or mask.GetSize() != size:
+            return image, masks
+
+        label_stats = sitk.LabelShapeStatisticsImageFilter()
+        label_stats.Execute(sitk.Cast(mask, sitk.sitkUInt32))
+        for label in labels:
+            if label not in label_stats.GetLabels():
+                continue
+            bounding_box = label_stats.GetBoundingBox(label)  # (x, y, z, boyut_x, boyut_y, boyut_z)
+            lower = [min(lower[i], bounding_box[i]) for i in range(dim)]
+            upper = [max(upper[i], bounding_box[i] + bounding_box[dim + i]) for i in range(dim)]
+
+    if any(l >= u for l, u in zip(lower, upper)):
+        return image, masks
+
+    lower = [max(0, lower[i] - padding[i]) for i in range(dim)]
+    upper = [min(size[i], upper[i] + padding[i]) for i in range(dim)]
+    roi_size = [u - l for l, u in zip(lower, upper)]
+
+    cropped_masks = {name: sitk.RegionOfInterest(mask, roi_size, lower) for name, mask in masks.items()}
+    return sitk.RegionOfInterest(image, roi_size, lower), cropped_masks
+
+
+def crop_image_and_mask(image, mask, padding, label=1):
+    """
+    Görüntüyü ve maskeyi, maskedeki etiketin sınırlayıcı kutusu artı kenar payı kadar kırpar.
+
+    Args:
+        image (sitk.Image): Tarama görüntüsü.
+        mask (sitk.Image): Segmentasyon maskesi.
+        padding (list): Eksen başına (x, y, z) voksel cinsinden kenar payı.
+        label (int): Sınırlayıcı kutusu alınacak etiket değeri.
+
+    Returns:
+        tuple: Kırpılmış (image, mask) ikilisi.
+    """
+    cropped_image, cropped_masks = crop_image_and_masks(image, {'mask': mask}, padding, [label])
+    return cropped_image, cropped_masks['mask']
+
+
+def _split_extractor_for_crop(extractor):
+    """
+    Extractor'ı, kırpılmış görüntüde güvenle çalışan (uzamsal) ve tüm görüntü gerektiren
+    (global yoğunluklu) görüntü tipleri için iki ayrı extractor'a böler.
+    """
+    from radiomics import featureextractor
+
+    spatial_types = {k: v for k, v in extractor.enabledImagetypes.items()
+                     if k not in GLOBAL_INTENSITY_IMAGE_TYPES}
+    global_types = {k: v for k, v in extractor.enabledImagetypes.items()
+                    if k in GLOBAL_INTENSITY_IMAGE_TYPES}
+
+    spatial = featureextractor.RadiomicsFeatureExtractor(**extractor.settings)
+    spatial.disableAllImageTypes()
+    spatial.enableImageTypes(**spatial_types)
+    spatial.disableAllFeatures()
+    spatial.enableFeaturesByName(**extractor.enabledFeatures)
+
+    if not global_types:
+        return spatial, None
+
+    # Şekil (shape) özellikleri görüntü tipinden bağımsızdır; sadece bir kez hesaplanmalı.
+    global_ = featureextractor.RadiomicsFeatureExtractor(**extractor.settings)
+    global_.disableAllImageTypes()
+    global_.enableImageTypes(**global_types)
+    global_.disableAllFeatures()
+    global_.enableFeaturesByName(**{k: v for k, v in extractor.enabledFeatures.items()
+                                    if not k.startswith('shape')})
+    return spatial, global_
+
+
+def execute_with_roi_crop(extractor, image, mask):
+    """
+    extractor.execute ile aynı sonucu, uzamsal filtreleri kırpılmış ROI üzerinde hesaplayarak üretir.
+
+    Args:
+        extractor (featureextractor.RadiomicsFeatureExtractor): Kullanılacak extractor.
+        image (sitk.Image): Tek kanallı tarama görüntüsü.
+        mask (sitk.Image): Segmentasyon maskesi.
+
+    Returns:
+        dict: extractor.execute ile aynı sırada özellik sözlüğü.
+    """
+    padding = compute_crop_padding(extractor, image)
+    cropped_image, cropped_mask = crop_image_and_mask(image, mask, padding, extractor.settings.get('label', 1))
+
+    spatial, global_ = _split_extractor_for_crop(extractor)
+    result = spatial.execute(cropped_image, cropped_mask)
+    if global_ is not None:
+        result.update(global_.execute(image, mask))
+
+    return _order_like_execute(extractor, result)
+
+
+def _order_like_execute(extractor, result):
+    """
+    Sütun sırasının kırpmasız çalışmayla aynı olması için sonuçları görüntü tipi sırasına dizer:
+    önce diagnostik, sonra şekil, sonra extractor'daki görüntü tipi sırası.
+    """
+    type_order = {name: rank for rank, name in enumerate(extractor.enabledImagetypes)}
+
+    def _rank(key):
+        if key.startswith('diagnostics'):
+            return -2
+        if key.split('_')[1].startswith('shape'):
+            return -1
+        return type_order.get(image_type_of_feature(key), len(type_order))
+
+    return {key: result[key] for key in sorted(result, key=_rank)}
+
+
+# --- Çoklu Etiket / Çoklu Maske Çıkarımı ---
+# extractor.execute her çağrıda tüm filtre bankasını (wavelet, LoG, LBP...) baştan hesaplar.
+# Aynı taramada N etiket veya N maske için N kez execute çağırmak yerine, aşağıdaki fonksiyon
+# her türetilmiş görüntüyü bir kez üretir ve özellik sınıflarını tüm hedeflerde onun üzerinde
+# çalıştırır. Adımlar extractor.execute ile aynıdır (maske kontrolü, şekil, yeniden
+# segmentasyon, türetilmiş görüntü başına kırpma ve özellik hesabı).
+# Not: PyRadiomics'in yerleşik filtreleri sadece görüntüyü kullanır; maske parametresi olarak
+# ilk hedefin maskesi verilir.
+
+def _profiled_images(generator, profiler, image_type):
+    """Türetilmiş görüntü üretecini, her görüntünün hesaplanma süresini kaydederek dolaşır."""
+    while True:
+        with profile_stage(profiler, 'filter', image_type=image_type) as stage_labels:
+            item = next(generator, None)
+            stage_labels['image'] = item[1] if item is not None else None
+            stage_labels['discard'] = item is None
+        if item is None:
+            return
+        yield item
+
+
+def _compute_features_profiled(extractor, image, mask, image_type_name, image_type, target, profiler, **kwargs):
+    """
+    extractor.computeFeatures ile aynı sonucu, her özellik sınıfını ayrı ölçerek üretir.
+
+    computeFeatures etkin özellik sınıflarını sırayla hesapladığı için, sınıfları tek tek
+    etkinleştirip çağırmak aynı değerleri aynı sırada verir.
+    """
+    enabled_features = extractor.enabledFeatures
+    feature_vector = collections.OrderedDict()
+    try:
+        for feature_class, feature_names in enabled_features.items():
+            if feature_class.startswith('shape'):
+                continue
+            extractor.enabledFeatures = {feature_class: feature_names}
+            with profile_stage(profiler, 'features', image_type=image_type, image=image_type_name,
+                               feature_class=feature_class, target=target):
+                feature_vector.update(extractor.computeFeatures(image, mask, image_type_name, **kwargs))
+    finally:
+        extractor.enabledFeatures = enabled_features
+    return feature_vector
+
+
+def _execute_shared_filters(extractor, image, masks, labels, profiler=None, feature_plan=None):
+    """
+    Her türetilmiş görüntüyü bir kez hesaplayıp tüm (maske, etiket) hedeflerinin özelliklerini çıkarır.
+
+    profiler verilirse maske kontrolü, şekil, her türetilmiş görüntü ve her
+    (görüntü, özellik sınıfı) ikilisi ayrı ayrı ölçülür (bkz. profiling).
+
+    feature_plan verilirse her türetilmiş görüntüde sadece plandaki özellikler hesaplanır;
+    planda olmayan türetilmiş görüntüler (örn. istenmeyen wavelet bantları) atlanır.
+
+    Returns:
+        dict: (maske adı, etiket) -> özellik sözlüğü. Maske kontrolünden geçemeyen hedefler
+              hata mesajıyla atlanır.
+    """
+    from radiomics import imageoperations
+
+    settings = dict(extractor.settings)
+    resegment_range = settings.get('resegmentRange', None)
+    resegment_shape = settings.get('resegmentShape', False)
+
+    targets = []
+    base_image = None
+    for mask_name, mask in masks.items():
+        for label in labels:
+            target_settings = dict(settings)
+            target_settings['label'] = label
+            target = f'{mask_name}:{label}'
+            try:
+                with profile_stage(profiler, 'mask_check', target=target):
+                    loaded_image, loaded_mask = extractor.loadImage(image, mask, None, **target_settings)
+                    bounding_box, corrected_mask = imageoperations.checkMask(loaded_image, loaded_mask,
+                                                                             **target_settings)
+                    if corrected_mask is not None:
+                        loaded_mask = corrected_mask
+
+                    if resegment_range is not None and resegment_shape:
+                        loaded_mask = imageoperations.resegmentMask(loaded_image, loaded_mask, **target_settings)
+                        bounding_box, _ = imageoperations.checkMask(loaded_image, loaded_mask, **target_settings)
+
+                feature_vector = collections.OrderedDict()
+                if 'shape' in extractor.enabledFeatures or 'shape2D' in extractor.enabledFeatures:
+                    with profile_stage(profiler, 'features', image_type='Original', image='original',
+                                       feature_class='shape', target=target):
+                        feature_vector.update(extractor.computeShape(loaded_image, loaded_mask, bounding_box,
+                                                                     **target_settings))
+
+                if resegment_range is not None and not resegment_shape:
+                    with profile_stage(profiler, 'mask_check', target=target):
+                        loaded_mask = imageoperations.resegmentMask(loaded_image, loaded_mask, **target_settings)
+                        bounding_box, _ = imageoperations.checkMask(loaded_image, loaded_mask, **target_settings)
+            except Exception as e:
+                print(f"  HATA: Maske '{mask_name}', etiket {label} işlenemedi: {e}")
+                continue
+
+            if base_image is None:
+                base_image = loaded_image
+            targets.append((mask_name, label, loaded_mask, bounding_box, feature_vector))
+
+    if not targets:
+        return {}
+
+    # Her görüntü tipi için türetilmiş görüntüler bir kez üretilir; özellikler tüm hedeflerde hesaplanır.
+    # Planın ek çalıştırmaları (bkz. extraction_plan.image_type_passes) sadece yeni görüntüleri ekler.
+    extra_passes = feature_plan.get('extra_passes') if feature_plan is not None else None
+    computed = set()
+    for image_type, custom_args in image_type_passes(extractor.enabledImagetypes, extra_passes):
+        args = dict(settings)
+        args.update(custom_args)
+        generator = getattr(imageoperations, f'get{image_type}Image')(base_image, targets[0][2], **args)
+        for derived_image, image_type_name, derived_kwargs in _profiled_images(generator, profiler, image_type):
+            if image_type_name in computed:
+                continue
+            computed.add(image_type_name)
+            enabled_features = extractor.enabledFeatures
+            if feature_plan is not None:
+                if image_type_name not in feature_plan['images']:
+                    continue
+                extractor.enabledFeatures = feature_plan['images'][image_type_name]
+            try:
+                for mask_name, label, loaded_mask, bounding_box, feature_vector in targets:
+                    target_kwargs = dict(derived_kwargs)
+                    target_kwargs['label'] = label
+                    input_image, input_mask = imageoperations.cropToTumorMask(derived_image, loaded_mask,
+                                                                              bounding_box, **target_kwargs)
+                    if profiler is None:
+                        feature_vector.update(extractor.computeFeatures(input_image, input_mask, image_type_name,
+                                                                        **target_kwargs))
+                    else:
+                        feature_vector.update(_compute_features_profiled(
+                            extractor, input_image, input_mask, image_type_name, image_type,
+                            f'{mask_name}:{label}', profiler, **target_kwargs))
+            finally:
+                extractor.enabledFeatures = enabled_features
+
+    return {(mask_name, label): feature_vector for mask_name, label, _, _, feature_vector in targets}
+
+
+def execute_multi_target(extractor, image, masks, labels, crop_to_roi=False, profiler=None, feature_plan=None):
+    """
+    Bir taramada birden fazla maske ve/veya etiket için özellikleri, filtreleri bir kez hesaplayarak çıkarır.
+
+    Args:
+        extractor (featureextractor.RadiomicsFeatureExtractor): Kullanılacak extractor.
+        image (sitk.Image): Tek kanallı tarama görüntüsü.
+        masks (dict): Maske adı -> segmentasyon maskesi (sitk.Image).
+        labels (list): Her maskede özellik çıkarılacak etiket değerleri.
+        crop_to_roi (bool): True ise uzamsal filtreler tüm hedeflerin ortak kenar paylı
+                            sınırlayıcı kutusu üzerinde hesaplanır.
+        profiler (ExtractionProfiler): Verilirse adımların süre ve bellek kullanımı kaydedilir.
+        feature_plan (dict): Verilirse her türetilmiş görüntüde sadece plandaki özellikler hesaplanır.
+
+    Returns:
+        dict: (maske adı, etiket) -> extractor.execute ile aynı sırada özellik sözlüğü.
+    """
+    if not crop_to_roi:
+        return _execute_shared_filters(extractor, image, masks, labels, profiler, feature_plan)
+
+    with profile_stage(profiler, 'roi_crop'):
+        padding = compute_crop_padding(extractor, image)
+        cropped_image, cropped_masks = crop_image_and_masks(image, masks, padding, labels)
+
+    spatial, global_ = _split_extractor_for_crop(extractor)
+    results = _execute_shared_filters(spatial, cropped_image, cropped_masks, labels, profiler, feature_plan)
+    if global_ is not None:
+        global_results = _execute_shared_filters(global_, image, masks, labels, profiler, feature_plan)
+        for target, feature_vector in results.items():
+            feature_vector.update(global_results.get(target, {}))
+
+    return {target: _order_like_execute(extractor, fv) for target, fv in results.items()}
+
+
+def load_patient_scan(patient_folder_path, use_volume_cache=False, profiler=None, notices=None):
+    """
+    Hastanın 'scan.nrrd' dosyasını yükler ve gerekiyorsa tek kanala indirir.
+
+    Args:
+        patient_folder_path (str): 'scan.nrrd' dosyasını içeren klasör.
+        use_volume_cache (bool): True ise tarama hızlı yükleme önbelleğinden okunur
+                                 (bkz. volume_cache.read_image).
+        profiler (ExtractionProfiler): Verilirse okuma ve kanal dönüşümü ayrı ayrı ölçülür.
+        notices (list): Verilirse bilgi mesajları yazdırılmak yerine bu listeye eklenir
+                        (arka planda okunan hastaların mesajları, hasta işlenirken yazdırılır).
+
+    Returns:
+        sitk.Image: Tek kanallı tarama görüntüsü.
+    """
+    import SimpleITK as sitk
+    from volume_cache import read_image
+
+    image_path = os.path.join(patient_folder_path, 'scan.nrrd')
+
+    # --- 3. ÖN İŞLEME: Görüntü Formatı Kontrolü ve Düzeltmesi ---
+    # Bu bölüm, "Pixel type... not supported" hatasını çözmek için eklendi.
+    # Görüntüleri doğrudan dosya yolundan değil, SimpleITK nesnesi olarak yüklüyoruz.
+    with profile_stage(profiler, 'read_scan'):
+        image = read_image(image_path, use_cache=use_volume_cache)
+
+    # Görüntünün piksel başına bileşen sayısını kontrol ediyoruz.
+    # Eğer 1'den büyükse, bu bir vektör (çok kanallı, örn: RGB) görüntüdür.
+    if image.GetNumberOfComponentsPerPixel() > 1:
+        notice = "  BİLGİ: Scan çok kanallı. Radyomik analiz için tek kanala dönüştürülüyor..."
+        if notices is None:
+            print(notice)
+        else:
+            notices.append(notice)
+        # Görüntüyü tek kanala dönüştürüyoruz. Bunun için ilk kanalı (index 0) seçiyoruz.
+        # Bu, 3D Slicer gibi yazılımların arka planda yaptığı işlemin aynısıdır.
+        # sitk.sitkInt16, medikal görüntüler için yaygın ve güvenli bir piksel türü olduğu için onu seçiyoruz.
+        with profile_stage(profiler, 'vector_cast'):
+            image = sitk.VectorIndexSelectionCast(image, 0, sitk.sitkInt16)
+
+    return image
+
+
+def load_patient_images(patient_folder_path, use_volume_cache=False, profiler=None):
+    """
+    Hastanın 'scan.nrrd' ve 'segmentation.nrrd' dosyalarını yükler ve taramayı tek kanala indirir.
+
+    Args:
+        patient_folder_path (str): 'scan.nrrd' ve 'segmentation.nrrd' dosyalarını içeren klasör.
+        use_volume_cache (bool): True ise dosyalar hızlı yükleme önbelleğinden okunur.
+        profiler (ExtractionProfiler): Verilirse okuma adımları ölçülür.
+
+    Returns:
+        tuple: (image, mask) SimpleITK görüntüleri.
+    """
+    from volume_cache import read_image
+
+    image = load_patient_scan(patient_folder_path, use_volume_cache, profiler)
+    with profile_stage(profiler, 'read_mask'):
+        mask = read_image(os.path.join(patient_folder_path, 'segmentation.nrrd'), use_cache=use_volume_cache)
+    return image, mask
+
+
+# --- Önden Okuma (Prefetch) ---
+# Seri çalışmada bir hastanın taraması ve maskeleri okunurken (gzip çözme, ağ diski) işlemci,
+# özellikler hesaplanırken de disk boşta bekler. Önden okuyucu, sıradaki hastaların girdilerini
+# arka plan iş parçacıklarında okur, doğrular ve tek kanala indirir; böylece okuma, bir önceki
+# hastanın hesaplamasıyla örtüşür. SimpleITK okuma sırasında Python'un global kilidini (GIL)
+# bıraktığı için iş parçacıkları yeterlidir. Paralel ve dağıtık modda işçiler zaten birbirinin
+# okumasıyla örtüştüğü için önden okuma sadece seri çalışmada kullanılır.
+
+# Aynı anda önden okunacak en fazla hasta sayısı ve önden okunmuş girdilerin toplam bellek sınırı.
+DEFAULT_PREFETCH_DEPTH = 2
+DEFAULT_PREFETCH_MEMORY_MB = 2048
+
+
+def read_patient_inputs(patient_folder_path, mask_names=DEFAULT_MASK_NAMES, use_volume_cache=False):
+    """
+    Hastanın taramasını ve maskelerini okur; taramayı tek kanala indirir. Konsola yazdırmaz.
+
+    Returns:
+        dict veya None: 'image', 'masks' ({maske dosyası adı: görüntü}) ve 'notices' (hasta
+                        işlenirken yazdırılacak mesajlar). Girdi dosyaları eksikse None.
+    """
+    from volume_cache import read_image
+
+    input_paths = patient_input_paths(patient_folder_path, mask_names)
+    if not all(os.path.exists(path) for path in input_paths.values()):
+        return None
+    notices = []
+    image = load_patient_scan(patient_folder_path, use_volume_cache, notices=notices)
+    masks = {name: read_image(os.path.join(patient_folder_path, name), use_cache=use_volume_cache)
+             for name in mask_names}
+    return {'image': image, 'masks': masks, 'notices': notices}
+
+
+def _input_bytes(patient_folder_path, mask_names):
+    """
+    Hastanın girdilerinin bellekteki (sıkıştırılmamış) tahmini boyutu; başlıklardan okunur.
+
+    Returns:
+        int veya None: Bayt. Bir girdinin başlığı okunamıyorsa (eksik, bozuk dosya) None.
+    """
+    total = 0
+    for path in patient_input_paths(patient_folder_path, mask_names).values():
+        try:
+            total += nrrd_geometry(path)['bytes']
+        except (OSError, ValueError, KeyError, IndexError):
+            return None
+    return total
+
+
+class PatientPrefetcher:
+    """
+    Hastaları sırayla verir; sıradaki hastaların girdileri arka plan iş parçacıklarında önceden okunur.
 
-    print("Radyomik özellik çıkarıcı, tüm özellikler etkinleştirilmiş şekilde başlatıldı.")
-    
-    # Tüm hastaların sonuçlarını döngü bittikten sonra birleştirmek için boş bir liste oluşturuyoruz.
-    all_patients_features_list = []
+    Bir hasta işlenirken sonraki en fazla 'depth' hastanın girdileri okunur. 'max_bytes' sınırı,
+    işlenmekte olan hastanın girdilerini ve önden okunan hastalarınkini birlikte kapsar (tahmini
+    sıkıştırılmamış boyut); PyRadiomics'in hesaplama sırasındaki çalışma kopyaları (türetilmiş
+    görüntüler vb.) bu sınıra dahil değildir. Sınırı aşacak veya başlığı okunamayan (boyutu
+    bilinmeyen) bir hasta önden okunmaz, sırası geldiğinde okunur.
+
+    Kullanım:
+        for item, inputs in PatientPrefetcher(pending, mask_names, use_volume_cache, 2, 2 * 1024 ** 3):
+            ...  # inputs.result(): read_patient_inputs çıktısı (okuma hatası burada yükselir)
+    """
+
+    def __init__(self, items, mask_names, use_volume_cache, depth=DEFAULT_PREFETCH_DEPTH,
+                 max_bytes=DEFAULT_PREFETCH_MEMORY_MB * 1024 * 1024):
+        """
+        Args:
+            items (list): İlk iki elemanı (patient_id, patient_folder_path) olan demetler, işlenme sırasıyla.
+            mask_names (tuple): Okunacak segmentasyon dosyalarının adları.
+            use_volume_cache (bool): True ise dosyalar hızlı yükleme önbelleğinden okunur.
+            depth (int): Aynı anda önden okunacak en fazla hasta sayısı.
+            max_bytes (float): İşlenen ve önden okunan hastaların girdileri için toplam bellek sınırı (bayt).
+        """
+        self.items = list(items)
+        self.mask_names = mask_names
+        self.use_volume_cache = use_volume_cache
+        self.depth = max(1, depth)
+        self.max_bytes = max_bytes
+        self._sizes = {}
+
+    def input_bytes(self, index):
+        """items[index] hastasının girdilerinin tahmini boyutu (başlıklar hasta başına bir kez okunur)."""
+        if index not in self._sizes:
+            self._sizes[index] = _input_bytes(self.items[index][1], self.mask_names)
+        return self._sizes[index]
+
+    def __iter__(self):
+        ahead = collections.deque()  # (sıra, future)
+        next_index = 0
+        with ThreadPoolExecutor(max_workers=self.depth, thread_name_prefix='patient-prefetch') as executor:
+
+            def _submit(index):
+                future = executor.submit(read_patient_inputs, self.items[index][1], self.mask_names,
+                                         self.use_volume_cache)
+                ahead.append((index, future))
+
+            try:
+                for index, item in enumerate(self.items):
+                    if not ahead:
+                        # Sınır nedeniyle önden okunmamış hasta: şimdi okunur.
+                        _submit(index)
+                        next_index = index + 1
+                    _, future = ahead.popleft()
+
+                    # Bu hasta işlenirken okunacak sonraki hastaları kuyruğa ekliyoruz. Bellekteki
+                    # girdiler: işlenen hasta ve önden okunmakta/okunmuş olanlar.
+                    in_memory = (self.input_bytes(index) or 0) + sum(self.input_bytes(i) for i, _ in ahead)
+                    while next_index < len(self.items) and len(ahead) < self.depth:
+                        n_bytes = self.input_bytes(next_index)
+                        if n_bytes is None or in_memory + n_bytes > self.max_bytes:
+                            break
+                        _submit(next_index)
+                        in_memory += n_bytes
+                        next_index += 1
+
+                    yield item, future
+            finally:
+                # Döngü yarıda kesilirse başlamamış okumalar iptal edilir.
+                for _, future in ahead:
+                    future.cancel()
+
+
+def mask_display_name(mask_name):
+    """'segmentation_raterB.nrrd' gibi bir dosya adından çıktıdaki 'Mask' değerini üretir."""
+    return mask_name[:-len('.nrrd')] if mask_name.lower().endswith('.nrrd') else mask_name
+
+
+def select_feature_columns(result, feature_plan=None):
+    """
+    Extractor sonucundan çıktıya yazılacak özellik sütunlarını seçer.
+
+    Args:
+        result (dict): Extractor'ın döndürdüğü özellik sözlüğü.
+        feature_plan (dict): Verilirse sütunlar tam olarak planın 'required' listesi olur (aynı
+                             sırayla); üretilemeyen özellikler uyarıyla boş (NaN) bırakılır.
+
+    Returns:
+        dict: Diagnostik değerler hariç özellik sözlüğü.
+    """
+    if feature_plan is None:
+        return {key: val for key, val in result.items() if not key.startswith('diagnostics')}
+
+    missing = [name for name in feature_plan['required'] if name not in result]
+    if missing:
+        print(f"  UYARI: {len(missing)} istenen özellik üretilemedi, boş bırakılıyor: {', '.join(missing[:5])}"
+              f"{' ...' if len(missing) > 5 else ''}")
+    return {name: result.get(name, float('nan')) for name in feature_plan['required']}
+
+
+def is_multi_target(mask_names=DEFAULT_MASK_NAMES, labels=None):
+    """Çıkarımın hasta başına birden fazla satır (maske x etiket) üretip üretmeyeceğini döndürür."""
+    return labels is not None or tuple(mask_names) != DEFAULT_MASK_NAMES
+
+
+def verify_roi_crop(patient_folder_path, settings=RADIOMICS_SETTINGS, rtol=1e-3, atol=1e-6):
+    """
+    Bir hasta için ROI kırpmalı ve kırpmasız çıkarımı karşılaştırır.
+
+    Kırpmayı bir kohortta açmadan önce birkaç temsili hastada çalıştırılması önerilir.
+    Özellikler |kırpılmış - tam| <= atol + rtol * |tam| koşulunu sağlıyorsa eşleşmiş sayılır.
+
+    Args:
+        patient_folder_path (str): 'scan.nrrd' ve 'segmentation.nrrd' dosyalarını içeren klasör.
+        settings (dict): PyRadiomics parametre sözlüğü.
+        rtol (float): Göreli tolerans.
+        atol (float): Mutlak tolerans.
+
+    Returns:
+        list: Toleransı aşan (özellik adı, tam değer, kırpılmış değer) üçlüleri. Boşsa kırpma güvenlidir.
+    """
+    extractor = build_extractor(settings)
+    image, mask = load_patient_images(patient_folder_path)
+
+    full = extractor.execute(image, mask)
+    cropped = execute_with_roi_crop(extractor, image, mask)
+
+    mismatches = []
+    for key, full_val in full.items():
+        if key.startswith('diagnostics'):
+            continue
+        if key not in cropped:
+            mismatches.append((key, float(full_val), None))
+            continue
+        full_val, cropped_val = float(full_val), float(cropped[key])
+        if math.isnan(full_val) and math.isnan(cropped_val):
+            continue
+        if not abs(cropped_val - full_val) <= atol + rtol * abs(full_val):
+            mismatches.append((key, full_val, cropped_val))
+
+    n_features = sum(1 for key in full if not key.startswith('diagnostics'))
+    print(f"ROI kırpma doğrulaması ({patient_folder_path}): "
+          f"{n_features - len(mismatches)}/{n_features} özellik tolerans içinde.")
+    for key, full_val, cropped_val in mismatches:
+        print(f"  FARK: {key}: tam={full_val} kırpılmış={cropped_val}")
+    return mismatches
+
+
+def write_patient_csv(rows, patient_id, patient_folder_path):
+    """
+    Hastanın özellik satırlarını kendi klasörüne bir CSV olarak yazar.
+
+    Args:
+        rows (list): 'PatientID' (çoklu modda 'Mask' ve 'Label') dahil özellik sözlükleri.
+        patient_id (str): Hasta kimliği (klasör adı).
+        patient_folder_path (str): CSV'nin yazılacağı hasta klasörü.
+
+    Returns:
+        str: Yazılan CSV dosyasının yolu.
+    """
+    import pandas as pd
+
+    # Her hasta için bireysel CSV dosyası oluşturuyoruz.
+    # Tek satırlık bir veri için en kolay yol, tek elemanlı bir listeyi DataFrame'e çevirmektir.
+    df_patient = pd.DataFrame(rows)
+
+    # Daha okunaklı olması için 'PatientID' (ve varsa 'Mask', 'Label') sütunlarını en başa taşıyoruz.
+    id_columns = [col for col in ('PatientID', 'Mask', 'Label') if col in df_patient.columns]
+    for position, col in enumerate(id_columns):
+        id_col = df_patient.pop(col)
+        df_patient.insert(position, col, id_col)
+
+    # Bireysel CSV dosyasını, ilgili hastanın kendi klasörünün içine kaydediyoruz.
+    individual_csv_path = os.path.join(patient_folder_path, f'{patient_id}_radiomics_features.csv')
+    df_patient.to_csv(individual_csv_path, index=False)
+    return individual_csv_path
+
+
+def process_patient(extractor, patient_id, patient_folder_path, crop_to_roi=False,
+                    cache=None, cache_entry=None, mask_names=DEFAULT_MASK_NAMES, labels=None,
+                    use_volume_cache=False, profile=False, feature_plan=None, prefetched=None):
+    """
+    Tek bir hastanın taramasından radyomik özellikleri çıkarır ve bireysel CSV'sini yazar.
+
+    Args:
+        extractor (featureextractor.RadiomicsFeatureExtractor): Kullanılacak extractor.
+        patient_id (str): Hasta kimliği (klasör adı).
+        patient_folder_path (str): 'scan.nrrd' ve segmentasyon dosyalarını içeren klasör.
+        crop_to_roi (bool): True ise türetilmiş görüntüler maskenin kenar paylı sınırlayıcı
+                            kutusu üzerinde hesaplanır (bkz. execute_with_roi_crop).
+        cache (ExtractionCache): Verilirse başarılı sonuç hemen önbelleğe yazılır.
+        cache_entry (dict): cache.lookup() ile bu hasta için hesaplanan anahtar bilgisi.
+        mask_names (tuple): Hasta klasöründe okunacak segmentasyon dosyalarının adları.
+        labels (list): Her maskede özellik çıkarılacak etiketler. None ise ayarlardaki 'label'.
+        use_volume_cache (bool): True ise tarama ve maskeler hızlı yükleme önbelleğinden okunur.
+        profile (bool): True ise her adımın süresi ve bellek kullanımı ölçülür ve
+                        '<hasta>_profile.json' dosyasına yazılır (bkz. profiling).
+        feature_plan (dict): Verilirse sadece plandaki özellikler hesaplanır ve satırların özellik
+                             sütunları planın 'required' listesiyle birebir aynı olur.
+        prefetched (Future): Verilirse girdiler dosyalardan okunmak yerine bu önden okumanın
+                             sonucundan alınır (bkz. PatientPrefetcher). Profil modunda kullanılmaz.
+
+    Returns:
+        list veya None: Başarılı olursa özellik satırları, aksi halde None. Tek maske ve
+                        tek etiketle bir satır ('PatientID' dahil); çoklu modda her
+                        (maske, etiket) için 'Mask' ve 'Label' sütunlu birer satır.
+    """
+    if not profile:
+        return _process_patient(extractor, patient_id, patient_folder_path, crop_to_roi, cache, cache_entry,
+                                mask_names, labels, use_volume_cache, None, feature_plan, prefetched)
+
+    profiler = ExtractionProfiler(patient_id)
+    try:
+        with profiler.stage('patient'):
+            rows = _process_patient(extractor, patient_id, patient_folder_path, crop_to_roi, cache, cache_entry,
+                                    mask_names, labels, use_volume_cache, profiler, feature_plan)
+    finally:
+        profiler.close()
+    # Başarısız hastaların profili de yazılır; hatanın hangi adımda oluştuğu görülebilir.
+    write_patient_profile(profiler.records, patient_id, patient_folder_path)
+    return rows
+
+
+def _process_patient(extractor, patient_id, patient_folder_path, crop_to_roi, cache, cache_entry,
+                     mask_names, labels, use_volume_cache, profiler, feature_plan=None, prefetched=None):
+    """process_patient'in asıl işi; profiler verilirse adımlar ölçülür."""
+    from volume_cache import read_image
+
+    print(f"\nİşleniyor: Hasta ID -> {patient_id}")
+
+    image_path = os.path.join(patient_folder_path, 'scan.nrrd')
+    mask_paths = [os.path.join(patient_folder_path, name) for name in mask_names]
+
+    # Gerekli 'scan.nrrd' ve segmentasyon dosyaları hasta klasöründe var mı diye kontrol et.
+    if not os.path.exists(image_path) or not all(os.path.exists(path) for path in mask_paths):
+        print(f"  UYARI: '{patient_id}' klasöründe gerekli NRRD dosyaları bulunamadı. Bu hasta atlanıyor.")
+        return None
+
+    # Hata yönetimi: Bir hastanın verisi bozuksa bile programın çökmesini engeller.
+    try:
+        # Girdiler arka planda okunduysa okuma hatası burada yükselir ve aynı şekilde raporlanır.
+        # Dosyalar önden okuma sırasında eksikse (sonuç None) burada yeniden okunur.
+        inputs = prefetched.result() if prefetched is not None else None
+        if inputs is not None:
+            for notice in inputs['notices']:
+                print(notice)
+
+        if is_multi_target(mask_names, labels):
+            # --- 4. Çoklu Maske / Etiket: Tarama ve filtreler bir kez, özellikler her hedef için ---
+            if inputs is not None:
+                image = inputs['image']
+                masks = {mask_display_name(name): inputs['masks'][name] for name in mask_names}
+            else:
+                image = load_patient_scan(patient_folder_path, use_volume_cache, profiler)
+                masks = {}
+                for name, path in zip(mask_names, mask_paths):
+                    with profile_stage(profiler, 'read_mask', target=mask_display_name(name)):
+                        masks[mask_display_name(name)] = read_image(path, use_cache=use_volume_cache)
+            target_labels = labels if labels is not None else [extractor.settings.get('label', 1)]
+
+            rows = []
+            for (mask_name, label), result in execute_multi_target(extractor, image, masks, target_labels,
+                                                                   crop_to_roi, profiler, feature_plan).items():
+                row = {'PatientID': patient_id, 'Mask': mask_name, 'Label': label}
+                row.update(select_feature_columns(result, feature_plan))
+                rows.append(row)
+
+            if not rows:
+                print(f"  HATA: '{patient_id}' için hiçbir maske/etiket işlenemedi.")
+                return None
+            print(f"  -> Başarılı: {len(rows)} maske/etiket için {len(rows[0]) - 3} adet radyomik özellik çıkarıldı.")
+        else:
+            if inputs is not None:
+                image, mask = inputs['image'], inputs['masks'][mask_names[0]]
+            else:
+                image, mask = load_patient_images(patient_folder_path, use_volume_cache, profiler)
+
+            # --- 4. Radyomik Özelliklerin Çıkarılması ---
+            # Artık extractor'a dosya yolları yerine, kontrol edip düzelttiğimiz
+            # SimpleITK görüntü nesnelerini veriyoruz.
+            if profiler is not None or feature_plan is not None:
+                # Profil modunda ve en küçük planla, extractor.execute ile aynı adımları izleyen ama
+                # her filtreyi ve özellik sınıfını ayrı ölçebilen, türetilmiş görüntü başına sadece
+                # gereken özellikleri hesaplayan yol kullanılır (diagnostik değerler zaten atılıyor).
+                label = extractor.settings.get('label', 1)
+                result = execute_multi_target(extractor, image, {'mask': mask}, [label], crop_to_roi,
+                                              profiler, feature_plan).get(('mask', label))
+                if result is None:
+                    raise ValueError(f"Maske kontrolü başarısız (etiket {label}).")
+            elif crop_to_roi:
+                result = execute_with_roi_crop(extractor, image, mask)
+            else:
+                result = extractor.execute(image, mask)
+
+            # --- 5. Sonuçların İşlenmesi ve Kaydedilmesi ---
+            # extractor.execute'dan dönen sonuçlar, özellikler dışında diagnostik bilgiler de içerir.
+            # Sadece özellik olanları (başında 'diagnostics' olmayanları) seçiyoruz.
+            # Plan verilmişse sütunlar, istenen liste ile aynı sırada ve birebir aynıdır.
+            feature_values = select_feature_columns(result, feature_plan)
+
+            # Hangi hastaya ait olduğunu bilmek için, sözlüğe 'PatientID' anahtarını ekliyoruz.
+            feature_values['PatientID'] = patient_id
+
+            print(f"  -> Başarılı: {len(feature_values) - 1} adet radyomik özellik çıkarıldı.")
+            rows = [feature_values]
+
+        with profile_stage(profiler, 'write_csv'):
+            individual_csv_path = write_patient_csv(rows, patient_id, patient_folder_path)
+        print(f"  -> Bireysel CSV kaydedildi: {individual_csv_path}")
+
+        # Sonucu hemen önbelleğe yazıyoruz; çalışma yarıda kesilirse bu hasta kaybolmaz.
+        if cache is not None and cache_entry is not None:
+            cache.store(patient_id, cache_entry, rows)
+
+        return rows
+
+    except Exception as e:
+        # Herhangi bir hastada beklenmedik bir hata olursa,
+        # programın çökmesini engeller, hatayı basar ve bir sonraki hastaya geçer.
+        print(f"  HATA: '{patient_id}' işlenirken bir sorun oluştu: {e}")
+        return None
+
+
+def _process_patient_in_worker(patient_id, patient_folder_path, settings, sitk_threads, crop_to_roi,
+                               cache, cache_entry, mask_names, labels, use_volume_cache, profile,
+                               feature_plan=None):
+    """İşçi süreçte çalışır: SimpleITK iş parçacıklarını sınırlar ve hastayı işler."""
+    global _WORKER_EXTRACTOR, _WORKER_PLAN
+    import SimpleITK as sitk
+
+    # Her işçi, SimpleITK filtrelerini (ReadImage, wavelet, LoG...) en fazla 'sitk_threads'
+    # iş parçacığıyla çalıştırır. Böylece n_jobs x sitk_threads çekirdek sayısını aşmaz.
+    sitk.ProcessObject.SetGlobalDefaultNumberOfThreads(sitk_threads)
+
+    # İşçiler sonraki çalışmalarda da tekrar kullanılabildiği için plan değiştiyse extractor yeniden kurulur.
+    if _WORKER_EXTRACTOR is None or _WORKER_PLAN != feature_plan:
+        _WORKER_EXTRACTOR = build_extractor(settings, feature_plan)
+        _WORKER_PLAN = feature_plan
+    return process_patient(_WORKER_EXTRACTOR, patient_id, patient_folder_path, crop_to_roi,
+                           cache, cache_entry, mask_names, labels, use_volume_cache, profile, feature_plan)
+
+
+def _scan_size(patient_folder_path):
+    """
+    Zamanlama için hastanın tarama hacmini döndürür (yoksa 0).
+
+    Sıkıştırılmış dosya boyutu iş yükünü iyi yansıtmadığı için voksel sayısı NRRD başlığından
+    okunur; başlık okunamazsa dosya boyutu kullanılır.
+    """
+    image_path = os.path.join(patient_folder_path, 'scan.nrrd')
+    if not os.path.exists(image_path):
+        return 0
+    try:
+        geometry = nrrd_geometry(image_path)
+        return geometry['voxels'] * geometry['components']
+    except (OSError, ValueError, KeyError, IndexError):
+        return os.path.getsize(image_path)
+
+
+def report_plan_saving(extractor, feature_plan, settings=RADIOMICS_SETTINGS, profile_summary_path=None):
+    """
+    En küçük planın, tüm özellikleri çıkaran tam çalışmaya göre tahmini kazancını yazdırır.
+
+    Args:
+        extractor (featureextractor.RadiomicsFeatureExtractor): Plana göre kurulmuş extractor.
+        feature_plan (dict): extraction_plan.build_extraction_plan çıktısı.
+        settings (dict): Tam çalışmanın PyRadiomics ayarları.
+        profile_summary_path (str): Varsa 'radiomics_profile_summary.csv'; maliyetler ölçülmüş
+                                    sürelerden hesaplanır, yoksa kaba göreli ağırlıklar kullanılır.
+    """
+    import radiomics
+
+    full = build_extractor(settings)
+    full_estimate = estimate_plan_cost(full.enabledImagetypes, full.enabledFeatures, None,
+                                       full.settings, profile_summary_path)
+    plan_estimate = estimate_plan_cost(extractor.enabledImagetypes, extractor.enabledFeatures,
+                                       feature_plan['images'], extractor.settings, profile_summary_path,
+                                       feature_plan.get('extra_passes'))
+
+    # Tam çalışmanın sütun sayısı: şekil sınıfları bir kez, diğer sınıflar her türetilmiş görüntüde.
+    available = radiomics.getFeatureClasses()
+    class_sizes = {feature_class: sum(1 for deprecated in available[feature_class].getFeatureNames().values()
+                                      if not deprecated)
+                   for feature_class in full.enabledFeatures}
+    n_full_features = sum(size if feature_class.startswith('shape') else size * full_estimate['derived_images']
+                          for feature_class, size in class_sizes.items()
+                          if feature_class != 'shape2D' or full.settings.get('force2D', False))
+    print_plan_summary(feature_plan, full_estimate, plan_estimate, n_full_features)
+
+
+# --- Dağıtık Çalışma (Birden Fazla Makine) ---
+# Dağıtık modda her çağrı bir işçidir; işçiler hastaları paylaşılan veri klasöründeki kiralama
+# tabanlı kuyruktan alır (bkz. work_queue). Her işçi hastanın bireysel CSV'sini kendisi yazar;
+# tüm hastalar bittiğinde işçilerden sadece biri ana depoyu ve ana CSV'yi bu CSV'lerden kurar.
+
+# Kuyruk dosyalarının tutulduğu klasör (veri klasörünün içinde).
+WORK_QUEUE_DIR = '.work_queue'
+
+# Birleştirme adımının kuyruktaki iş kimliği ('.' ile başladığı için bir hasta adıyla çakışmaz).
+MERGE_TASK_ID = '.merge'
+
+# Kiralanabilecek hasta kalmadığında, diğer işçilerin bitmesini beklerken kuyruğa bakma aralığı (sn).
+QUEUE_POLL_SECONDS = 15
+
+
+def _lookup_cached_patient(cache, patient_id, patient_folder_path, mask_names):
+    """
+    Hastanın önbellek anahtarını hesaplar; geçerli sonucu varsa satırları döndürür ve bireysel
+    CSV silinmişse önbellekten yeniden yazar.
+
+    Returns:
+        tuple: (cache_entry, rows). Önbellek kapalıysa veya girdi dosyaları eksikse (None, None).
+    """
+    input_paths = patient_input_paths(patient_folder_path, mask_names)
+    if cache is None or not all(os.path.exists(path) for path in input_paths.values()):
+        return None, None
+    cache_entry, cached_rows = cache.lookup(patient_id, input_paths)
+    if cached_rows is not None:
+        individual_csv_path = os.path.join(patient_folder_path, f'{patient_id}_radiomics_features.csv')
+        if not os.path.exists(individual_csv_path):
+            write_patient_csv(cached_rows, patient_id, patient_folder_path)
+    return cache_entry, cached_rows
+
+
+def _task_token(config_digest, input_paths):
+    """Kuyruktaki bir hasta işini tanımlayan değer: ayarlar ve girdi dosyalarının boyut/mtime bilgisi."""
+    files = {}
+    for name, path in sorted(input_paths.items()):
+        try:
+            stat = os.stat(path)
+            files[name] = [stat.st_size, stat.st_mtime_ns]
+        except OSError:
+            files[name] = None
+    return hashlib.sha256(json.dumps({'config': config_digest, 'files': files},
+                                     sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def merge_patient_csvs(data_folder_path, patient_ids, index_names=('PatientID',), store_dtype='float64',
+                       export_csv=True):
+    """
+    Hastaların bireysel CSV'lerinden ana depoyu ('ALL_PATIENTS_radiomics_features.rfs') ve
+    istenirse ana CSV'yi kurar.
+
+    Args:
+        data_folder_path (str): İçinde hasta klasörlerinin bulunduğu ana veri klasörü.
+        patient_ids (list): Birleştirilecek hastalar.
+        index_names (tuple): Satırları tanımlayan indeks sütunları.
+        store_dtype (str): Ana depodaki özellik sütunlarının tipi.
+        export_csv (bool): True ise depodan ana CSV de üretilir.
+
+    Returns:
+        int: Depoya eklenen hasta sayısı.
+    """
+    from feature_store import FeatureStoreWriter, FeatureStoreReader
+
+    master_store_path = os.path.join(data_folder_path, 'ALL_PATIENTS_radiomics_features.rfs')
+    n_merged = 0
+    with FeatureStoreWriter(master_store_path, index_names=index_names, dtype=store_dtype) as store:
+        for patient_id in patient_ids:
+            csv_path = os.path.join(data_folder_path, patient_id, f'{patient_id}_radiomics_features.csv')
+            if not os.path.exists(csv_path):
+                print(f"  UYARI: '{patient_id}' için bireysel CSV bulunamadı; birleştirmeye alınmadı.")
+                continue
+            csv_index_names, rows = read_patient_csv(csv_path)
+            if csv_index_names != list(index_names):
+                print(f"  UYARI: '{csv_path}' farklı indeks sütunlarına sahip; birleştirmeye alınmadı.")
+                continue
+            store.append_rows(rows)
+            n_merged += 1
+
+    print(f"\n{n_merged} hasta birleştirildi. Birleşik sonuçlar depoya kaydedildi: {master_store_path}")
+    if export_csv and n_merged:
+        master_csv_path = os.path.join(data_folder_path, 'ALL_PATIENTS_radiomics_features.csv')
+        FeatureStoreReader(master_store_path).export_csv(master_csv_path)
+        print(f"Tüm hastaların birleşik sonuçları şu dosyaya kaydedildi: {master_csv_path}")
+    return n_merged
+
+
+def _extract_distributed(extractor, data_folder_path, patients, cache, config_digest, crop_to_roi,
+                         mask_names, labels, use_volume_cache, profile, feature_plan, store_dtype,
+                         export_csv, lease_seconds, wait_for_workers):
+    """extract_radiomics_features'ın dağıtık modu: kuyruktan hasta alıp işler, en sonda birleştirir."""
+    queue = WorkQueue(os.path.join(data_folder_path, WORK_QUEUE_DIR), lease_seconds)
+    print(f"Dağıtık mod: işçi '{queue.worker_id}', kiralama süresi {lease_seconds} sn.")
+
+    folders = dict(patients)
+    tokens = {patient_id: _task_token(config_digest, patient_input_paths(folder, mask_names))
+              for patient_id, folder in patients}
+    # Tüm işçiler aynı sırayı izler: en büyük taramalar önce dağıtılır.
+    order = sorted(folders, key=lambda patient_id: _scan_size(folders[patient_id]), reverse=True)
+
+    n_processed = 0
+    waiting = False
+    while True:
+        lease = queue.claim((patient_id, tokens[patient_id]) for patient_id in order)
+        if lease is None:
+            remaining = [patient_id for patient_id in order if not queue.is_done(patient_id, tokens[patient_id])]
+            if not remaining:
+                break
+            if not wait_for_workers:
+                print(f"\nBu işçi {n_processed} hasta işledi. {len(remaining)} hasta başka işçilerde; "
+                      f"ana CSV son biten işçi tarafından oluşturulacak.")
+                return
+            if not waiting:
+                print(f"\n{len(remaining)} hasta başka işçilerde işleniyor; bitmeleri "
+                      f"(veya kiralamalarının dolması) bekleniyor...")
+                waiting = True
+            time.sleep(QUEUE_POLL_SECONDS)
+            continue
+
+        waiting = False
+        patient_id = lease.task_id
+        patient_folder_path = folders[patient_id]
+        try:
+            with lease:
+                cache_entry, rows = _lookup_cached_patient(cache, patient_id, patient_folder_path, mask_names)
+                if rows is not None:
+                    print(f"\n'{patient_id}' önbellekten yüklendi.")
+                else:
+                    if profile:
+                        stale_profile = os.path.join(patient_folder_path, f'{patient_id}_profile.json')
+                        if os.path.exists(stale_profile):
+                            os.remove(stale_profile)
+                    rows = process_patient(extractor, patient_id, patient_folder_path, crop_to_roi, cache,
+                                           cache_entry, mask_names, labels, use_volume_cache, profile, feature_plan)
+                lease.complete('ok' if rows is not None else 'failed', tokens[patient_id])
+        except Exception:
+            # Hata kiralamaya deneme olarak yazıldı (bkz. Lease.__exit__); hasta deneme sınırına kadar
+            # tekrar kuyruğa girer, bu işçi sıradaki hastayla devam eder.
+            continue
+        n_processed += 1
+
+    # --- Birleştirme: Tüm hastalar bittiğinde sadece bir işçi ana depoyu kurar ---
+    statuses = {patient_id: (queue.read_done(patient_id) or {}).get('status') for patient_id in order}
+    fingerprint = hashlib.sha256(json.dumps(
+        sorted([patient_id, tokens[patient_id], statuses[patient_id]] for patient_id in order)
+    ).encode('utf-8')).hexdigest()
+    if queue.is_done(MERGE_TASK_ID, fingerprint):
+        print("\nAna depo bu sonuçlarla zaten oluşturulmuş.")
+        return
+    merge_lease = queue.try_claim(MERGE_TASK_ID)
+    if merge_lease is None:
+        print("\nBirleştirme başka bir işçi tarafından yapılıyor.")
+        return
+
+    with merge_lease:
+        succeeded = sorted(patient_id for patient_id in order if statuses[patient_id] == 'ok')
+        failed = sorted(patient_id for patient_id in order if statuses[patient_id] != 'ok')
+        print(f"\nTüm hastalar bitti ({len(succeeded)} başarılı, {len(failed)} başarısız). Birleştiriliyor...")
+        for patient_id in failed:
+            print(f"  BAŞARISIZ: {patient_id}")
+
+        index_names = ('PatientID', 'Mask', 'Label') if is_multi_target(mask_names, labels) else ('PatientID',)
+        merge_patient_csvs(data_folder_path, succeeded, index_names, store_dtype, export_csv)
+
+        if profile:
+            profile_paths = [os.path.join(folders[patient_id], f'{patient_id}_profile.json') for patient_id in order]
+            profile_paths = [path for path in profile_paths if os.path.exists(path)]
+            if profile_paths:
+                write_cohort_profile(profile_paths, data_folder_path)
+
+        merge_lease.complete('ok', fingerprint)
+
+    print(f"\nİŞLEM TAMAMLANDI!")
+
+
+# --- Ana Fonksiyon ---
+def extract_radiomics_features(data_folder_path, n_jobs=1, sitk_threads=None, crop_to_roi=False,
+                               use_cache=True, cache_dir=None, store_dtype='float64', export_csv=True,
+                               mask_names=DEFAULT_MASK_NAMES, labels=None, use_volume_cache=False,
+                               profile=False, required_features=None, distributed=False,
+                               lease_seconds=DEFAULT_LEASE_SECONDS, wait_for_workers=True,
+                               prefetch_depth=DEFAULT_PREFETCH_DEPTH, prefetch_memory_mb=DEFAULT_PREFETCH_MEMORY_MB):
+    """
+    Belirtilen klasör yapısından radyomik özellikleri çıkarır.
+
+    Bu fonksiyon, dağınık bir veri setini alır, olası veri formatı hatalarını
+    (örn: çok kanallı görüntüler) otomatik olarak düzeltir ve hem her hasta için
+    ayrı ayrı hem de tüm hastalar için birleşik bir CSV sonuç dosyası üretir.
+
+    n_jobs 1'den farklı olduğunda hastalar bir süreç havuzuna (joblib) dağıtılır.
+    En büyük taramalar önce başlatılır ki çalışma tek bir yavaş işçide bitmesin.
+    Üretilen bireysel ve ana CSV'ler seri çalışmayla aynıdır.
+
+    use_cache açıkken her hastanın sonucu, girdi dosyalarının içerik özetleri, extractor
+    ayarları ve PyRadiomics sürümüyle anahtarlanarak önbelleğe yazılır. Anahtarı değişmeyen
+    hastalar tekrar hesaplanmaz; sadece yeni veya değişmiş hastalar işlenir.
+
+    Ana tablo bellekte biriktirilmez: biten her hasta, 'ALL_PATIENTS_radiomics_features.rfs'
+    deposuna tipli bir satır grubu olarak hemen eklenir (bkz. feature_store). Bellek kullanımı
+    kohort büyüklüğünden bağımsızdır ve yarıda kesilen bir iş, o ana kadar biten tüm hastaları
+    içeren geçerli bir depo bırakır. Ana CSV en sonda bu depodan satır satır üretilir.
+
+    Birden fazla maske (mask_names) veya etiket (labels) verildiğinde tarama bir kez okunur,
+    her türetilmiş görüntü bir kez hesaplanır ve her (hasta, maske, etiket) için bir satır
+    üretilir. Bu modda çıktılarda 'PatientID' sütununu 'Mask' ve 'Label' sütunları izler.
+
+    Args:
+        data_folder_path (str): İçinde hasta klasörlerinin bulunduğu ana veri klasörünün yolu.
+        n_jobs (int): Paralel işçi süreç sayısı. 1 seri çalışır, -1 tüm çekirdekleri kullanır.
+        sitk_threads (int): İşçi başına SimpleITK iş parçacığı sayısı. None ise
+                            çekirdek sayısı işçilere bölünerek hesaplanır.
+        crop_to_roi (bool): True ise türetilmiş görüntüler tüm tarama yerine maskenin kenar
+                            paylı sınırlayıcı kutusu üzerinde hesaplanır. Açmadan önce
+                            verify_roi_crop ile birkaç hastada doğrulanması önerilir.
+        use_cache (bool): True ise hasta sonuçları önbellekten okunur ve önbelleğe yazılır.
+        cache_dir (str): Önbellek klasörü. None ise '<data_folder_path>/.radiomics_cache'.
+        store_dtype (str): Ana depodaki özellik sütunlarının tipi ('float64' veya 'float32').
+        export_csv (bool): True ise iş bitince depodan ana CSV dosyası da üretilir.
+        mask_names (tuple): Her hasta klasöründe okunacak segmentasyon dosyalarının adları.
+        labels (list): Her maskede özellik çıkarılacak etiketler. None ise ayarlardaki 'label'.
+        use_volume_cache (bool): True ise NRRD dosyaları ilk okumada sıkıştırılmamış, bellek
+                                 eşlemeli bir önbelleğe ('<hasta>/.volume_cache') dönüştürülür ve
+                                 sonraki çalışmalarda oradan okunur. Eskimiş kayıtlarda NRRD'ye
+                                 geri dönülür; sonuçlar değişmez.
+        profile (bool): True ise her hesaplanan hasta için okuma, kanal dönüşümü, her türetilmiş
+                        görüntü ve her (görüntü tipi, özellik sınıfı) adımının süresi ve en yüksek
+                        bellek kullanımı kaydedilir. Hasta profilleri '<hasta>_profile.json',
+                        kohort kayıtları ve özeti 'radiomics_profile*.csv/json' olarak yazılır.
+                        Önbellekten yüklenen hastalar hesaplanmadığı için profile girmez.
+        required_features (list veya str): Sadece bu sütunlar gerekiyorsa sütun adları listesi ya da
+                        her satırında bir ad olan bir metin dosyası / başlığı bu sütunlar olan bir CSV.
+                        Verilirse gereken en küçük görüntü tipi, filtre parametresi ve özellik kümesi
+                        çıkarılır, tam çalışmaya göre tahmini kazanç yazdırılır ve sadece bu plan
+                        çalıştırılır; çıktıların özellik sütunları listeyle birebir aynıdır.
+        distributed (bool): True ise bu çağrı, aynı veri klasörünü paylaşan işçilerden biri olarak
+                        çalışır: hastalar '<data_folder_path>/.work_queue' klasöründeki kiralama
+                        tabanlı kuyruktan alınır ve tüm hastalar bitince işçilerden biri ana depoyu ve
+                        ana CSV'yi bireysel CSV'lerden kurar. Makine başına istenen sayıda süreç
+                        başlatılabilir; n_jobs bu modda kullanılmaz.
+        lease_seconds (float): Dağıtık modda, ölen bir işçinin hastasının başka bir işçiye geçmesi
+                        için geçmesi gereken süre. İşçiler kiralamalarını bu sürenin üçte birinde bir yeniler.
+        wait_for_workers (bool): Dağıtık modda, alınabilecek hasta kalmadığında diğer işçilerin
+                        bitmesini bekler (böylece ölen işçilerin hastaları da devralınır). False ise
+                        işçi çıkar; ana CSV'yi son biten işçi oluşturur.
+        prefetch_depth (int): Seri çalışmada, bir hasta işlenirken arka planda önden okunacak en fazla
+                        hasta sayısı (bkz. PatientPrefetcher). 0 önden okumayı kapatır. Profil modunda
+                        okuma adımları ayrı ölçüldüğü için kullanılmaz.
+        prefetch_memory_mb (float): İşlenmekte olan ve önden okunan hastaların girdileri için toplam
+                        bellek sınırı (MB, sıkıştırılmamış boyut). PyRadiomics'in çalışma kopyaları dahil değildir.
+    """
+    import radiomics
+    from joblib import Parallel, delayed, parallel_config
+    from feature_store import FeatureStoreWriter, FeatureStoreReader
+
+    # --- 1. Radyomik Özellik Çıkarıcının (Extractor) Ayarlanması ---
+    feature_plan = None
+    if required_features is None:
+        extractor = build_extractor(RADIOMICS_SETTINGS)
+        print("Radyomik özellik çıkarıcı, tüm özellikler etkinleştirilmiş şekilde başlatıldı.")
+    else:
+        try:
+            feature_plan = build_extraction_plan(read_required_features(required_features))
+            extractor = build_extractor(RADIOMICS_SETTINGS, feature_plan)
+        except (OSError, ValueError) as e:
+            print(f"HATA: Gerekli özellik listesi kullanılamadı: {e}")
+            return
+        # Daha önce profil çıkarıldıysa tasarruf ölçülmüş sürelerle tahmin edilir.
+        report_plan_saving(extractor, feature_plan, RADIOMICS_SETTINGS,
+                           os.path.join(data_folder_path, 'radiomics_profile_summary.csv'))
+        print("Radyomik özellik çıkarıcı, sadece gerekli özellikler etkinleştirilmiş şekilde başlatıldı.")
 
     # --- 2. Veri Klasöründe Dolaşma ve İşlemler ---
     print(f"\n'{data_folder_path}' klasörü taranıyor...")
@@ -58,107 +1271,189 @@ def extract_radiomics_features(data_folder_path):
         print(f"HATA: Belirtilen '{data_folder_path}' yolu bir klasör değil veya bulunamadı.")
         return
 
-    # Ana veri klasöründeki her bir öğe (hasta klasörü) için bir döngü başlatıyoruz.
-    # sorted() ile klasörlerin isme göre sıralı işlenmesini sağlıyoruz.
-    for patient_folder_name in sorted(os.listdir(data_folder_path)):
-        # Tam klasör yolunu oluşturuyoruz. os.path.join kullanmak, kodu Windows/Linux/Mac uyumlu yapar.
-        patient_folder_path = os.path.join(data_folder_path, patient_folder_name)
+    patients = find_patient_folders(data_folder_path)
+
+    # Önbellek anahtarı, sonucu etkileyen her şeyi içerir: ayarlar, etkin görüntü tipleri
+    # ve özellikler, PyRadiomics sürümü ve ROI kırpma seçeneği.
+    result_config = {
+        'settings': extractor.settings,
+        'image_types': extractor.enabledImagetypes,
+        'features': extractor.enabledFeatures,
+        'pyradiomics': radiomics.__version__,
+        'crop_to_roi': crop_to_roi,
+        'mask_names': list(mask_names),
+        'labels': labels,
+        'required_features': feature_plan['required'] if feature_plan is not None else None,
+    }
+    cache = None
+    if use_cache:
+        cache = ExtractionCache(cache_dir or os.path.join(data_folder_path, '.radiomics_cache'), result_config)
+
+    if distributed:
+        if n_jobs != 1:
+            print("BİLGİ: Dağıtık modda her süreç tek bir işçidir; n_jobs kullanılmaz. Aynı makinede "
+                  "daha fazla işçi için betiği birden fazla kez başlatın.")
+        config_digest = hashlib.sha256(json.dumps(result_config, sort_keys=True, default=str)
+                                       .encode('utf-8')).hexdigest()
+        _extract_distributed(extractor, data_folder_path, patients, cache, config_digest, crop_to_roi,
+                             mask_names, labels, use_volume_cache, profile, feature_plan, store_dtype,
+                             export_csv, lease_seconds, wait_for_workers)
+        return
+
+    # Biten her hastayı hemen ana depoya ekleyen akış yazıcısı. Her çalışmada depo baştan
+    # kurulur; önbellekteki hastalar hızla yeniden eklendiği için bu ucuzdur.
+    master_store_path = os.path.join(data_folder_path, 'ALL_PATIENTS_radiomics_features.rfs')
+    index_names = ('PatientID', 'Mask', 'Label') if is_multi_target(mask_names, labels) else ('PatientID',)
+    n_succeeded = 0
 
-        # Eğer işlediğimiz öğe bir dosya değil de bir klasör ise devam ediyoruz.
-        if os.path.isdir(patient_folder_path):
-            patient_id = patient_folder_name
-            print(f"\nİşleniyor: Hasta ID -> {patient_id}")
+    with FeatureStoreWriter(master_store_path, index_names=index_names, dtype=store_dtype) as store:
 
-            image_path = os.path.join(patient_folder_path, 'scan.nrrd')
-            mask_path = os.path.join(patient_folder_path, 'segmentation.nrrd')
+        def _collect(rows):
+            nonlocal n_succeeded
+            if rows is not None:
+                for row in rows:
+                    store.append(tuple(row[name] for name in index_names),
+                                 {key: val for key, val in row.items() if key not in index_names})
+                n_succeeded += 1
 
-            # Gerekli 'scan.nrrd' ve 'segmentation.nrrd' dosyaları hasta klasöründe var mı diye kontrol et.
-            if not os.path.exists(image_path) or not os.path.exists(mask_path):
-                print(f"  UYARI: '{patient_id}' klasöründe gerekli NRRD dosyaları bulunamadı. Bu hasta atlanıyor.")
-                continue # Bu hastayı atla ve döngüde bir sonrakine geç.
+        # Önbellekte geçerli sonucu olan hastaları yüklüyor, kalanları hesaplanacaklar listesine alıyoruz.
+        pending = []
+        for patient_id, patient_folder_path in patients:
+            # Bireysel CSV silinmişse önbellekten yeniden yazılır.
+            cache_entry, cached_rows = _lookup_cached_patient(cache, patient_id, patient_folder_path, mask_names)
+            if cached_rows is not None:
+                _collect(cached_rows)
+                continue
+            pending.append((patient_id, patient_folder_path, cache_entry))
+            if profile:
+                # Önceki çalışmadan kalan profil, bu çalışmanın özetine karışmasın.
+                stale_profile = os.path.join(patient_folder_path, f'{patient_id}_profile.json')
+                if os.path.exists(stale_profile):
+                    os.remove(stale_profile)
 
-            # Hata yönetimi: Bir hastanın verisi bozuksa bile programın çökmesini engeller.
-            try:
-                # --- 3. ÖN İŞLEME: Görüntü Formatı Kontrolü ve Düzeltmesi ---
-                # Bu bölüm, "Pixel type... not supported" hatasını çözmek için eklendi.
-                # Görüntüleri doğrudan dosya yolundan değil, SimpleITK nesnesi olarak yüklüyoruz.
-                image = sitk.ReadImage(image_path)
-                mask = sitk.ReadImage(mask_path)
-
-                # Görüntünün piksel başına bileşen sayısını kontrol ediyoruz.
-                # Eğer 1'den büyükse, bu bir vektör (çok kanallı, örn: RGB) görüntüdür.
-                if image.GetNumberOfComponentsPerPixel() > 1:
-                    print(f"  BİLGİ: Scan çok kanallı. Radyomik analiz için tek kanala dönüştürülüyor...")
-                    # Görüntüyü tek kanala dönüştürüyoruz. Bunun için ilk kanalı (index 0) seçiyoruz.
-                    # Bu, 3D Slicer gibi yazılımların arka planda yaptığı işlemin aynısıdır.
-                    # sitk.sitkInt16, medikal görüntüler için yaygın ve güvenli bir piksel türü olduğu için onu seçiyoruz.
-                    image = sitk.VectorIndexSelectionCast(image, 0, sitk.sitkInt16)
-                
-                # --- 4. Radyomik Özelliklerin Çıkarılması ---
-                # Artık extractor'a dosya yolları yerine, kontrol edip düzelttiğimiz
-                # SimpleITK görüntü nesnelerini veriyoruz.
-                result = extractor.execute(image, mask)
+        if cache is not None:
+            print(f"Önbellek: {n_succeeded} hasta önbellekten yüklendi, "
+                  f"{len(pending)} hasta hesaplanacak.")
 
-                # --- 5. Sonuçların İşlenmesi ve Kaydedilmesi ---
-                # extractor.execute'dan dönen sonuçlar, özellikler dışında diagnostik bilgiler de içerir.
-                # Sadece özellik olanları (başında 'diagnostics' olmayanları) seçiyoruz.
-                feature_values = {key: val for key, val in result.items() if not key.startswith('diagnostics')}
-                
-                # Hangi hastaya ait olduğunu bilmek için, sözlüğe 'PatientID' anahtarını ekliyoruz.
-                feature_values['PatientID'] = patient_id
-
-                print(f"  -> Başarılı: {len(feature_values) - 1} adet radyomik özellik çıkarıldı.")
-
-                # Her hasta için bireysel CSV dosyası oluşturuyoruz.
-                # Tek satırlık bir veri için en kolay yol, tek elemanlı bir listeyi DataFrame'e çevirmektir.
-                df_patient = pd.DataFrame([feature_values])
-                
-                # Daha okunaklı olması için 'PatientID' sütununu en başa taşıyoruz.
-                id_col = df_patient.pop('PatientID')
-                df_patient.insert(0, 'PatientID', id_col)
-
-                # Bireysel CSV dosyasını, ilgili hastanın kendi klasörünün içine kaydediyoruz.
-                individual_csv_path = os.path.join(patient_folder_path, f'{patient_id}_radiomics_features.csv')
-                df_patient.to_csv(individual_csv_path, index=False)
-                print(f"  -> Bireysel CSV kaydedildi: {individual_csv_path}")
-                
-                # Bu hastanın özelliklerini, en sonda birleştireceğimiz ana listeye ekliyoruz.
-                all_patients_features_list.append(feature_values)
+        if n_jobs == 1:
+            # Seri çalışma: hastaları isme göre sırayla tek extractor ile işliyoruz. Bir hasta
+            # işlenirken sonraki hastaların girdileri arka planda okunur.
+            if prefetch_depth > 0 and not profile and len(pending) > 1:
+                scheduled = PatientPrefetcher(pending, mask_names, use_volume_cache, prefetch_depth,
+                                              prefetch_memory_mb * 1024 * 1024)
+            else:
+                scheduled = ((item, None) for item in pending)
+            for (patient_id, patient_folder_path, cache_entry), prefetched in scheduled:
+                _collect(process_patient(extractor, patient_id, patient_folder_path,
+                                         crop_to_roi, cache, cache_entry, mask_names, labels,
+                                         use_volume_cache, profile, feature_plan, prefetched))
+        elif pending:
+            # Paralel çalışma: işçi sayısını ve işçi başına iş parçacığı sayısını belirliyoruz.
+            cpu_count = os.cpu_count() or 1
+            n_workers = cpu_count if n_jobs < 0 else min(n_jobs, cpu_count)
+            if sitk_threads is None:
+                sitk_threads = max(1, cpu_count // n_workers)
+            print(f"Paralel mod: {n_workers} işçi, işçi başına {sitk_threads} iş parçacığı.")
 
-            except Exception as e:
-                # Döngü sırasında herhangi bir hastada beklenmedik bir hata olursa,
-                # programın çökmesini engeller, hatayı basar ve bir sonraki hastaya geçer.
-                print(f"  HATA: '{patient_id}' işlenirken bir sorun oluştu: {e}")
+            # En büyük taramaları önce kuyruğa alıyoruz (uzun işler başta, kısa işler sonda).
+            scheduled = sorted(pending, key=lambda item: _scan_size(item[1]), reverse=True)
+
+            # inner_max_num_threads, işçilerdeki NumPy/BLAS/OpenMP iş parçacıklarını da sınırlar.
+            # Sonuçlar bitiş sırasıyla geldikçe depoya yazılır; hepsi bellekte beklemez.
+            with parallel_config(backend='loky', inner_max_num_threads=sitk_threads):
+                results = Parallel(n_jobs=n_workers, return_as='generator_unordered')(
+                    delayed(_process_patient_in_worker)(patient_id, patient_folder_path,
+                                                        RADIOMICS_SETTINGS, sitk_threads, crop_to_roi,
+                                                        cache, cache_entry, mask_names, labels,
+                                                        use_volume_cache, profile, feature_plan)
+                    for patient_id, patient_folder_path, cache_entry in scheduled
+                )
+                for result in results:
+                    _collect(result)
 
-    # --- 6. Tüm Sonuçların Birleştirilip Ana CSV Dosyasının Oluşturulması ---
+    if profile and pending:
+        # Bu çalışmada hesaplanan hastaların profillerini birleştirip kohort özetini yazıyoruz.
+        profile_paths = [os.path.join(patient_folder_path, f'{patient_id}_profile.json')
+                         for patient_id, patient_folder_path, _ in pending]
+        profile_paths = [path for path in profile_paths if os.path.exists(path)]
+        if profile_paths:
+            write_cohort_profile(profile_paths, data_folder_path)
+
+    # --- 6. Ana CSV Dosyasının Oluşturulması ---
     # Döngü bittikten sonra, eğer en az bir hasta başarıyla işlendiyse devam et.
-    if not all_patients_features_list:
+    if n_succeeded == 0:
         print("\nHiçbir hasta başarıyla işlenemedi. Ana CSV dosyası oluşturulmuyor.")
         return
 
-    print("\nTüm hastalar işlendi. Şimdi tüm verileri birleştiren ana CSV dosyası oluşturuluyor...")
-    
-    # Her hasta için oluşturduğumuz sözlükleri içeren listeyi, tek bir büyük DataFrame'e dönüştürüyoruz.
-    master_df = pd.DataFrame(all_patients_features_list)
-    
-    # Ana DataFrame'de de PatientID'yi en başa alalım.
-    id_col = master_df.pop('PatientID')
-    master_df.insert(0, 'PatientID', id_col)
-    
-    # Ana CSV dosyasını, ana veri klasörünün içine kaydediyoruz.
-    master_csv_path = os.path.join(data_folder_path, 'ALL_PATIENTS_radiomics_features.csv')
-    master_df.to_csv(master_csv_path, index=False)
+    print(f"\nTüm hastalar işlendi. Birleşik sonuçlar depoya kaydedildi: {master_store_path}")
+
+    if export_csv:
+        # Depo, hastaları PatientID sırasıyla ve tüm sütunların birleşimiyle satır satır yazar;
+        # böylece ana CSV, çalışma sırası ne olursa olsun seri çalışmayla aynıdır.
+        master_csv_path = os.path.join(data_folder_path, 'ALL_PATIENTS_radiomics_features.csv')
+        FeatureStoreReader(master_store_path).export_csv(master_csv_path)
+        print(f"Tüm hastaların birleşik sonuçları şu dosyaya kaydedildi: {master_csv_path}")
 
     print(f"\nİŞLEM TAMAMLANDI!")
-    print(f"Tüm hastaların birleşik sonuçları şu dosyaya kaydedildi: {master_csv_path}")
 
 
 # --- KODUN KULLANIMI ---
-# LÜTFEN BU SATIRI KENDİ KLASÖR YOLUNUZLA DEĞİŞTİRİN:
-# Bu, içinde 'scan.nrrd' ve 'segmentation.nrrd' dosyalarını barındıran
-# hasta klasörlerinin bulunduğu ana klasörün yolu olmalıdır.
-# Örnek: main_data_folder = "C:/Users/Taha/Desktop/YumurtalikKanseri/Duzenlenmis_Veri"
-main_data_folder = 'data/structured'
-
-# Hazırladığımız ana fonksiyonu, belirttiğimiz klasör yoluyla çağırarak işlemi başlatıyoruz.
-extract_radiomics_features(main_data_folder)
\ No newline at end of file
+# Paralel modda işçi süreçler bu modülü yeniden içe aktarabildiği için (örn. Windows'ta),
+# çalıştırma kodu sadece betik doğrudan çalıştırıldığında devreye girer.
+if __name__ == '__main__':
+    # LÜTFEN BU SATIRI KENDİ KLASÖR YOLUNUZLA DEĞİŞTİRİN:
+    # Bu, içinde 'scan.nrrd' ve 'segmentation.nrrd' dosyalarını barındıran
+    # hasta klasörlerinin bulunduğu ana klasörün yolu olmalıdır.
+    # Örnek: main_data_folder = "C:/Users/Taha/Desktop/YumurtalikKanseri/Duzenlenmis_Veri"
+    main_data_folder = 'data/structured'
+
+    # Paralel işçi sayısı. 1 seri çalışır; -1 tüm çekirdekleri kullanır.
+    n_jobs = 1
+
+    # True ise filtreler sadece tümör çevresindeki kenar paylı kutu üzerinde hesaplanır.
+    # Açmadan önce birkaç hastada doğrulayın: verify_roi_crop('data/structured/<hasta>')
+    crop_to_roi = False
+
+    # True ise değişmeyen hastalar '.radiomics_cache' klasöründeki önbellekten yüklenir.
+    use_cache = True
+
+    # Aynı taramaya ait birden fazla maske veya etiket için özellik çıkarmak isterseniz
+    # (örn. mask_names = ('segmentation.nrrd', 'segmentation_raterB.nrrd'), labels = [1, 2]),
+    # filtreler tarama başına bir kez hesaplanır ve her maske/etiket için ayrı satır üretilir.
+    mask_names = DEFAULT_MASK_NAMES
+    labels = None
+
+    # True ise NRRD'ler bir kez sıkıştırılmamış önbelleğe ('<hasta>/.volume_cache') dönüştürülür;
+    # ayar denemeleri gibi tekrarlanan çalışmalarda gzip çözme süresi ortadan kalkar.
+    use_volume_cache = False
+
+    # True ise her hastanın adım adım süre/bellek profili çıkarılır ve en pahalı adımlar özetlenir
+    # (radiomics_profile.csv, radiomics_profile_summary.csv). Tüm hastaları ölçmek için
+    # use_cache = False ile birlikte kullanın.
+    profile = False
+
+    # Modeliniz sadece belirli sütunları kullanıyorsa, bu sütunların listesi (veya her satırda bir
+    # sütun adı olan bir .txt ya da başlığı bu sütunlar olan bir .csv dosyası) verilebilir.
+    # Örn. required_features = 'model_features.txt'. Sadece gereken filtreler ve özellikler
+    # hesaplanır ve çıktı sütunları bu listeyle birebir aynı olur. None ise tüm özellikler çıkarılır.
+    required_features = None
+
+    # Büyük kohortları birden fazla makinede işlemek için True yapın ve betiği, aynı veri klasörünü
+    # (paylaşılan dosya sistemi) gören her makinede başlatın. Hastalar '.work_queue' klasöründeki
+    # kiralama dosyalarıyla paylaştırılır; ölen bir işçinin hastası 'lease_seconds' sonra devralınır.
+    # Tüm hastalar bitince işçilerden biri ana CSV'yi oluşturur.
+    distributed = False
+    lease_seconds = 600
+
+    # Seri çalışmada (n_jobs = 1), bir hasta işlenirken sonraki kaç hastanın arka planda okunacağı
+    # ve işlenen ile önden okunan hastaların girdileri için toplam bellek sınırı (MB). 0 önden okumayı kapatır.
+    prefetch_depth = 2
+    prefetch_memory_mb = 2048
+
+    # Hazırladığımız ana fonksiyonu, belirttiğimiz klasör yoluyla çağırarak işlemi başlatıyoruz.
+    extract_radiomics_features(main_data_folder, n_jobs=n_jobs, crop_to_roi=crop_to_roi,
+                               use_cache=use_cache, mask_names=mask_names, labels=labels,
+                               use_volume_cache=use_volume_cache, profile=profile,
+                               required_features=required_features, distributed=distributed,
+                               lease_seconds=lease_seconds, prefetch_depth=prefetch_depth,
+                               prefetch_memory_mb=prefetch_memory_mb)
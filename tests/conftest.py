@@ -0,0 +1,24 @@
+import os
+import sys
+
+import pytest
+
+# Modüller depo kökünde düz dosyalar olarak durduğu için (paket değil), testler onları
+# doğrudan içe aktarabilsin diye kök klasörü arama yoluna ekliyoruz.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(scope='session')
+def phantom_cohort(tmp_path_factory):
+    """benchmark.make_phantom ile üretilmiş üç hastalık küçük bir 'data/structured' klasörü."""
+    sitk = pytest.importorskip('SimpleITK')
+    from benchmark import make_phantom
+
+    root = tmp_path_factory.mktemp('structured')
+    for seed in range(3):
+        folder = root / f'Hasta_{seed}'
+        folder.mkdir()
+        scan, mask = make_phantom((40, 40, 12), (1.0, 1.0, 3.0), 8, seed=seed)
+        sitk.WriteImage(scan, str(folder / 'scan.nrrd'), True)
+        sitk.WriteImage(mask, str(folder / 'segmentation.nrrd'), True)
+    return root
@@ -0,0 +1,89 @@
+import pytest
+
+from extraction_plan import (parse_feature_name, build_extraction_plan, derived_image_names, check_plan_coverage,
+                             image_type_passes, read_required_features, estimate_plan_cost)
+
+
+@pytest.mark.parametrize('name, image_type, args', [
+    ('original_firstorder_Mean', 'Original', {}),
+    ('wavelet-LLH_glcm_Correlation', 'Wavelet', {'level': 1}),
+    ('wavelet2-HHL_glrlm_RunEntropy', 'Wavelet', {'level': 2}),
+    ('log-sigma-3-0-mm-3D_glszm_ZonePercentage', 'LoG', {'sigma': 3.0}),
+    ('lbp-3D-m2_firstorder_Energy', 'LBP3D', {'lbp3DLevels': 2}),
+    ('lbp-3D-k_firstorder_Energy', 'LBP3D', {}),
+    ('squareroot_ngtdm_Busyness', 'SquareRoot', {}),
+])
+def test_parse_feature_name(name, image_type, args):
+    parsed = parse_feature_name(name)
+    assert parsed['image_type'] == image_type
+    assert parsed['args'] == args
+    assert '_'.join((parsed['image'], parsed['feature_class'], parsed['feature'])) == name
+
+
+@pytest.mark.parametrize('name', ['original_Mean', 'wavelet-XYZ_glcm_Correlation', 'wavelet-LLH_shape_Elongation'])
+def test_parse_feature_name_rejects_unknown_names(name):
+    with pytest.raises(ValueError):
+        parse_feature_name(name)
+
+
+def _assert_round_trip(plan, settings=None):
+    """Planın çalıştırmalarının ürettiği her (görüntü, sınıf, özellik) istenen bir sütuna karşılık gelmeli."""
+    check_plan_coverage(plan, settings)
+    computed = {f'{image}_{feature_class}_{feature}'
+                for image, classes in plan['images'].items()
+                for feature_class, features in classes.items() for feature in features}
+    assert computed == set(plan['required'])
+
+
+def test_plan_round_trip():
+    required = ['original_shape_Elongation', 'original_firstorder_Mean', 'wavelet-LLH_glcm_Correlation',
+                'log-sigma-1-0-mm-3D_firstorder_Mean', 'log-sigma-3-0-mm-3D_glszm_ZonePercentage',
+                'lbp-3D-m1_firstorder_Energy']
+    plan = build_extraction_plan(required)
+    assert plan['image_types'] == {'Original': {}, 'Wavelet': {}, 'LoG': {'sigma': [1.0, 3.0]}, 'LBP3D': {}}
+    assert plan['feature_classes'] == {'shape': ['Elongation'], 'firstorder': ['Mean', 'Energy'],
+                                       'glcm': ['Correlation'], 'glszm': ['ZonePercentage']}
+    assert plan['extra_passes'] == {}
+    _assert_round_trip(plan)
+
+
+def test_shape_only_plan_skips_original_image():
+    plan = build_extraction_plan(['original_shape_Elongation', 'original_shape_Sphericity'])
+    assert plan['image_types'] == {}
+    _assert_round_trip(plan)
+
+
+def test_shallow_wavelet_approximation_gets_its_own_pass():
+    # PyRadiomics 2. seviyede sadece 'wavelet2-LLL' üretir; 'wavelet-LLL' için 1. seviye ayrıca çalışmalı.
+    required = ['wavelet-LLL_firstorder_Mean', 'wavelet2-HHL_glcm_Correlation', 'wavelet-HLH_firstorder_Mean']
+    plan = build_extraction_plan(required)
+    assert plan['image_types'] == {'Wavelet': {'level': 2}}
+    assert plan['extra_passes'] == {'Wavelet': [{'level': 1}]}
+    assert 'wavelet-LLL' not in derived_image_names('Wavelet', {'level': 2})
+    assert image_type_passes(plan['image_types'], plan['extra_passes']) == [('Wavelet', {'level': 2}),
+                                                                             ('Wavelet', {'level': 1})]
+    _assert_round_trip(plan)
+
+    # Ek çalıştırma, zaten hesaplanmış bantlarda özellikleri ikinci kez saymaz.
+    estimate = estimate_plan_cost(plan['image_types'], plan['feature_classes'], plan['images'],
+                                  extra_passes=plan['extra_passes'])
+    assert estimate['class_evaluations'] == len(required)
+
+
+def test_coverage_check_reports_columns_the_plan_cannot_produce():
+    plan = build_extraction_plan(['log-sigma-3-0-mm-3D_firstorder_Mean', 'original_firstorder_Mean'])
+    with pytest.raises(ValueError, match='log-sigma-3-0-mm-3D_firstorder_Mean'):
+        check_plan_coverage(plan, {'force2D': True})
+
+    stale = dict(plan, extra_passes={})
+    stale['required'] = plan['required'] + ['wavelet-LLL_firstorder_Mean']
+    stale['image_types'] = dict(plan['image_types'], Wavelet={'level': 2})
+    with pytest.raises(ValueError, match='wavelet-LLL_firstorder_Mean'):
+        check_plan_coverage(stale)
+
+
+def test_read_required_features_from_csv_header(tmp_path):
+    path = tmp_path / 'model.csv'
+    path.write_text('PatientID,diagnostics_Versions_PyRadiomics,original_firstorder_Mean,original_firstorder_Mean,'
+                    'wavelet-LLH_glcm_Correlation\n1,2,3,4,5\n', encoding='utf-8')
+    assert read_required_features(str(path)) == ['original_firstorder_Mean', 'wavelet-LLH_glcm_Correlation']
@@ -0,0 +1,121 @@
+import math
+import os
+
+import pandas as pd
+import pytest
+
+from feature_store import FeatureStoreWriter, FeatureStoreReader, compact_feature_store
+
+
+ROWS = [
+    ('Hasta_1', {'original_firstorder_Mean': 101.25, 'original_glcm_Correlation': 0.1}),
+    ('Hasta_2', {'original_firstorder_Mean': -3.0, 'original_glcm_Correlation': 1e-12}),
+    ('Hasta_3', {'original_firstorder_Mean': 7.125, 'original_glcm_Correlation': float('nan')}),
+]
+
+
+def _write(path, rows, append=False):
+    with FeatureStoreWriter(path, append=append) as writer:
+        for index, features in rows:
+            writer.append(index, features)
+
+
+def test_append_reopens_and_latest_row_wins(tmp_path):
+    path = str(tmp_path / 'store.rfs')
+    _write(path, ROWS[:2])
+    _write(path, [ROWS[2], ('Hasta_1', {'original_firstorder_Mean': 5.5, 'original_glcm_Correlation': 0.5})],
+           append=True)
+
+    reader = FeatureStoreReader(path)
+    assert len(reader.schemas) == 1  # Aynı sütunlarla eklenirken şema yeniden yazılmaz.
+    assert reader.read_row('Hasta_1') == {'original_firstorder_Mean': 5.5, 'original_glcm_Correlation': 0.5}
+    assert reader.read_row('Hasta_2')['original_glcm_Correlation'] == 1e-12
+    assert math.isnan(reader.read_row('Hasta_3')['original_glcm_Correlation'])
+    assert reader.n_stale_rows == 1
+
+    compact_feature_store(path)
+    compacted = FeatureStoreReader(path)
+    assert compacted.n_stale_rows == 0
+    assert compacted.read_row('Hasta_1')['original_firstorder_Mean'] == 5.5
+
+
+def test_schema_change_unions_columns(tmp_path):
+    path = str(tmp_path / 'store.rfs')
+    _write(path, [ROWS[0], ('Hasta_2', {'original_shape_Elongation': 0.75})])
+
+    reader = FeatureStoreReader(path)
+    assert reader.columns == ['original_firstorder_Mean', 'original_glcm_Correlation', 'original_shape_Elongation']
+    frame = reader.read_columns(['original_shape_Elongation', 'original_firstorder_Mean'])
+    assert frame['PatientID'].tolist() == ['Hasta_1', 'Hasta_2']
+    assert math.isnan(frame['original_shape_Elongation'][0])
+    assert frame['original_shape_Elongation'][1] == 0.75
+    with pytest.raises(KeyError):
+        reader.read_columns(['yok'])
+
+
+def test_truncated_tail_is_ignored_and_cut_on_append(tmp_path):
+    path = str(tmp_path / 'store.rfs')
+    _write(path, ROWS[:2])
+    complete_size = os.path.getsize(path)
+    _write(path, ROWS[2:], append=True)
+
+    # İş, son kayıt yazılırken öldürülmüş gibi dosyanın sonunu kesiyoruz.
+    with open(path, 'r+b') as f:
+        f.truncate(os.path.getsize(path) - 5)
+
+    reader = FeatureStoreReader(path)
+    assert reader.valid_size == complete_size
+    assert sorted(reader.row_locations()) == [('Hasta_1',), ('Hasta_2',)]
+
+    _write(path, ROWS[2:], append=True)
+    reader = FeatureStoreReader(path)
+    assert reader.valid_size == os.path.getsize(path)
+    assert sorted(reader.row_locations()) == [('Hasta_1',), ('Hasta_2',), ('Hasta_3',)]
+
+
+def test_corrupted_record_fails_crc_and_is_replaced(tmp_path):
+    path = str(tmp_path / 'store.rfs')
+    _write(path, ROWS[:2])
+    complete_size = os.path.getsize(path)
+    _write(path, ROWS[2:], append=True)
+
+    # Son kaydın verisinin son baytını bozuyoruz; uzunluk doğru ama CRC tutmaz.
+    with open(path, 'r+b') as f:
+        f.seek(-1, os.SEEK_END)
+        last = f.read(1)
+        f.seek(-1, os.SEEK_END)
+        f.write(bytes([last[0] ^ 0xFF]))
+
+    reader = FeatureStoreReader(path)
+    assert reader.valid_size == complete_size
+    with pytest.raises(KeyError):
+        reader.read_row('Hasta_3')
+
+    _write(path, ROWS[2:], append=True)
+    assert FeatureStoreReader(path).read_row('Hasta_3')['original_firstorder_Mean'] == 7.125
+
+
+def test_rejects_files_without_magic(tmp_path):
+    path = tmp_path / 'store.rfs'
+    path.write_bytes(b'PatientID,original_firstorder_Mean\n')
+    with pytest.raises(ValueError):
+        FeatureStoreReader(str(path))
+
+
+def test_export_csv_matches_pandas_master_csv(tmp_path):
+    path = str(tmp_path / 'store.rfs')
+    rows = ROWS + [('Hasta_4', {'original_firstorder_Mean': 0.30000000000000004, 'original_shape_Elongation': 2.0})]
+    _write(path, rows)
+
+    exported = tmp_path / 'export.csv'
+    FeatureStoreReader(path).export_csv(str(exported))
+
+    # Depodan önceki çıktı: hasta sözlüklerinden kurulan DataFrame, PatientID en başta.
+    records = [dict(features, PatientID=index) for index, features in rows]
+    master_df = pd.DataFrame(records)
+    master_df.insert(0, 'PatientID', master_df.pop('PatientID'))
+    expected = tmp_path / 'expected.csv'
+    master_df.to_csv(expected, index=False)
+
+    pd.testing.assert_frame_equal(pd.read_csv(exported), pd.read_csv(expected))
+    assert exported.read_text(encoding='utf-8') == expected.read_text(encoding='utf-8')
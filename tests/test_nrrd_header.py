@@ -0,0 +1,99 @@
+import numpy as np
+import pytest
+
+sitk = pytest.importorskip('SimpleITK')
+
+from nrrd_header import nrrd_geometry, geometry_mismatches, same_voxel_grid
+
+
+def _sitk_geometry(path):
+    reader = sitk.ImageFileReader()
+    reader.SetFileName(str(path))
+    reader.ReadImageInformation()
+    return {
+        'size': list(reader.GetSize()),
+        'spacing': list(reader.GetSpacing()),
+        'origin': list(reader.GetOrigin()),
+        'direction': list(reader.GetDirection()),
+        'components': reader.GetNumberOfComponents(),
+    }
+
+
+def _assert_same_geometry(path):
+    ours, theirs = nrrd_geometry(str(path)), _sitk_geometry(path)
+    assert ours['size'] == theirs['size']
+    assert ours['components'] == theirs['components']
+    for key in ('spacing', 'origin', 'direction'):
+        np.testing.assert_allclose(ours[key], theirs[key], atol=1e-9, err_msg=key)
+    return ours
+
+
+def _write_raw_nrrd(path, header_lines, data):
+    with open(path, 'wb') as f:
+        f.write(('NRRD0004\n' + '\n'.join(header_lines) + '\n\n').encode('ascii'))
+        f.write(data.tobytes())
+
+
+def _oblique_direction():
+    angle = np.deg2rad(20)
+    return (np.cos(angle), -np.sin(angle), 0.0, np.sin(angle), np.cos(angle), 0.0, 0.0, 0.0, 1.0)
+
+
+def test_gzip_image_written_by_simpleitk(tmp_path):
+    image = sitk.GetImageFromArray(np.arange(5 * 6 * 7, dtype=np.int16).reshape(5, 6, 7))
+    image.SetSpacing((0.8, 0.9, 3.0))
+    image.SetOrigin((-120.5, 33.25, 7.0))
+    image.SetDirection(_oblique_direction())
+    path = tmp_path / 'scan.nrrd'
+    sitk.WriteImage(image, str(path), True)
+
+    geometry = _assert_same_geometry(path)
+    assert geometry['encoding'] == 'gzip'
+    assert geometry['voxels'] == 5 * 6 * 7
+
+
+def test_ras_space_is_converted_to_lps(tmp_path):
+    path = tmp_path / 'ras.nrrd'
+    _write_raw_nrrd(path, [
+        'type: short', 'dimension: 3', 'space: right-anterior-superior', 'sizes: 4 3 2',
+        'space directions: (0.7,0.1,0) (0,0.8,0) (0,0,2.5)', 'kinds: domain domain domain',
+        'endian: little', 'encoding: raw', 'space origin: (10,-20,30)',
+    ], np.zeros((2, 3, 4), dtype='<i2'))
+
+    geometry = _assert_same_geometry(path)
+    assert geometry['origin'][:2] == [-10.0, 20.0]
+
+
+def test_4d_segmentation_is_read_as_multi_component(tmp_path):
+    # Slicer'ın çok katmanlı .seg.nrrd dosyaları: ilk eksen katman (list) eksenidir.
+    path = tmp_path / 'segmentation.seg.nrrd'
+    _write_raw_nrrd(path, [
+        'type: unsigned char', 'dimension: 4', 'space: left-posterior-superior', 'sizes: 3 4 3 2',
+        'space directions: none (0.8,0,0) (0,0.8,0) (0,0,3)', 'kinds: list domain domain domain',
+        'endian: little', 'encoding: raw', 'space origin: (-5,-6,-7)',
+        'Segment0_ID:=Segment_1',
+    ], np.zeros((2, 3, 4, 3), dtype=np.uint8))
+
+    geometry = _assert_same_geometry(path)
+    assert geometry['components'] == 3
+    assert geometry['size'] == [4, 3, 2]
+
+
+def _grid(size, origin=(0.0, 0.0, 0.0), spacing=(0.8, 0.8, 3.0)):
+    return {'size': list(size), 'origin': list(origin), 'spacing': list(spacing),
+            'direction': [1.0, 0, 0, 0, 1.0, 0, 0, 0, 1.0]}
+
+
+def test_cropped_segmentation_matches_but_needs_resampling():
+    scan = _grid((64, 64, 20))
+    cropped = _grid((10, 12, 4), origin=(8.0, 16.0, 30.0))
+    assert geometry_mismatches(scan, cropped) == []
+    assert not same_voxel_grid(scan, cropped)
+    assert same_voxel_grid(scan, _grid((64, 64, 20)))
+
+
+def test_mismatched_spacing_and_extent_are_reported():
+    scan = _grid((64, 64, 20))
+    assert any('voksel aralığı' in p for p in geometry_mismatches(scan, _grid((64, 64, 20), spacing=(0.8, 0.8, 1.0))))
+    assert any('kapsamı dışına' in p for p in geometry_mismatches(scan, _grid((10, 10, 4), origin=(60.0, 0, 0))))
+    assert geometry_mismatches(scan, _grid((64, 64), spacing=(0.8, 0.8))) != []
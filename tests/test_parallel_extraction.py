@@ -0,0 +1,44 @@
+import csv
+import math
+import os
+import shutil
+
+import pytest
+
+pytest.importorskip('radiomics')
+
+from radiomics_extractor import extract_radiomics_features
+
+MASTER_CSV = 'ALL_PATIENTS_radiomics_features.csv'
+REQUIRED_FEATURES = ['original_shape_Elongation', 'original_firstorder_Mean', 'original_glcm_Correlation',
+                     'log-sigma-1-0-mm-3D_glszm_ZonePercentage', 'wavelet-LLL_firstorder_Mean',
+                     'wavelet2-HHL_glrlm_RunEntropy']
+
+
+def _run(cohort, destination, **kwargs):
+    shutil.copytree(cohort, destination)
+    extract_radiomics_features(str(destination), use_cache=False, required_features=REQUIRED_FEATURES, **kwargs)
+    outputs = {}
+    for root, _, files in os.walk(destination):
+        for filename in files:
+            if filename.endswith('.csv'):
+                path = os.path.join(root, filename)
+                with open(path, encoding='utf-8') as f:
+                    outputs[os.path.relpath(path, destination)] = f.read()
+    return outputs
+
+
+def test_serial_and_parallel_runs_write_identical_csvs(phantom_cohort, tmp_path):
+    serial = _run(phantom_cohort, tmp_path / 'seri', n_jobs=1)
+    parallel = _run(phantom_cohort, tmp_path / 'paralel', n_jobs=2)
+
+    assert MASTER_CSV in serial
+    assert sum(name.endswith('_radiomics_features.csv') for name in serial) == 3 + 1
+    assert serial == parallel
+
+    # Planın her sütunu her hastada bir değerle çıktıda olmalı (boş/NaN sütun yok).
+    rows = list(csv.DictReader(serial[MASTER_CSV].splitlines()))
+    assert [row['PatientID'] for row in rows] == ['Hasta_0', 'Hasta_1', 'Hasta_2']
+    for row in rows:
+        assert list(row)[1:] == REQUIRED_FEATURES
+        assert all(row[name] != '' and not math.isnan(float(row[name])) for name in REQUIRED_FEATURES)
@@ -0,0 +1,101 @@
+import os
+import threading
+import time
+
+import numpy as np
+import pytest
+
+sitk = pytest.importorskip('SimpleITK')
+
+import radiomics_extractor
+from radiomics_extractor import PatientPrefetcher
+
+SIZE = (8, 8, 4)
+# int16 tarama + uint8 maske, sıkıştırılmamış.
+PATIENT_BYTES = 3 * SIZE[0] * SIZE[1] * SIZE[2]
+
+
+def _make_cohort(root, n_patients, missing_mask=()):
+    items = []
+    for i in range(n_patients):
+        folder = root / f'Hasta_{i}'
+        folder.mkdir()
+        scan = sitk.GetImageFromArray(np.full(SIZE[::-1], i, dtype=np.int16))
+        sitk.WriteImage(scan, str(folder / 'scan.nrrd'), True)
+        if i not in missing_mask:
+            mask = sitk.GetImageFromArray(np.ones(SIZE[::-1], dtype=np.uint8))
+            sitk.WriteImage(mask, str(folder / 'segmentation.nrrd'), True)
+        items.append((f'Hasta_{i}', str(folder)))
+    return items
+
+
+@pytest.fixture
+def read_log(monkeypatch):
+    """read_patient_inputs çağrılarını (hasta klasörü adıyla) kaydeder."""
+    log, lock = [], threading.Lock()
+    original = radiomics_extractor.read_patient_inputs
+
+    def recording(patient_folder_path, *args):
+        with lock:
+            log.append(os.path.basename(patient_folder_path))
+        return original(patient_folder_path, *args)
+
+    monkeypatch.setattr(radiomics_extractor, 'read_patient_inputs', recording)
+    return log
+
+
+def _settle(log, expected, timeout=2.0):
+    """Arka plan okumalarının başlaması için kısa bir süre bekler; kaydın bir kopyasını döndürür."""
+    deadline = time.monotonic() + timeout
+    while set(expected) - set(log) and time.monotonic() < deadline:
+        time.sleep(0.01)
+    time.sleep(0.05)
+    return list(log)
+
+
+def test_patients_are_yielded_in_order_with_their_own_inputs(tmp_path, read_log):
+    items = _make_cohort(tmp_path, 5)
+    seen = []
+    for (patient_id, _), inputs in PatientPrefetcher(items, ('segmentation.nrrd',), False, depth=2,
+                                                     max_bytes=100 * PATIENT_BYTES):
+        value = int(sitk.GetArrayViewFromImage(inputs.result()['image'])[0, 0, 0])
+        seen.append((patient_id, value))
+    assert seen == [(f'Hasta_{i}', i) for i in range(5)]
+    assert sorted(read_log) == sorted(f'Hasta_{i}' for i in range(5))  # Her hasta bir kez okunur.
+
+
+def test_depth_limits_look_ahead(tmp_path, read_log):
+    items = _make_cohort(tmp_path, 6)
+    for index, (_, inputs) in enumerate(PatientPrefetcher(items, ('segmentation.nrrd',), False, depth=2,
+                                                          max_bytes=100 * PATIENT_BYTES)):
+        inputs.result()
+        expected = [f'Hasta_{i}' for i in range(index, min(index + 3, len(items)))]
+        log = _settle(read_log, expected)
+        assert set(expected) <= set(log)
+        assert len(log) == index + len(expected)
+
+
+def test_memory_cap_counts_the_patient_being_processed(tmp_path, read_log):
+    items = _make_cohort(tmp_path, 5)
+    # İşlenen hasta + bir hasta sığar; derinlik 3 olsa da sadece bir hasta önden okunmalı.
+    prefetcher = PatientPrefetcher(items, ('segmentation.nrrd',), False, depth=3, max_bytes=2 * PATIENT_BYTES)
+    for index, (_, inputs) in enumerate(prefetcher):
+        inputs.result()
+        expected = [f'Hasta_{i}' for i in range(index, min(index + 2, len(items)))]
+        log = _settle(read_log, expected)
+        assert set(expected) <= set(log)
+        assert len(log) == index + len(expected)
+    assert prefetcher.input_bytes(0) == PATIENT_BYTES
+
+
+def test_patient_with_unreadable_header_is_not_prefetched(tmp_path, read_log):
+    items = _make_cohort(tmp_path, 4, missing_mask={2})
+    results = []
+    for index, (_, inputs) in enumerate(PatientPrefetcher(items, ('segmentation.nrrd',), False, depth=2,
+                                                          max_bytes=100 * PATIENT_BYTES)):
+        if index == 1:
+            # Hasta_2'nin boyutu bilinmediği için Hasta_1 işlenirken önden okunmaz.
+            assert 'Hasta_2' not in _settle(read_log, ['Hasta_1'])
+        results.append(inputs.result())
+    assert results[2] is None
+    assert all(result is not None for i, result in enumerate(results) if i != 2)
@@ -0,0 +1,92 @@
+import json
+import os
+import shutil
+
+import numpy as np
+import pytest
+
+import profiling
+from profiling import ExtractionProfiler, profile_stage
+
+
+@pytest.fixture
+def fake_rss(monkeypatch):
+    """RSS'i testin belirlediği değerle döndürür; örnekleme iş parçacığı kapalıdır."""
+    rss = {'bytes': 100 * 1024 * 1024}
+    monkeypatch.setattr(profiling, '_current_rss_bytes', lambda: rss['bytes'])
+    return rss
+
+
+def _profiler():
+    return ExtractionProfiler('Hasta_1', sample_interval=3600)
+
+
+def test_nested_stages_with_equal_peaks_keep_their_own_records(fake_rss):
+    profiler = _profiler()
+    with profiler.stage('patient'):
+        # İç adım dış adımla aynı tepe değeriyle başlar; dış adımın kaydı silinmemeli.
+        with profiler.stage('inner'):
+            pass
+        fake_rss['bytes'] += 50 * 1024 * 1024
+        with profiler.stage('allocate'):
+            pass
+        with profiler.stage('inner2'):
+            fake_rss['bytes'] += 25 * 1024 * 1024
+        fake_rss['bytes'] -= 75 * 1024 * 1024
+    profiler.close()
+
+    records = {record['stage']: record for record in profiler.records}
+    assert list(records) == ['inner', 'allocate', 'inner2', 'patient']
+    assert records['inner']['peak_rss_mb'] == 100
+    assert records['allocate']['peak_rss_mb'] == 150
+    assert records['inner2']['peak_rss_mb'] == 175
+    assert records['inner2']['rss_delta_mb'] == 25
+    assert records['patient']['peak_rss_mb'] == 175
+    assert records['patient']['rss_delta_mb'] == 0
+    assert profiler._open_stages == []
+
+
+def test_sampler_tracks_real_allocation_in_outer_stage():
+    if profiling._current_rss_bytes() is None:
+        pytest.skip('Bu sistemde RSS ölçülemiyor.')
+    profiler = ExtractionProfiler('Hasta_1')
+    with profiler.stage('patient'):
+        with profiler.stage('allocate'):
+            block = np.ones(64 * 1024 * 1024, dtype=np.uint8)
+        del block
+        with profiler.stage('after'):
+            pass
+    profiler.close()
+
+    records = {record['stage']: record for record in profiler.records}
+    assert records['allocate']['rss_delta_mb'] > 32
+    assert records['patient']['peak_rss_mb'] >= records['allocate']['peak_rss_mb']
+
+
+def test_discarded_stage_and_missing_profiler():
+    profiler = _profiler()
+    with profiler.stage('filter', image_type='Wavelet') as labels:
+        labels['discard'] = True
+    profiler.close()
+    assert profiler.records == []
+    with profile_stage(None, 'filter') as labels:
+        assert labels == {}
+
+
+def test_profiled_extraction_writes_profiles(phantom_cohort, tmp_path):
+    pytest.importorskip('radiomics')
+    from radiomics_extractor import extract_radiomics_features
+
+    data_folder = tmp_path / 'structured'
+    shutil.copytree(phantom_cohort, data_folder)
+    extract_radiomics_features(str(data_folder), use_cache=False, profile=True,
+                               required_features=['original_shape_Elongation', 'original_glcm_Correlation',
+                                                  'wavelet-HLL_firstorder_Mean'])
+
+    for patient_id in ('Hasta_0', 'Hasta_1', 'Hasta_2'):
+        assert os.path.exists(data_folder / patient_id / f'{patient_id}_radiomics_features.csv')
+        with open(data_folder / patient_id / f'{patient_id}_profile.json', encoding='utf-8') as f:
+            stages = {record['stage'] for record in json.load(f)}
+        assert {'read_scan', 'filter', 'features'} <= stages
+    assert os.path.exists(data_folder / 'ALL_PATIENTS_radiomics_features.csv')
+    assert os.path.exists(data_folder / 'radiomics_profile_summary.csv')
@@ -0,0 +1,43 @@
+import csv
+import math
+import os
+import shutil
+
+import pytest
+
+pytest.importorskip('radiomics')
+
+from radiomics_extractor import extract_radiomics_features, verify_roi_crop
+
+MASTER_CSV = 'ALL_PATIENTS_radiomics_features.csv'
+# Uzamsal filtreler (LoG, Wavelet, LBP3D) kırpılmış kutuda, global yoğunluklu olanlar (Square) tüm
+# görüntüde hesaplanır; ikisi de plana dahil.
+REQUIRED_FEATURES = ['original_shape_Elongation', 'original_firstorder_Mean', 'original_glcm_Correlation',
+                     'log-sigma-1-0-mm-3D_glszm_ZonePercentage', 'wavelet-HLL_firstorder_Mean',
+                     'wavelet2-LLL_glrlm_RunEntropy', 'lbp-3D-m1_firstorder_Energy', 'square_firstorder_Mean']
+
+
+def _master_rows(cohort, destination, **kwargs):
+    shutil.copytree(cohort, destination)
+    extract_radiomics_features(str(destination), use_cache=False, required_features=REQUIRED_FEATURES, **kwargs)
+    with open(os.path.join(destination, MASTER_CSV), newline='', encoding='utf-8') as f:
+        return {row.pop('PatientID'): row for row in csv.DictReader(f)}
+
+
+@pytest.mark.parametrize('n_jobs', [1, 2])
+def test_cropped_run_matches_uncropped_run(phantom_cohort, tmp_path, n_jobs):
+    full = _master_rows(phantom_cohort, tmp_path / 'tam', n_jobs=n_jobs)
+    cropped = _master_rows(phantom_cohort, tmp_path / 'kirpilmis', n_jobs=n_jobs, crop_to_roi=True)
+
+    assert sorted(full) == sorted(cropped) == ['Hasta_0', 'Hasta_1', 'Hasta_2']
+    for patient_id, row in full.items():
+        assert list(cropped[patient_id]) == REQUIRED_FEATURES
+        for name in REQUIRED_FEATURES:
+            full_value, cropped_value = float(row[name]), float(cropped[patient_id][name])
+            assert not math.isnan(full_value)
+            assert cropped_value == pytest.approx(full_value, rel=1e-3, abs=1e-6), (patient_id, name)
+
+
+def test_verify_roi_crop_runs_on_phantom(phantom_cohort):
+    mismatches = verify_roi_crop(str(phantom_cohort / 'Hasta_0'))
+    assert isinstance(mismatches, list)
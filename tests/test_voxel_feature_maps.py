@@ -0,0 +1,45 @@
+import os
+import shutil
+
+import numpy as np
+import pytest
+
+pytest.importorskip('radiomics')
+sitk = pytest.importorskip('SimpleITK')
+
+import voxel_feature_maps
+from voxel_feature_maps import VOXEL_MAPS_DIR, build_voxel_extractor, extract_voxel_feature_maps
+
+
+def _on_scan_grid(feature_map, scan):
+    """Haritayı (taramanın ızgarasında, kendi orijiniyle) tarama boyutunda, dışı NaN bir diziye yerleştirir."""
+    placed = np.full(sitk.GetArrayViewFromImage(scan).shape, np.nan)
+    start = scan.TransformPhysicalPointToIndex(feature_map.GetOrigin())[::-1]
+    values = sitk.GetArrayFromImage(feature_map)
+    placed[tuple(slice(s, s + n) for s, n in zip(start, values.shape))] = values
+    return placed
+
+
+def test_tiled_maps_match_single_shot_voxel_extraction(phantom_cohort, tmp_path, monkeypatch, capsys):
+    data_folder = tmp_path / 'structured'
+    shutil.copytree(phantom_cohort, data_folder)
+    patient_folder = str(data_folder / 'Hasta_0')
+
+    # Bütçe ne olursa olsun ROI her eksende ikiye bölünsün: 8 parça.
+    monkeypatch.setattr(voxel_feature_maps, 'choose_tile_shape',
+                        lambda roi_shape, *args: ([(s + 1) // 2 for s in roi_shape], 0))
+    extract_voxel_feature_maps(str(data_folder), patient_ids=['Hasta_0'], n_jobs=2)
+    assert '-> 8 parça' in capsys.readouterr().out
+
+    scan = sitk.ReadImage(os.path.join(patient_folder, 'scan.nrrd'))
+    mask = sitk.ReadImage(os.path.join(patient_folder, 'segmentation.nrrd'))
+    roi = sitk.GetArrayViewFromImage(mask) == 1
+    single_shot = {name: value for name, value in build_voxel_extractor().execute(scan, mask, voxelBased=True).items()
+                   if isinstance(value, sitk.Image)}
+
+    output_folder = os.path.join(patient_folder, VOXEL_MAPS_DIR)
+    assert sorted(os.listdir(output_folder)) == sorted(f'{name}.nrrd' for name in single_shot)
+    for name, expected in single_shot.items():
+        tiled = sitk.ReadImage(os.path.join(output_folder, f'{name}.nrrd'))
+        np.testing.assert_allclose(_on_scan_grid(tiled, scan)[roi], _on_scan_grid(expected, scan)[roi],
+                                   rtol=1e-6, atol=1e-6, equal_nan=True, err_msg=name)
@@ -0,0 +1,116 @@
+import os
+import threading
+import time
+
+import pytest
+
+from work_queue import WorkQueue
+
+LEASE_SECONDS = 0.2
+
+
+def _queue(queue_dir, name, **kwargs):
+    return WorkQueue(str(queue_dir), lease_seconds=LEASE_SECONDS, worker_id=name, **kwargs)
+
+
+def _expire():
+    time.sleep(LEASE_SECONDS * 1.5)
+
+
+def test_live_lease_blocks_other_workers(tmp_path):
+    a, b = _queue(tmp_path, 'a'), _queue(tmp_path, 'b')
+    lease = a.claim([('Hasta_1', 't1'), ('Hasta_2', 't2')])
+    assert lease.task_id == 'Hasta_1'
+    assert b.try_claim('Hasta_1', 't1') is None
+    assert b.claim([('Hasta_1', 't1'), ('Hasta_2', 't2')]).task_id == 'Hasta_2'
+
+
+def test_completed_task_is_skipped_until_its_token_changes(tmp_path):
+    a, b = _queue(tmp_path, 'a'), _queue(tmp_path, 'b')
+    with a.claim([('Hasta_1', 't1')]) as lease:
+        lease.complete('ok', 't1')
+    assert b.is_done('Hasta_1', 't1')
+    assert b.claim([('Hasta_1', 't1')]) is None
+    assert b.claim([('Hasta_1', 't1-yeni')]).task_id == 'Hasta_1'
+
+
+def test_expired_lease_is_taken_over_and_old_owner_notices(tmp_path):
+    a, b = _queue(tmp_path, 'a'), _queue(tmp_path, 'b')
+    old = a.claim([('Hasta_1', 't1')])
+    _expire()
+
+    new = b.claim([('Hasta_1', 't1')])
+    assert new is not None and new.generation == old.generation + 1
+    assert new.attempt == 2  # Süresi dolan deneme sayılır.
+    assert a.lease_generations('Hasta_1') == [new.generation]
+
+    assert old.renew() is False and old.lost
+    old.release()  # Devralınmış bir kiralamayı bırakmak yenisine dokunmaz.
+    assert new.renew() is True
+
+
+def test_released_lease_is_claimed_without_waiting(tmp_path):
+    a, b = _queue(tmp_path, 'a'), _queue(tmp_path, 'b')
+    with a.claim([('Hasta_1', 't1')]):
+        pass
+    lease = b.claim([('Hasta_1', 't1')])
+    assert lease is not None and lease.attempt == 2
+
+
+def test_failing_task_is_marked_failed_after_max_attempts(tmp_path):
+    queue = _queue(tmp_path, 'a', max_attempts=2)
+    for _ in range(2):
+        with pytest.raises(RuntimeError):
+            with queue.claim([('Hasta_1', 't1')]):
+                raise RuntimeError('bozuk maske')
+
+    assert queue.claim([('Hasta_1', 't1')]) is None
+    done = queue.read_done('Hasta_1')
+    assert done['status'] == 'failed'
+    assert 'bozuk maske' in done['error']
+    # Girdiler değişirse iş yeniden denenir.
+    assert queue.claim([('Hasta_1', 't2')]).attempt == 1
+
+
+def test_concurrent_takeover_has_a_single_winner(tmp_path):
+    queues = [_queue(tmp_path, f'w{i}') for i in range(8)]
+    queues[0].claim([('Hasta_1', 't1')])
+
+    for _ in range(5):
+        _expire()
+        names = os.listdir(tmp_path)  # Herkes aynı (eski) klasör listesiyle yarışır.
+        barrier = threading.Barrier(len(queues))
+        winners = []
+
+        def race(queue):
+            barrier.wait()
+            lease = queue.try_claim('Hasta_1', 't1', names)
+            if lease is not None:
+                winners.append(lease)
+
+        threads = [threading.Thread(target=race, args=(queue,)) for queue in queues]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert len(winners) == 1
+        assert queues[0].lease_generations('Hasta_1') == [winners[0].generation]
+        assert winners[0].renew()
+
+
+def test_stale_listing_cannot_resurrect_an_old_generation(tmp_path):
+    a, b, c = _queue(tmp_path, 'a'), _queue(tmp_path, 'b'), _queue(tmp_path, 'c')
+    a.claim([('Hasta_1', 't1')])
+    _expire()
+    stale_names = os.listdir(tmp_path)  # Sadece 0. nesli görür.
+
+    b.claim([('Hasta_1', 't1')])
+    _expire()
+    latest = c.claim([('Hasta_1', 't1')])  # 2. nesil; 1. nesil silinir.
+    assert latest.generation == 2
+
+    # 1. nesil dosyası artık yok; eski listeyle oluşturulabilir ama daha yüksek nesil görülünce geri alınır.
+    assert a.try_claim('Hasta_1', 't1', stale_names) is None
+    assert a.lease_generations('Hasta_1') == [2]
+    assert latest.renew()
@@ -0,0 +1,200 @@
+import os
+import json
+import numpy as np
+import SimpleITK as sitk
+
+# --- Hızlı Yükleme Hacim Önbelleği ---
+# gzip ile sıkıştırılmış NRRD dosyalarını her çalışmada yeniden açmak, ayar denemeleri
+# sırasında sürenin büyük kısmını alır. Bu modül, her 'scan.nrrd' / 'segmentation.nrrd'
+# dosyasını bir kez sıkıştırılmamış bir NumPy dizisine (.npy) ve geometri bilgisine (.json)
+# dönüştürür. Sonraki açılışlarda gzip çözülmez; kazanç budur.
+#
+#   - NumPy dizisiyle çalışan kodlar (görüntüleyici, voksel haritaları) load_volume_array ile
+#     dosyayı bellek eşlemeli (memmap) açar: hacim kopyalanmaz, sadece dokunulan kısımlar okunur.
+#   - SimpleITK görüntüsü gereken kodlar (extractor) read_image kullanır. SimpleITK kendi
+#     tamponuna sahip olduğu için vokseller bu tampona bir kez kopyalanır; bu, sıkıştırılmamış
+#     bir NRRD'yi sitk.ReadImage ile okumakla aynı maliyettir. Kopyalama sırasında eşlenen dosya
+#     sayfaları da sürecin belleğinde (RSS) görünür, ama bunlar işletim sisteminin sayfa
+#     önbelleğidir ve bellek gerektiğinde geri alınır.
+#
+# Kayıtlar, NRRD dosyasının yanındaki '.volume_cache' klasöründe tutulur:
+#   <hasta>/.volume_cache/scan.npy   + scan.json
+#   <hasta>/.volume_cache/segmentation.npy + segmentation.json
+# JSON kaydı, kaynak NRRD'nin boyutunu ve değiştirilme zamanını (mtime) içerir. Bunlar
+# değiştiyse kayıt eskimiş sayılır ve NRRD'ye geri dönülür.
+
+VOLUME_CACHE_DIR = '.volume_cache'
+
+# Kayıt biçimi değişirse artırılır; eski kayıtlar eskimiş sayılıp yeniden üretilir.
+FORMAT_VERSION = 1
+
+
+def volume_cache_paths(nrrd_path):
+    """
+    NRRD dosyasına ait önbellek kaydının yollarını döndürür.
+
+    Args:
+        nrrd_path (str): Kaynak .nrrd dosyasının yolu.
+
+    Returns:
+        tuple: (dizi dosyası (.npy), geometri dosyası (.json)) yolları.
+    """
+    folder, filename = os.path.split(nrrd_path)
+    name = filename[:-len('.nrrd')] if filename.lower().endswith('.nrrd') else filename
+    cache_folder = os.path.join(folder, VOLUME_CACHE_DIR)
+    return os.path.join(cache_folder, f'{name}.npy'), os.path.join(cache_folder, f'{name}.json')
+
+
+def _source_signature(nrrd_path):
+    stat = os.stat(nrrd_path)
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+
+def read_volume_metadata(nrrd_path):
+    """
+    Güncel önbellek kaydının geometri bilgisini döndürür.
+
+    Args:
+        nrrd_path (str): Kaynak .nrrd dosyasının yolu.
+
+    Returns:
+        dict veya None: Kayıt yoksa, bozuksa veya kaynak dosya değiştiyse None.
+    """
+    array_path, meta_path = volume_cache_paths(nrrd_path)
+    try:
+        with open(meta_path, encoding='utf-8') as f:
+            meta = json.load(f)
+        signature = _source_signature(nrrd_path)
+    except (OSError, ValueError):
+        return None
+    if (meta.get('version') != FORMAT_VERSION or meta.get('source') != signature
+            or not os.path.exists(array_path)):
+        return None
+    return meta
+
+
+def write_volume_cache(nrrd_path, image, signature=None):
+    """
+    Okunmuş bir görüntüyü önbelleğe atomik olarak yazar.
+
+    Dizi dosyası önce, geometri dosyası en son yerine taşınır; geometri dosyası olmayan
+    veya yarım kalmış bir kayıt hiçbir zaman geçerli sayılmaz.
+
+    Args:
+        nrrd_path (str): Görüntünün okunduğu .nrrd dosyasının yolu.
+        image (sitk.Image): nrrd_path'ten okunmuş görüntü.
+        signature (dict): Okumadan önce alınan kaynak dosya bilgisi. None ise şimdi alınır.
+
+    Returns:
+        dict: Yazılan geometri bilgisi.
+    """
+    array_path, meta_path = volume_cache_paths(nrrd_path)
+    os.makedirs(os.path.dirname(array_path), exist_ok=True)
+
+    array = sitk.GetArrayViewFromImage(image)
+    meta = {
+        'version': FORMAT_VERSION,
+        'source': signature or _source_signature(nrrd_path),
+        'shape': list(array.shape),
+        'dtype': array.dtype.str,
+        'components': image.GetNumberOfComponentsPerPixel(),
+        'spacing': list(image.GetSpacing()),
+        'origin': list(image.GetOrigin()),
+        'direction': list(image.GetDirection()),
+    }
+
+    tmp_suffix = f'.{os.getpid()}.tmp'
+    with open(array_path + tmp_suffix, 'wb') as f:
+        np.save(f, array)
+    os.replace(array_path + tmp_suffix, array_path)
+    with open(meta_path + tmp_suffix, 'w', encoding='utf-8') as f:
+        json.dump(meta, f)
+    os.replace(meta_path + tmp_suffix, meta_path)
+    return meta
+
+
+def cache_volume(nrrd_path, force=False):
+    """
+    NRRD dosyası için önbellek kaydı oluşturur (kayıt güncelse hiçbir şey yapmaz).
+
+    Args:
+        nrrd_path (str): Kaynak .nrrd dosyasının yolu.
+        force (bool): True ise kayıt güncel olsa bile yeniden yazılır.
+
+    Returns:
+        bool: Yeni kayıt yazıldıysa True, kayıt zaten güncelse False.
+    """
+    if not force and read_volume_metadata(nrrd_path) is not None:
+        return False
+    signature = _source_signature(nrrd_path)
+    write_volume_cache(nrrd_path, sitk.ReadImage(nrrd_path), signature)
+    return True
+
+
+def load_volume_array(nrrd_path, build=True):
+    """
+    Hacmi, önbellekteki .npy dosyasından bellek eşlemeli ve salt okunur olarak açar.
+
+    Args:
+        nrrd_path (str): Kaynak .nrrd dosyasının yolu.
+        build (bool): True ise eksik veya eskimiş kayıt önce oluşturulur.
+
+    Returns:
+        tuple veya None: (dizi, geometri). Dizi SimpleITK ile aynı (z, y, x[, kanal])
+                         eksen sırasındadır. Kayıt kullanılamıyorsa None.
+    """
+    meta = read_volume_metadata(nrrd_path)
+    if meta is None and build:
+        try:
+            cache_volume(nrrd_path)
+        except OSError:
+            # Klasör yazılamıyorsa (salt okunur veri vb.) önbelleksiz devam edilir.
+            return None
+        meta = read_volume_metadata(nrrd_path)
+    if meta is None:
+        return None
+
+    array_path, _ = volume_cache_paths(nrrd_path)
+    try:
+        return np.load(array_path, mmap_mode='r'), meta
+    except (OSError, ValueError):
+        return None
+
+
+def read_image(nrrd_path, use_cache=True, build=True):
+    """
+    sitk.ReadImage yerine kullanılabilir: Görüntüyü önbellekten, yoksa NRRD'den okur.
+
+    Önbellekten okurken sadece gzip çözme süresi kazanılır: bellek eşlemeli dizi, SimpleITK
+    görüntüsünün tamponuna bir kez kopyalanır (sıfır kopya değildir; bkz. modül açıklaması).
+    Kayıt eksik veya eskimişse NRRD okunur ve build açıksa aynı görüntü önbelleğe yazılır
+    (dosya iki kez çözülmez).
+
+    Args:
+        nrrd_path (str): Kaynak .nrrd dosyasının yolu.
+        use_cache (bool): False ise doğrudan sitk.ReadImage kullanılır.
+        build (bool): True ise eksik veya eskimiş kayıt oluşturulur.
+
+    Returns:
+        sitk.Image: Okunan görüntü.
+    """
+    if not use_cache:
+        return sitk.ReadImage(nrrd_path)
+
+    loaded = load_volume_array(nrrd_path, build=False)
+    if loaded is not None:
+        array, meta = loaded
+        image = sitk.GetImageFromArray(array, isVector=meta['components'] > 1)
+        image.SetSpacing(meta['spacing'])
+        image.SetOrigin(meta['origin'])
+        image.SetDirection(meta['direction'])
+        return image
+
+    signature = _source_signature(nrrd_path)
+    image = sitk.ReadImage(nrrd_path)
+    if build:
+        try:
+            write_volume_cache(nrrd_path, image, signature)
+        except OSError as e:
+            print(f"  UYARI: '{nrrd_path}' için hacim önbelleği yazılamadı: {e}")
+    return image
@@ -0,0 +1,593 @@
+import os
+import math
+import time
+import itertools
+import numpy as np
+
+from radiomics_extractor import (RADIOMICS_SETTINGS, GLOBAL_INTENSITY_IMAGE_TYPES, build_extractor,
+                                 compute_crop_padding, find_patient_folders)
+from extraction_plan import build_extraction_plan, read_required_features, derived_image_names, image_type_passes
+from nrrd_header import nrrd_geometry, index_to_physical_point, format_raw_nrrd_header, VALUE_RANGE_KEYS
+
+# --- Parça Parça, Bellek Sınırlı Voksel Bazlı Özellik Haritaları ---
+# extract_radiomics_features hasta başına tek bir satır (segment bazlı özellikler) üretir.
+# Heterojenlik analizi için her voksel çevresindeki küçük bir çekirdekte (kernelRadius)
+# hesaplanan özellik haritaları gerekir. Bunu PyRadiomics ile tüm hacimde tek seferde yapmak
+# çok büyük bellek ve süre ister. Bu modül maskenin sınırlayıcı kutusunu parçalara (tile) böler:
+#
+#   - Her parça, filtre çekirdeğinin ve özellik çekirdeğinin ihtiyaç duyduğu kenar payı (halo)
+#     kadar genişletilerek okunur; özellikler sadece parçanın çekirdek bölgesi için yazılır.
+#   - Parça boyutu ve paralel işçi sayısı verilen bellek bütçesine göre seçilir.
+#   - PyRadiomics gri seviye ayrıklaştırmasının sınırlarını ROI'nin en küçük/en büyük değerinden
+#     hesaplar; parçalarda bu değerler farklı olacağı için önce tüm parçalardan her türetilmiş
+#     görüntünün ROI aralığı toplanır. Her parçanın ROI'sine, hiçbir gerçek vokselin çekirdeğine
+#     girmeyen iki 'çapa' voksel (tüm ROI'nin en küçük ve en büyük değeri) eklenir; böylece
+#     PyRadiomics'in kendi ayrıklaştırması tüm parçalarda aynı sınırları üretir. Sonuç, hacmin
+#     tek seferde işlenmesiyle aynı olur (filtrelerin kenar payı yaklaşıklığı ve parçada hiç
+#     bulunmayan gri seviyelerini hesaba katan özellikler dışında; bkz. crop_to_roi).
+#   - Haritalar, bittikçe sıkıştırılmamış NRRD dosyalarına yazılır (bellekte birikmez). Her
+#     harita taramanın ızgarasındadır (aynı voksel aralığı ve yön, orijini sınırlayıcı kutunun
+#     köşesi) ve mask_inspect ile taramanın üzerine katman olarak açılabilir. Haritanın değer
+#     aralığı başlığa yazılır; görüntüleyici renk aralığı için hacmi taramaz.
+#
+# radiomics_extractor gibi, SimpleITK, PyRadiomics ve joblib onları kullanan fonksiyonların
+# içinde yüklenir; modülü içe aktarmak bu kütüphaneleri yüklemez.
+
+# Voksel haritası ayarları. initValue, maske dışındaki vokseller için NaN yazar.
+# PyRadiomics şeması çekirdek ayarlarını sadece 'voxelSetting' altında kabul eder; extractor
+# bunları extractor.settings içinde diğer ayarlarla birleştirir.
+VOXEL_SETTINGS = {
+    'setting': dict(RADIOMICS_SETTINGS['setting']),
+    'voxelSetting': {'kernelRadius': 1, 'maskedKernel': True, 'initValue': float('nan')},
+}
+
+# PyRadiomics şemasında 'voxelSetting' altında duran ayarlar.
+VOXEL_SETTING_KEYS = ('kernelRadius', 'maskedKernel', 'initValue', 'voxelBatch')
+
+# Görüntü tipi verilmezse sadece orijinal görüntü kullanılır.
+DEFAULT_VOXEL_IMAGE_TYPES = {'Original': {}}
+
+# Haritaların yazıldığı, hasta klasörü içindeki klasör.
+VOXEL_MAPS_DIR = 'voxel_maps'
+
+DEFAULT_MEMORY_BUDGET_MB = 4096
+
+# Parçaların bir kenarı bundan daha küçük seçilmez.
+MIN_TILE_EDGE = 8
+
+# Bellek modeli (kaba): parça başına tarama, maske ve PyRadiomics'in float64 çalışma kopyaları;
+# aynı anda birden fazla türetilmiş görüntü üreten filtrelerin ek kopyaları; çekirdek bölgedeki
+# her voksel ve özellik için float64 sonuç. Bütçenin dörtte biri, GLCM gibi matrislerin voksel
+# grubu (voxelBatch) başına boyutuna ayrılır (13 yön x Ng x Ng x float64).
+IMAGE_COPIES = 4
+MULTI_OUTPUT_COPIES = {'Wavelet': 8, 'LBP3D': 3}
+MATRIX_BYTES_PER_LEVEL_PAIR = 13 * 8
+
+# Haritanın değer aralığı başlığa sabit genişlikte yazılır (repr(float) en fazla 24 karakter);
+# aralık harita bitince belli olduğu için başlık aynı uzunlukta yerinde yeniden yazılır.
+RANGE_FIELD_WIDTH = 24
+
+_WORKER_VOXEL_EXTRACTOR = None
+_WORKER_VOXEL_CONFIG = None
+
+
+def build_voxel_extractor(settings=VOXEL_SETTINGS, image_types=None, feature_plan=None):
+    """
+    Voksel haritaları için extractor kurar ve parça parça hesaplamaya uygunluğunu kontrol eder.
+
+    Args:
+        settings (dict): PyRadiomics parametre sözlüğü (kernelRadius 'voxelSetting' altında).
+        image_types (dict): Görüntü tipi -> parametreler. None ise DEFAULT_VOXEL_IMAGE_TYPES.
+        feature_plan (dict): Verilirse (bkz. extraction_plan) sadece plandaki özellikler çıkarılır.
+
+    Returns:
+        featureextractor.RadiomicsFeatureExtractor: Şekil sınıfları kapalı extractor.
+
+    Raises:
+        ValueError: Ayarlar parça parça hesaplamayla aynı sonucu vermeyecekse.
+    """
+    extractor = build_extractor(settings, feature_plan)
+    if feature_plan is None:
+        extractor.disableAllImageTypes()
+        extractor.enableImageTypes(**(image_types or DEFAULT_VOXEL_IMAGE_TYPES))
+        extractor.enableAllFeatures()
+    # Şekil özelliklerinin voksel bazlı karşılığı yoktur.
+    for feature_class in [c for c in extractor.enabledFeatures if c.startswith('shape')]:
+        del extractor.enabledFeatures[feature_class]
+
+    problems = []
+    if not extractor.enabledFeatures:
+        problems.append("voksel bazlı hesaplanabilecek özellik yok (şekil özellikleri desteklenmez)")
+    if extractor.settings.get('normalize') or extractor.settings.get('resampledPixelSpacing'):
+        problems.append("'normalize' ve 'resampledPixelSpacing' tüm görüntüye bağlıdır")
+    if not extractor.settings.get('maskedKernel', True):
+        problems.append("'maskedKernel' False iken ayrıklaştırma maske dışını da kapsar")
+    global_types = [t for t in extractor.enabledImagetypes if t in GLOBAL_INTENSITY_IMAGE_TYPES]
+    if global_types:
+        problems.append(f"{', '.join(global_types)} tüm görüntünün en büyük değeriyle ölçeklenir")
+    if problems:
+        raise ValueError("Parça parça voksel haritası hesaplanamaz: " + '; '.join(problems))
+    return extractor
+
+
+def _split_voxel_settings(settings):
+    """
+    extractor.settings gibi birleşmiş bir ayar sözlüğünü, şemaya uyan PyRadiomics parametre
+    sözlüğüne ('setting' ve 'voxelSetting') geri ayırır.
+    """
+    return {'setting': {k: v for k, v in settings.items() if k not in VOXEL_SETTING_KEYS},
+            'voxelSetting': {k: v for k, v in settings.items() if k in VOXEL_SETTING_KEYS}}
+
+
+def _worker_extractor(settings, image_types, feature_plan):
+    """İşçi süreç başına bir kez kurulan extractor (ayarlar değişirse yeniden kurulur)."""
+    global _WORKER_VOXEL_EXTRACTOR, _WORKER_VOXEL_CONFIG
+    # repr ile karşılaştırıyoruz: initValue NaN olduğunda sözlükler kendileriyle bile eşit çıkmaz.
+    config = repr((settings, image_types, feature_plan))
+    if _WORKER_VOXEL_EXTRACTOR is None or _WORKER_VOXEL_CONFIG != config:
+        _WORKER_VOXEL_EXTRACTOR = build_voxel_extractor(_split_voxel_settings(settings), image_types, feature_plan)
+        _WORKER_VOXEL_CONFIG = config
+    return _WORKER_VOXEL_EXTRACTOR
+
+
+def count_map_features(extractor, feature_plan=None):
+    """Üretilecek harita (özellik) sayısını tahmin eder."""
+    import radiomics
+
+    if feature_plan is not None:
+        return sum(1 for name in feature_plan['required'] if '_shape' not in name)
+    available = radiomics.getFeatureClasses()
+    per_image = sum(len(names) if names else
+                    sum(1 for deprecated in available[c].getFeatureNames().values() if not deprecated)
+                    for c, names in extractor.enabledFeatures.items())
+    dimensions = 2 if extractor.settings.get('force2D', False) else 3
+    n_images = 0
+    for image_type, custom_args in extractor.enabledImagetypes.items():
+        args = dict(extractor.settings)
+        args.update(custom_args or {})
+        n_images += len(derived_image_names(image_type, args, dimensions))
+    return per_image * n_images
+
+
+def choose_tile_shape(roi_shape, halo, bytes_per_chunk_voxel, bytes_per_core_voxel, budget_bytes):
+    """
+    Bellek bütçesine sığan en büyük parça boyutunu seçer (en uzun kenar yarıya indirilerek).
+
+    Args:
+        roi_shape (list): Sınırlayıcı kutunun (z, y, x) boyutu.
+        halo (list): Eksen başına (z, y, x) kenar payı.
+        bytes_per_chunk_voxel (float): Kenar paylı parçadaki voksel başına bellek.
+        bytes_per_core_voxel (float): Çekirdek bölgedeki voksel başına (sonuç haritaları) bellek.
+        budget_bytes (float): Bir parçaya ayrılan bellek.
+
+    Returns:
+        tuple: (parça boyutu (z, y, x), tahmini parça belleği (bayt)).
+    """
+    def _chunk_bytes(tile):
+        chunk = math.prod(t + 2 * h for t, h in zip(tile, halo))
+        return chunk * bytes_per_chunk_voxel + math.prod(tile) * bytes_per_core_voxel
+
+    tile = list(roi_shape)
+    while _chunk_bytes(tile) > budget_bytes and max(tile) > MIN_TILE_EDGE:
+        axis = tile.index(max(tile))
+        tile[axis] = max(MIN_TILE_EDGE, (tile[axis] + 1) // 2)
+    return tile, _chunk_bytes(tile)
+
+
+def global_bin_edges(minimum, maximum, settings):
+    """
+    Tüm ROI'nin en küçük/en büyük değerinden, PyRadiomics'in (imageoperations.getBinEdges)
+    üreteceği ayrıklaştırma sınırlarını hesaplar.
+    """
+    bin_count = settings.get('binCount')
+    if bin_count is not None:
+        edges = np.histogram([minimum, maximum], bin_count)[1]
+        edges[-1] += 1
+        return edges
+    bin_width = settings.get('binWidth', 25)
+    low_bound = minimum - (minimum % bin_width)
+    edges = np.arange(low_bound, maximum + 2 * bin_width, bin_width)
+    if len(edges) == 1:
+        edges = np.array([edges[0] - .5, edges[0] + .5])
+    return edges
+
+
+def _with_range_anchors(image, mask, value_range, radius):
+    """
+    Parçanın ROI'sine, değerleri tüm ROI'nin en küçük ve en büyük değeri olan iki 'çapa' voksel ekler.
+
+    PyRadiomics ayrıklaştırma sınırlarını ROI'deki en küçük/en büyük değerden hesaplar (binWidth ve
+    binCount). Çapalar sayesinde parçanın varsayılan ayrıklaştırması tüm ROI'ninkiyle aynı sınırları
+    üretir; PyRadiomics'in hiçbir fonksiyonu değiştirilmez. Çapalar görüntünün sonuna eklenen
+    dilimlerde, gerçek ROI'den özellik çekirdeğinin yarıçapından uzakta durur; bu yüzden hiçbir
+    gerçek vokselin çekirdeğine girmezler.
+
+    Returns:
+        tuple: (görüntü, maske) - orijinal dilimler başta, ek dilimler sonda.
+    """
+    import SimpleITK as sitk
+
+    image_array = sitk.GetArrayFromImage(image)
+    mask_array = sitk.GetArrayFromImage(mask)
+    pad = [(0, radius + 2)] + [(0, 0)] * (image_array.ndim - 1)
+    image_array = np.pad(image_array, pad)
+    mask_array = np.pad(mask_array, pad)
+    for z, value in zip((-2, -1), value_range):
+        image_array[(z,) + (0,) * (image_array.ndim - 1)] = value
+        mask_array[(z,) + (0,) * (mask_array.ndim - 1)] = 1
+
+    anchored = []
+    for array, reference in ((image_array, image), (mask_array, mask)):
+        anchored_image = sitk.GetImageFromArray(array)
+        anchored_image.SetOrigin(reference.GetOrigin())
+        anchored_image.SetSpacing(reference.GetSpacing())
+        anchored_image.SetDirection(reference.GetDirection())
+        anchored.append(anchored_image)
+    return anchored[0], anchored[1]
+
+
+def _chunk_images(scan_chunk, mask_chunk, chunk_origin, spacing, direction, label, computed=None):
+    """
+    Parça dizilerinden SimpleITK görüntülerini kurar. Maske görüntüsü ikilidir (etiket 1);
+    computed verilirse ROI onunla sınırlanır.
+    """
+    import SimpleITK as sitk
+
+    if scan_chunk.ndim == 4:
+        # load_patient_scan ile aynı: çok kanallı taramanın ilk kanalı, Int16 olarak.
+        scan_chunk = scan_chunk[..., 0].astype(np.int16)
+    roi = np.asarray(mask_chunk) == label
+    if computed is not None:
+        roi &= computed
+
+    images = []
+    for array in (np.ascontiguousarray(scan_chunk), roi.astype(np.uint8)):
+        image = sitk.GetImageFromArray(array)
+        image.SetOrigin(chunk_origin)
+        image.SetSpacing(spacing)
+        image.SetDirection(direction)
+        images.append(image)
+    return images[0], images[1], roi
+
+
+def _chunk_ranges(scan_chunk, mask_chunk, chunk_origin, spacing, direction, core, settings, passes, label):
+    """
+    1. geçiş: Parçanın çekirdek ROI'sinde her türetilmiş görüntünün en küçük/en büyük değeri.
+
+    passes, görüntü tipi üreteçlerinin çağrılacağı (görüntü tipi, parametreler) ikilileridir
+    (bkz. extraction_plan.image_type_passes).
+    """
+    import SimpleITK as sitk
+    from radiomics import imageoperations
+
+    image, mask, roi = _chunk_images(scan_chunk, mask_chunk, chunk_origin, spacing, direction, label)
+    core_roi = np.zeros(roi.shape, dtype=bool)
+    core_roi[core] = roi[core]
+    settings = dict(settings, label=1)
+
+    ranges = {}
+    for image_type, custom_args in passes:
+        args = dict(settings)
+        args.update(custom_args)
+        for derived_image, image_type_name, _ in getattr(imageoperations, f'get{image_type}Image')(image, mask, **args):
+            if image_type_name in ranges:
+                continue
+            values = sitk.GetArrayViewFromImage(derived_image)[core_roi]
+            ranges[image_type_name] = (float(values.min()), float(values.max()))
+    return ranges
+
+
+def _chunk_feature_maps(scan_chunk, mask_chunk, chunk_origin, spacing, direction, core, settings, image_types,
+                        feature_plan, label, ranges, voxel_batch, sitk_threads):
+    """
+    2. geçiş: Parçanın çekirdek bölgesi için voksel bazlı özellik haritalarını hesaplar.
+
+    ranges, her türetilmiş görüntünün tüm ROI'deki (en küçük, en büyük) değeridir (bkz. _with_range_anchors).
+
+    Returns:
+        dict: Özellik adı -> çekirdek bölge boyutunda float32 harita (ROI dışı NaN).
+    """
+    import SimpleITK as sitk
+    from radiomics import imageoperations
+
+    sitk.ProcessObject.SetGlobalDefaultNumberOfThreads(sitk_threads)
+    extractor = _worker_extractor(settings, image_types, feature_plan)
+    radius = int(settings.get('kernelRadius', 1))
+
+    # Özellikler sadece çekirdek bölgedeki vokseller ve onların çekirdek komşuları için gerekir.
+    computed = np.zeros(mask_chunk.shape, dtype=bool)
+    computed[tuple(slice(max(0, s.start - radius), s.stop + radius) for s in core)] = True
+    image, mask, roi = _chunk_images(scan_chunk, mask_chunk, chunk_origin, spacing, direction, label, computed)
+    core_roi = roi[core]
+
+    kwargs = dict(extractor.settings)
+    kwargs['label'] = 1
+    kwargs['voxelBased'] = True
+    kwargs['voxelBatch'] = voxel_batch
+    bounding_box, corrected_mask = imageoperations.checkMask(image, mask, **kwargs)
+    if corrected_mask is not None:
+        mask = corrected_mask
+
+    maps = {}
+    enabled_features = extractor.enabledFeatures
+    extra_passes = feature_plan.get('extra_passes') if feature_plan is not None else None
+    computed = set()
+    try:
+        for image_type, custom_args in image_type_passes(extractor.enabledImagetypes, extra_passes):
+            args = dict(kwargs)
+            args.update(custom_args)
+            generator = getattr(imageoperations, f'get{image_type}Image')(image, mask, **args)
+            for derived_image, image_type_name, derived_kwargs in generator:
+                if image_type_name in computed:
+                    continue
+                computed.add(image_type_name)
+                if feature_plan is not None:
+                    if image_type_name not in feature_plan['images']:
+                        continue
+                    extractor.enabledFeatures = {c: f for c, f in feature_plan['images'][image_type_name].items()
+                                                 if not c.startswith('shape')}
+                input_image, input_mask = imageoperations.cropToTumorMask(derived_image, mask, bounding_box,
+                                                                          padDistance=radius)
+                n_slices = input_image.GetSize()[2]
+                input_image, input_mask = _with_range_anchors(input_image, input_mask, ranges[image_type_name], radius)
+                features = extractor.computeFeatures(input_image, input_mask, image_type_name, **derived_kwargs)
+                extractor.enabledFeatures = enabled_features
+
+                start = image.TransformPhysicalPointToIndex(input_image.GetOrigin())[::-1]
+                for feature_name, feature_map in features.items():
+                    if not isinstance(feature_map, sitk.Image):
+                        continue
+                    placed = np.full(roi.shape, np.nan, dtype=np.float32)
+                    values = sitk.GetArrayViewFromImage(feature_map)[:n_slices]
+                    placed[tuple(slice(s, s + n) for s, n in zip(start, values.shape))] = values
+                    core_map = placed[core]
+                    core_map[~core_roi] = np.nan
+                    maps[feature_name] = core_map
+    finally:
+        extractor.enabledFeatures = enabled_features
+    return maps
+
+
+def _chunk_task(core_lower, core_upper, *args):
+    """2. geçiş işi: Haritaları, ana sürecin nereye yazacağını bilmesi için çekirdek bölgeyle döndürür."""
+    return core_lower, core_upper, _chunk_feature_maps(*args)
+
+
+def _open_array(nrrd_path):
+    """Hacmi mümkünse hacim önbelleğinden bellek eşlemeli açar; değilse tamamen okur."""
+    import SimpleITK as sitk
+    from volume_cache import load_volume_array
+
+    loaded = load_volume_array(nrrd_path, build=True)
+    if loaded is not None:
+        return loaded[0]
+    return sitk.GetArrayFromImage(sitk.ReadImage(nrrd_path))
+
+
+def _roi_bounds(mask_array, label, slab=16):
+    """Maskedeki etiketin (z, y, x) sınırlayıcı kutusunu, hacmi dilim grupları halinde tarayarak bulur."""
+    lower, upper = None, None
+    for z0 in range(0, mask_array.shape[0], slab):
+        block = np.asarray(mask_array[z0:z0 + slab]) == label
+        if not block.any():
+            continue
+        hits = [np.flatnonzero(block.any(axis=tuple(a for a in range(3) if a != axis))) for axis in range(3)]
+        block_lower = [z0 + int(hits[0][0]), int(hits[1][0]), int(hits[2][0])]
+        block_upper = [z0 + int(hits[0][-1]) + 1, int(hits[1][-1]) + 1, int(hits[2][-1]) + 1]
+        lower = block_lower if lower is None else [min(a, b) for a, b in zip(lower, block_lower)]
+        upper = block_upper if upper is None else [max(a, b) for a, b in zip(upper, block_upper)]
+    return lower, upper
+
+
+def _map_header(size, geometry, origin, value_range=(math.nan, math.nan)):
+    """Harita başlığı; değer aralığı alanları her zaman aynı uzunluktadır."""
+    key_values = {key: repr(float(value)).ljust(RANGE_FIELD_WIDTH) for key, value in zip(VALUE_RANGE_KEYS, value_range)}
+    return format_raw_nrrd_header(size, geometry['spacing'], origin, geometry['direction'], 'float', key_values)
+
+
+def _create_map_file(path, size, geometry, origin):
+    """Sıkıştırılmamış bir NRRD haritası oluşturur ve veri bölümünü NaN ile dolu memmap olarak açar."""
+    header = _map_header(size, geometry, origin)
+    with open(path, 'wb') as f:
+        f.write(header)
+        f.truncate(len(header) + 4 * math.prod(size))
+    volume = np.memmap(path, dtype='<f4', mode='r+', offset=len(header), shape=tuple(reversed(size)))
+    volume[:] = np.nan
+    return volume
+
+
+def _write_map_range(path, size, geometry, origin, value_range):
+    """Haritanın değer aralığını başlığa yazar (başlık uzunluğu değişmez, veri yerinde kalır)."""
+    header = _map_header(size, geometry, origin, value_range)
+    with open(path, 'r+b') as f:
+        if len(header) != len(_map_header(size, geometry, origin)):
+            raise ValueError(f"'{path}' başlığının uzunluğu değişti.")
+        f.write(header)
+
+
+def extract_patient_voxel_maps(patient_folder_path, extractor, feature_plan=None, n_jobs=1,
+                               memory_budget_mb=DEFAULT_MEMORY_BUDGET_MB, mask_name='segmentation.nrrd'):
+    """
+    Bir hastanın voksel bazlı özellik haritalarını parça parça hesaplar ve NRRD olarak yazar.
+
+    Args:
+        patient_folder_path (str): 'scan.nrrd' ve maskeyi içeren klasör.
+        extractor (featureextractor.RadiomicsFeatureExtractor): build_voxel_extractor çıktısı.
+        feature_plan (dict): Verilirse sadece plandaki özellikler çıkarılır.
+        n_jobs (int): En fazla paralel işçi sayısı (-1 tüm çekirdekler). Bütçe yetmezse azaltılır.
+        memory_budget_mb (float): Tüm işçilerin toplam bellek bütçesi (MB).
+        mask_name (str): Hasta klasöründeki maske dosyasının adı.
+
+    Returns:
+        list: Yazılan harita dosyalarının yolları.
+    """
+    import SimpleITK as sitk
+    from joblib import Parallel, delayed, parallel_config
+
+    scan_path = os.path.join(patient_folder_path, 'scan.nrrd')
+    mask_path = os.path.join(patient_folder_path, mask_name)
+    settings = dict(extractor.settings)
+    label = settings.get('label', 1)
+    radius = int(settings.get('kernelRadius', 1))
+
+    geometry = nrrd_geometry(scan_path)
+    scan_array, mask_array = _open_array(scan_path), _open_array(mask_path)
+    if mask_array.shape[:3] != scan_array.shape[:3]:
+        raise ValueError(f"Maske ve tarama boyutları farklı: {mask_array.shape} != {scan_array.shape}")
+
+    roi_lower, roi_upper = _roi_bounds(mask_array, label)
+    if roi_lower is None:
+        raise ValueError(f"Maskede {label} etiketi bulunamadı.")
+    roi_shape = [u - l for l, u in zip(roi_lower, roi_upper)]
+
+    # Kenar payı: filtre çekirdekleri (bkz. compute_crop_padding) artı özellik çekirdeği.
+    reference = sitk.Image([1, 1, 1], sitk.sitkUInt8)
+    reference.SetSpacing(geometry['spacing'])
+    halo = [p + radius for p in reversed(compute_crop_padding(extractor, reference))]
+
+    # Bellek bütçesini işçilere bölüp parça boyutunu seçiyoruz.
+    cpu_count = os.cpu_count() or 1
+    n_workers = cpu_count if n_jobs < 0 else max(1, min(n_jobs, cpu_count))
+    budget = memory_budget_mb * 1024 * 1024
+    n_features = count_map_features(extractor, feature_plan)
+    copies = IMAGE_COPIES + sum(MULTI_OUTPUT_COPIES.get(t, 0) for t in extractor.enabledImagetypes)
+    tile, chunk_bytes = choose_tile_shape(roi_shape, halo, 8 * copies, 8 * 2 * n_features,
+                                          0.75 * budget / n_workers)
+    if chunk_bytes > 0.75 * budget / n_workers:
+        n_workers = max(1, int(0.75 * budget // chunk_bytes))
+        print(f"  UYARI: Bellek bütçesi için işçi sayısı {n_workers}'e düşürüldü.")
+    per_worker = budget / n_workers
+    sitk_threads = max(1, cpu_count // n_workers)
+
+    tasks = []
+    for core_lower in itertools.product(*(range(l, u, t) for l, u, t in zip(roi_lower, roi_upper, tile))):
+        core_upper = [min(c + t, u) for c, t, u in zip(core_lower, tile, roi_upper)]
+        core_region = tuple(slice(c, e) for c, e in zip(core_lower, core_upper))
+        core_mask = np.asarray(mask_array[core_region]) == label
+        if not core_mask.any():
+            continue
+        chunk_lower = [max(0, c - h) for c, h in zip(core_lower, halo)]
+        chunk_upper = [min(s, e + h) for s, e, h in zip(scan_array.shape[:3], core_upper, halo)]
+        chunk = tuple(slice(l, u) for l, u in zip(chunk_lower, chunk_upper))
+        core = tuple(slice(c - l, e - l) for c, e, l in zip(core_lower, core_upper, chunk_lower))
+        origin = index_to_physical_point(geometry, chunk_lower[::-1])
+        tasks.append((chunk, core, core_lower, core_upper, origin))
+
+    print(f"  ROI {roi_shape[::-1]} voksel -> {len(tasks)} parça ({tile[::-1]}, kenar payı {halo[::-1]}), "
+          f"{n_workers} işçi, parça başına ~{chunk_bytes / 1024 ** 2:.0f} MB, {n_features} harita.")
+
+    image_types = {k: dict(v or {}) for k, v in extractor.enabledImagetypes.items()}
+    passes = image_type_passes(image_types, feature_plan.get('extra_passes') if feature_plan is not None else None)
+    common = (geometry['spacing'], geometry['direction'])
+
+    with parallel_config(backend='loky', inner_max_num_threads=sitk_threads):
+        # 1. geçiş: Her türetilmiş görüntünün tüm ROI'deki aralığı -> ortak ayrıklaştırma sınırları.
+        ranges = {}
+        for chunk_ranges in Parallel(n_jobs=n_workers, return_as='generator_unordered')(
+                delayed(_chunk_ranges)(scan_array[chunk], mask_array[chunk], origin, *common, core,
+                                       settings, passes, label)
+                for chunk, core, _, _, origin in tasks):
+            for name, (low, high) in chunk_ranges.items():
+                previous = ranges.get(name, (low, high))
+                ranges[name] = (min(previous[0], low), max(previous[1], high))
+        bin_edges = {name: global_bin_edges(low, high, settings) for name, (low, high) in ranges.items()}
+
+        # Voksel grubu boyutu, en fazla gri seviyeli görüntünün matrisleri bütçenin dörtte birine sığacak şekilde.
+        n_levels = max(len(edges) - 1 for edges in bin_edges.values())
+        voxel_batch = settings.get('voxelBatch', -1)
+        if voxel_batch is None or voxel_batch <= 0:
+            voxel_batch = max(1, int(per_worker / 4 // (n_levels ** 2 * MATRIX_BYTES_PER_LEVEL_PAIR)))
+
+        # 2. geçiş: Haritalar parça parça hesaplanır ve bittikçe dosyalara yazılır.
+        output_folder = os.path.join(patient_folder_path, VOXEL_MAPS_DIR)
+        os.makedirs(output_folder, exist_ok=True)
+        for filename in os.listdir(output_folder):
+            if filename.endswith('.nrrd'):
+                os.remove(os.path.join(output_folder, filename))
+
+        map_origin = index_to_physical_point(geometry, roi_lower[::-1])
+        outputs = {}
+        value_ranges = {}
+        results = Parallel(n_jobs=n_workers, return_as='generator_unordered')(
+            delayed(_chunk_task)(
+                core_lower, core_upper, scan_array[chunk], mask_array[chunk], origin, *common, core, settings,
+                image_types, feature_plan, label, ranges, voxel_batch, sitk_threads)
+            for chunk, core, core_lower, core_upper, origin in tasks)
+        for n_done, (core_lower, core_upper, maps) in enumerate(results, start=1):
+            region = tuple(slice(c - l, e - l) for c, e, l in zip(core_lower, core_upper, roi_lower))
+            for feature_name, values in maps.items():
+                if feature_name not in outputs:
+                    outputs[feature_name] = _create_map_file(os.path.join(output_folder, f'{feature_name}.nrrd'),
+                                                             roi_shape[::-1], geometry, map_origin)
+                outputs[feature_name][region] = values
+                finite = values[np.isfinite(values)]
+                if finite.size:
+                    low, high = value_ranges.get(feature_name, (np.inf, -np.inf))
+                    value_ranges[feature_name] = (min(low, float(finite.min())), max(high, float(finite.max())))
+            print(f"  -> Parça {n_done}/{len(tasks)} yazıldı.")
+
+    for feature_name, volume in outputs.items():
+        volume.flush()
+        if feature_name in value_ranges:
+            _write_map_range(os.path.join(output_folder, f'{feature_name}.nrrd'), roi_shape[::-1], geometry,
+                             map_origin, value_ranges[feature_name])
+    return [os.path.join(output_folder, f'{name}.nrrd') for name in outputs]
+
+
+def extract_voxel_feature_maps(data_folder_path, patient_ids=None, n_jobs=1, memory_budget_mb=DEFAULT_MEMORY_BUDGET_MB,
+                               image_types=None, required_features=None, settings=VOXEL_SETTINGS,
+                               mask_name='segmentation.nrrd'):
+    """
+    Hastaların voksel bazlı özellik haritalarını çıkarır ('<hasta>/voxel_maps/<özellik>.nrrd').
+
+    Args:
+        data_folder_path (str): İçinde hasta klasörlerinin bulunduğu ana veri klasörü.
+        patient_ids (list): Sadece bu hastalar işlenir. None ise tüm hastalar.
+        n_jobs (int): Paralel işçi sayısı (-1 tüm çekirdekler).
+        memory_budget_mb (float): Tüm işçilerin toplam bellek bütçesi (MB).
+        image_types (dict): Görüntü tipi -> parametreler. None ise sadece 'Original'.
+        required_features (list veya str): Verilirse sadece bu özelliklerin haritaları çıkarılır
+                                           (bkz. extraction_plan.read_required_features).
+        settings (dict): PyRadiomics parametre sözlüğü ('voxelSetting' altındaki 'kernelRadius' özellik
+                         çekirdeğinin yarıçapıdır).
+        mask_name (str): Hasta klasöründeki maske dosyasının adı.
+    """
+    feature_plan = None
+    if required_features is not None:
+        feature_plan = build_extraction_plan(read_required_features(required_features))
+    extractor = build_voxel_extractor(settings, image_types, feature_plan)
+
+    patients = find_patient_folders(data_folder_path)
+    if patient_ids is not None:
+        patients = [(patient_id, folder) for patient_id, folder in patients if patient_id in set(patient_ids)]
+
+    for patient_id, patient_folder_path in patients:
+        print(f"\nVoksel haritaları: Hasta ID -> {patient_id}")
+        start = time.perf_counter()
+        try:
+            paths = extract_patient_voxel_maps(patient_folder_path, extractor, feature_plan, n_jobs,
+                                               memory_budget_mb, mask_name)
+        except Exception as e:
+            print(f"  HATA: '{patient_id}' için voksel haritaları çıkarılamadı: {e}")
+            continue
+        print(f"  -> Başarılı: {len(paths)} harita {time.perf_counter() - start:.0f} sn'de "
+              f"'{os.path.join(patient_folder_path, VOXEL_MAPS_DIR)}' klasörüne yazıldı.")
+
+
+# --- KULLANIM ---
+if __name__ == '__main__':
+    main_data_folder = 'data/structured'
+
+    # Sadece belirli hastalar için (örn. ['Hasta_1']); None ise tüm hastalar.
+    patient_ids = None
+
+    # Paralel işçi sayısı ve tüm işçilerin toplam bellek bütçesi (MB). Parça boyutu bütçeye göre seçilir.
+    n_jobs = 4
+    memory_budget_mb = 4096
+
+    # Haritası çıkarılacak özellikler (örn. ['original_glcm_Correlation', 'original_firstorder_Entropy']
+    # veya bir .txt dosyası). None ise 'Original' görüntüde tüm özellik sınıfları.
+    required_features = None
+
+    extract_voxel_feature_maps(main_data_folder, patient_ids=patient_ids, n_jobs=n_jobs,
+                               memory_budget_mb=memory_budget_mb, required_features=required_features)
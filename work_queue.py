@@ -0,0 +1,335 @@
+import os
+import json
+import time
+import socket
+import threading
+import uuid
+
+# --- Paylaşılan Dosya Sistemi Üzerinde İş Kuyruğu ---
+# Büyük kohortları birden fazla makinede (veya aynı makinede birden fazla süreçte) işlemek için
+# aracı bir servis gerektirmeyen, kiralama (lease) tabanlı bir kuyruk. Tek gereken, tüm işçilerin
+# aynı 'data/structured' klasörünü görmesidir (NFS, SMB vb.). Kuyruk klasöründe her iş için:
+#
+#   <iş>.lease.<n> : İşin n. nesil kiralaması: işi yapan işçi, kiralamaya özel rastgele bir
+#                    değer (nonce), deneme sayısı ve kiralamanın bitiş zamanı. Her kiralama yeni
+#                    bir nesil dosyası olarak O_CREAT | O_EXCL ile oluşturulur; aynı nesli sadece
+#                    bir işçi oluşturabilir. Geçerli kiralama en yüksek nesildir.
+#   <iş>.done      : İş bittiğinde yazılır (durum ve işin girdilerini tanımlayan 'token').
+#
+# İşçi, iş sürerken kiralamasını arka planda düzenli olarak yeniler. Ölen bir işçinin kiralaması
+# yenilenmediği için süresi dolar ve başka bir işçi bir sonraki nesli oluşturarak işi devralır.
+# Dosyalar hiçbir zaman yeniden adlandırılmaz; bir işçi sadece kendi oluşturduğu veya süresi
+# dolmuş eski nesilleri siler, bu yüzden yaşayan bir kiralama devralma sırasında yok edilemez.
+# Aynı işin art arda başarısız denemeleri (işçinin hata fırlatması veya ölmesi) kiralamada sayılır;
+# 'max_attempts' aşılınca iş 'failed' olarak tamamlanır ve sonsuza dek tekrar denenmez.
+# Kiralama süreleri makinelerin saatiyle karşılaştırıldığı için makinelerin saatleri (NTP ile)
+# senkron olmalıdır; varsayılan süre birkaç saniyelik saat farklarını rahatça tolere eder.
+
+DEFAULT_LEASE_SECONDS = 600
+
+# Kiralama, süresinin bu kesri kadar aralıklarla yenilenir.
+RENEW_FRACTION = 1 / 3
+
+# Tamamlanmadan biten (hata fırlatan veya ölen işçi) bir işin en fazla deneme sayısı.
+DEFAULT_MAX_ATTEMPTS = 3
+
+
+def worker_identity():
+    """Bu işçi sürecini tanımlayan, makineler arasında benzersiz bir kimlik üretir."""
+    return f'{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:8]}'
+
+
+def _write_json_atomic(path, record, tmp_tag):
+    tmp_path = f'{path}.{tmp_tag}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(record, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def _read_json(path):
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        # Dosya yoksa veya başka bir işçi tarafından tam o anda yazılıyorsa.
+        return None
+
+
+def _remove_if_exists(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+class Lease:
+    """
+    Bir işin kiralaması. 'with' bloğu boyunca kiralama arka planda yenilenir; blok bittiğinde
+    kiralama bırakılır. complete() çağrılmadan bırakılan iş (örn. hata) başka bir işçi tarafından
+    en fazla 'max_attempts' denemeye kadar tekrar alınabilir.
+    """
+
+    def __init__(self, queue, task_id, generation, token=None, attempt=1, previous_error=None):
+        self.queue = queue
+        self.task_id = task_id
+        self.generation = generation
+        self.token = token
+        self.attempt = attempt
+        self.previous_error = previous_error
+        self.nonce = uuid.uuid4().hex
+        self.lost = False
+        self.completed = False
+        self._stop = threading.Event()
+        self._renewer = None
+
+    @property
+    def path(self):
+        return self.queue.lease_path(self.task_id, self.generation)
+
+    def record(self, **fields):
+        """Kiralama dosyasına yazılan kayıt (bitiş zamanı şimdiden itibaren lease_seconds)."""
+        record = {'worker': self.queue.worker_id, 'host': socket.gethostname(), 'pid': os.getpid(),
+                  'nonce': self.nonce, 'token': self.token, 'attempt': self.attempt,
+                  'expires': time.time() + self.queue.lease_seconds}
+        record.update(fields)
+        return record
+
+    def __enter__(self):
+        interval = self.queue.lease_seconds * RENEW_FRACTION
+        self._renewer = threading.Thread(target=self._renew_loop, args=(interval,), daemon=True)
+        self._renewer.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._stop.set()
+        if self._renewer is not None:
+            self._renewer.join()
+        if exc_type is not None and not self.completed:
+            print(f"  HATA: '{self.task_id}' işlenirken hata oluştu (deneme {self.attempt}/"
+                  f"{self.queue.max_attempts}): {exc_type.__name__}: {exc}")
+            self.release(error=f'{exc_type.__name__}: {exc}')
+        else:
+            self.release()
+
+    def _renew_loop(self, interval):
+        while not self._stop.wait(interval):
+            if not self.renew():
+                return
+
+    def _is_ours(self):
+        # Daha yüksek bir nesil varsa kiralama devralınmıştır; nonce, aynı nesil dosyasının
+        # başka bir işçi tarafından (örn. silinip) yeniden oluşturulmadığını doğrular.
+        if self.queue.lease_generations(self.task_id)[-1:] != [self.generation]:
+            return False
+        current = _read_json(self.path)
+        return current is not None and current.get('nonce') == self.nonce
+
+    def renew(self):
+        """
+        Kiralamanın süresini uzatır.
+
+        Returns:
+            bool: Kiralama hâlâ bu işçideyse True. Süresi dolup başka bir işçiye geçtiyse False;
+                  bu durumda iş iki işçide birden yapılmış olur (sonuçlar aynıdır).
+        """
+        if not self._is_ours():
+            if not self.lost:
+                print(f"  UYARI: '{self.task_id}' kiralaması süresi dolduğu için başka bir işçiye geçti.")
+            self.lost = True
+            return False
+        _write_json_atomic(self.path, self.record(), self.queue.worker_id)
+        return True
+
+    def complete(self, status, token, error=None):
+        """
+        İşi tamamlandı olarak işaretler.
+
+        Args:
+            status (str): 'ok' veya 'failed'. Başarısız işler de tamamlanmış sayılır; aynı girdilerle
+                          tekrar denenmez (yeniden denemek için '<iş>.done' dosyasını silin).
+            token (str): İşin girdilerini tanımlayan değer; girdiler değişirse iş tekrar yapılır.
+            error (str): Başarısızlığın nedeni (isteğe bağlı).
+        """
+        record = {
+            'status': status,
+            'token': token,
+            'worker': self.queue.worker_id,
+            'attempt': self.attempt,
+            'finished': time.time(),
+        }
+        if error is not None:
+            record['error'] = error
+        _write_json_atomic(self.queue.done_path(self.task_id), record, self.queue.worker_id)
+        self.completed = True
+
+    def release(self, error=None):
+        """
+        Kiralama bu işçideyse bırakır. Dosya silinmez, süresi dolmuş olarak yeniden yazılır;
+        böylece nesil numarası ve deneme sayısı bir sonraki kiralamaya aktarılır.
+
+        Args:
+            error (str): İş tamamlanmadan bırakılıyorsa nedeni (bir sonraki denemeye aktarılır).
+        """
+        if not self._is_ours():
+            return
+        record = self.record(expires=0, released=True)
+        if error is not None:
+            record['error'] = error
+        _write_json_atomic(self.path, record, self.queue.worker_id)
+
+
+class WorkQueue:
+    """
+    Kuyruk klasöründeki kiralama ve tamamlanma dosyaları üzerinden işleri işçilere dağıtır.
+
+    Kullanım:
+        queue = WorkQueue('data/structured/.work_queue')
+        lease = queue.claim([('Hasta_1', token_1), ('Hasta_2', token_2)])
+        if lease is not None:
+            with lease:
+                ...
+                lease.complete('ok', token)
+    """
+
+    def __init__(self, queue_dir, lease_seconds=DEFAULT_LEASE_SECONDS, worker_id=None,
+                 max_attempts=DEFAULT_MAX_ATTEMPTS):
+        """
+        Args:
+            queue_dir (str): Tüm işçilerin gördüğü kuyruk klasörü.
+            lease_seconds (float): Yenilenmeyen bir kiralamanın süresinin dolması için geçen süre.
+            worker_id (str): Bu işçinin kimliği. None ise worker_identity() kullanılır.
+            max_attempts (int): Tamamlanmadan biten bir işin en fazla kaç kez kiralanacağı.
+        """
+        self.queue_dir = queue_dir
+        self.lease_seconds = lease_seconds
+        self.worker_id = worker_id or worker_identity()
+        self.max_attempts = max_attempts
+        os.makedirs(queue_dir, exist_ok=True)
+
+    def lease_path(self, task_id, generation):
+        return os.path.join(self.queue_dir, f'{task_id}.lease.{generation}')
+
+    def done_path(self, task_id):
+        return os.path.join(self.queue_dir, f'{task_id}.done')
+
+    def lease_generations(self, task_id, names=None):
+        """
+        İşin kuyruk klasöründeki kiralama nesillerini küçükten büyüğe döndürür.
+
+        Args:
+            task_id (str): İş kimliği.
+            names (list): Kuyruk klasörünün önceden okunmuş içeriği. None ise klasör okunur.
+        """
+        prefix = f'{task_id}.lease.'
+        if names is None:
+            names = os.listdir(self.queue_dir)
+        return sorted(int(name[len(prefix):]) for name in names
+                      if name.startswith(prefix) and name[len(prefix):].isdigit())
+
+    def read_done(self, task_id):
+        """İşin tamamlanma kaydını döndürür (yoksa None)."""
+        return _read_json(self.done_path(task_id))
+
+    def is_done(self, task_id, token):
+        """İş, verilen token ile (yani aynı girdilerle) tamamlandıysa True döndürür."""
+        done = self.read_done(task_id)
+        return done is not None and done.get('token') == token
+
+    def _is_live(self, record, path):
+        if record is not None:
+            return record.get('expires', 0) > time.time()
+        # Okunamayan kiralama dosyası o anda oluşturuluyor olabilir; yaşına bakarak karar veriyoruz.
+        try:
+            return os.path.getmtime(path) > time.time() - self.lease_seconds
+        except OSError:
+            return False
+
+    def try_claim(self, task_id, token=None, names=None):
+        """
+        İşi kiralamayı dener. Geçerli kiralamanın süresi dolmuşsa (veya bırakılmışsa) bir sonraki
+        nesil oluşturularak devralınır.
+
+        Devralma bir karşılaştır-ve-değiştir işlemidir: n+1. nesli sadece bir işçi oluşturabilir.
+        Oluşturduktan sonra daha yüksek bir nesil görülürse (eski bir klasör listesiyle yarışa
+        girilmişse) sadece kendi dosyamız silinir ve vazgeçilir.
+
+        Args:
+            task_id (str): İş kimliği.
+            token (str): İşin girdilerini tanımlayan değer. Önceki kiralama aynı token ile
+                         tamamlanmadan bittiyse deneme sayısı bir artırılır.
+            names (list): Kuyruk klasörünün önceden okunmuş içeriği (bkz. claim).
+
+        Returns:
+            Lease veya None: İş başka bir işçide ise None.
+        """
+        generations = self.lease_generations(task_id, names)
+        previous = None
+        generation = 0
+        if generations:
+            latest_path = self.lease_path(task_id, generations[-1])
+            previous = _read_json(latest_path)
+            if self._is_live(previous, latest_path):
+                return None
+            generation = generations[-1] + 1
+
+        attempt, previous_error = 1, None
+        if previous is not None and token is not None and previous.get('token') == token:
+            attempt = previous.get('attempt', 0) + 1
+            previous_error = previous.get('error')
+        lease = Lease(self, task_id, generation, token, attempt, previous_error)
+
+        try:
+            fd = os.open(lease.path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644)
+        except FileExistsError:
+            return None
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(lease.record(), f)
+            f.flush()
+            os.fsync(f.fileno())
+
+        if any(g > generation for g in self.lease_generations(task_id)):
+            _remove_if_exists(lease.path)
+            return None
+
+        if previous is not None and not previous.get('released'):
+            print(f"  BİLGİ: '{task_id}' için süresi dolmuş kiralama devralındı ({previous.get('worker')}).")
+        # Eski nesiller artık geçersizdir; dosya sayısı büyümesin diye siliyoruz.
+        for old_generation in generations:
+            _remove_if_exists(self.lease_path(task_id, old_generation))
+        return lease
+
+    def claim(self, tasks):
+        """
+        Sıradaki tamamlanmamış ve başka bir işçide olmayan işi kiralar.
+
+        Deneme sınırını aşan işler kiralanmaz; 'failed' olarak tamamlanır ve atlanır.
+
+        Args:
+            tasks (iterable): (iş kimliği, token) ikilileri, işlenme önceliği sırasıyla.
+
+        Returns:
+            Lease veya None: Kiralanabilecek iş kalmadıysa None.
+        """
+        # Klasör bir kez okunur; her iş için ayrı ayrı listelemek büyük kohortlarda yavaştır.
+        names = os.listdir(self.queue_dir)
+        for task_id, token in tasks:
+            if self.is_done(task_id, token):
+                continue
+            lease = self.try_claim(task_id, token, names)
+            if lease is None:
+                continue
+            # Kiralamayı alırken başka bir işçi işi bitirmiş olabilir.
+            if self.is_done(task_id, token):
+                lease.release()
+                continue
+            if lease.attempt > self.max_attempts:
+                reason = lease.previous_error or 'işçi yanıt vermedi (kiralama süresi doldu)'
+                print(f"  UYARI: '{task_id}' {self.max_attempts} denemede tamamlanamadı; başarısız sayılıyor "
+                      f"(son hata: {reason}).")
+                lease.complete('failed', token, error=f'{self.max_attempts} denemede tamamlanamadı: {reason}')
+                lease.release()
+                continue
+            return lease
+        return None